@@ -35,6 +35,8 @@ import os
 from config import config_by_name
 from database import init_db
 from routes import register_routes
+from services.inference_pool import get_pool
+from services.session_store import get_session_store
 
 # Initialize Flask app
 app = Flask(__name__)
@@ -52,6 +54,23 @@ db = init_db(app)
 # Register Routes
 register_routes(app)
 
+# Start the inference worker processes before the first request
+if app.config["INFERENCE_POOL"]:
+    get_pool(
+        app.config["INFERENCE_POOL_SIZE"],
+        app.config["INFERENCE_POOL_QUEUE_DEPTH"],
+        app.config["INFERENCE_POOL_TIMEOUT_S"]
+    )
+
+# Chatbot session store (shared between workers unless it is "memory")
+get_session_store(
+    app.config["CHAT_SESSION_STORE"],
+    app.config["CHAT_SESSION_TTL_S"],
+    int(app.config["CHAT_SESSION_MAX_MB"] * 1024 * 1024),
+    redis_url=app.config["CHAT_SESSION_REDIS_URL"],
+    mongo_db=db
+)
+
 @app.route("/")
 def home():
     return "MediMind Backend is Running! 🚀"
@@ -0,0 +1,100 @@
+"""
+Cold start of a worker: process start to first prediction, with the pickled
+models against the portable export (export_models.py).
+
+Each path runs --repeats times in a fresh Python process that imports what a
+worker imports, loads the served ensemble and scores one symptom list:
+    pickle     services.predictor (sklearn, XGBoost, pandas, joblib; every
+               artifact unpickled)
+    compiled   the same with FAST_INFERENCE_MODELS set for every model, so
+               the compiled engine serves but the imports stay
+    export     services.portable_model only (NumPy)
+Reported per path: wall time from spawning the process to its exit (median
+and best), the in-process import + load + predict time, peak RSS and which
+heavy libraries ended up imported. All paths must predict the same disease.
+
+Run from the backend directory after export_models.py:
+    python -m benchmarks.cold_start [--repeats 5]
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+SYMPTOMS = ["headache", "nausea", "high fever"]
+HEAVY_MODULES = {"sklearn", "xgboost", "pandas", "joblib", "imblearn", "scipy"}
+
+# The profile index would answer before any model runs, the export has no such shortcut
+PATHS = {
+    "pickle": {"PROFILE_INDEX": "false", "FAST_INFERENCE_MODELS": ""},
+    "compiled": {
+        "PROFILE_INDEX": "false",
+        "FAST_INFERENCE_MODELS": "svm_model,nb_model,rf_model,xgb_model,voting_model,stacking_model"
+    },
+    "export": {},
+}
+
+
+def child(path):
+    """Load one path and score SYMPTOMS; print a JSON report as the last line."""
+    start = time.perf_counter()
+    if path == "export":
+        from services.portable_model import PortableEnsemble
+        prediction = PortableEnsemble().predict_symptoms(SYMPTOMS)["final_prediction"]
+    else:
+        from services.predictor import predict_disease
+        prediction = predict_disease({"symptoms": SYMPTOMS})["final_prediction"]
+    print(json.dumps({
+        "prediction": prediction,
+        "in_process_s": time.perf_counter() - start,
+        "max_rss_mib": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "heavy_modules": sorted({name.split(".")[0] for name in sys.modules} & HEAVY_MODULES)
+    }))
+
+
+def run_once(path):
+    env = {**os.environ, **PATHS[path]}
+    start = time.perf_counter()
+    done = subprocess.run(
+        [sys.executable, "-m", "benchmarks.cold_start", "--child", path],
+        env=env, capture_output=True, text=True
+    )
+    wall = time.perf_counter() - start
+    if done.returncode != 0:
+        raise RuntimeError(f"{path} worker failed:\n{done.stderr[-2000:]}")
+    return {"wall_s": wall, **json.loads(done.stdout.strip().splitlines()[-1])}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Process start to first prediction, pickles vs portable export")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--paths", default=",".join(PATHS))
+    parser.add_argument("--child", choices=list(PATHS), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child)
+        return
+
+    print(f"{'path':<9} {'wall median s':>13} {'wall best s':>11} {'in-process s':>12} {'peak RSS MiB':>12}  heavy imports")
+    predictions = {}
+    for path in args.paths.split(","):
+        runs = [run_once(path) for _ in range(args.repeats)]
+        walls = sorted(run["wall_s"] for run in runs)
+        in_process = sorted(run["in_process_s"] for run in runs)
+        predictions[path] = {run["prediction"] for run in runs}
+        print(f"{path:<9} {walls[len(walls) // 2]:>13.2f} {walls[0]:>11.2f} {in_process[len(in_process) // 2]:>12.2f} "
+              f"{max(run['max_rss_mib'] for run in runs):>12.1f}  {', '.join(runs[-1]['heavy_modules']) or '-'}",
+              flush=True)
+
+    distinct = set().union(*predictions.values())
+    if len(distinct) != 1:
+        raise SystemExit(f"❌ Paths disagree on the first prediction: {predictions}")
+    print(f"✅ Every path predicts {distinct.pop()} for {SYMPTOMS}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Latency and error rate of /predict traffic while model versions are swapped.
+
+Publishes the current ml_models/ as version A and a copy with a perturbed
+ensemble_weights.pkl as version B (in a scratch directory), then keeps
+request threads calling predict_disease while the main thread repeatedly
+reloads B, rolls back to A, and so on. Reports p50/p99/max latency for the
+steady state and during swaps, plus the number of failed requests.
+
+Run from the backend directory:
+    python -m benchmarks.hot_reload [--threads 8] [--swaps 6]
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+import joblib
+import numpy as np
+
+from services import model_versions, predictor
+from services.symptom_dataset import load_dataset
+
+
+def load_requests():
+    test_data = load_dataset(os.path.join("datasets", "Testing.csv")).frame()
+    symptom_columns = test_data.columns[:-1]
+    return [
+        {"symptoms": [col.replace("_", " ") for col in symptom_columns if row[col] == 1]}
+        for _, row in test_data.iterrows()
+    ]
+
+
+def publish_two_versions(scratch):
+    """Publish ml_models/ as-is and with perturbed blend weights; return both version ids."""
+    model_versions.VERSIONS_DIR = os.path.join(scratch, "versions")
+    model_versions.ACTIVE_POINTER = os.path.join(model_versions.VERSIONS_DIR, "ACTIVE")
+    version_a = model_versions.publish_version(predictor.MODELS_DIR, activate=False)
+
+    variant = os.path.join(scratch, "variant")
+    shutil.copytree(predictor.MODELS_DIR, variant, ignore=shutil.ignore_patterns("versions"))
+    weights = np.asarray(joblib.load(os.path.join(variant, "ensemble_weights.pkl")), dtype=float)
+    weights = weights + np.linspace(0, 0.1, len(weights))
+    joblib.dump(weights / weights.sum(), os.path.join(variant, "ensemble_weights.pkl"))
+    version_b = model_versions.publish_version(variant, activate=False)
+    return version_a, version_b
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--swaps", type=int, default=6)
+    args = parser.parse_args()
+
+    # Measure the models, not the prediction cache
+    predictor.prediction_cache.maxsize = 0
+    requests = load_requests()
+    scratch = tempfile.mkdtemp()
+    version_a, version_b = publish_two_versions(scratch)
+    predictor.reload_models(version_a)
+
+    samples = []  # (finished_at, latency_ms)
+    errors = []
+    swap_windows = []
+    lock = threading.Lock()
+    stop = threading.Event()
+
+    def worker(offset):
+        i = offset
+        while not stop.is_set():
+            start = time.perf_counter()
+            try:
+                predictor.predict_disease(requests[i % len(requests)])
+            except Exception as e:
+                with lock:
+                    errors.append(repr(e))
+            end = time.perf_counter()
+            with lock:
+                samples.append((end, (end - start) * 1000))
+            i += 1
+
+    pool = [threading.Thread(target=worker, args=(t * 7,)) for t in range(args.threads)]
+    for t in pool:
+        t.start()
+    time.sleep(2)
+    for swap in range(args.swaps):
+        start = time.perf_counter()
+        if swap % 2 == 0:
+            result = predictor.reload_models(version_b)
+        else:
+            result = predictor.rollback_models()
+        assert result["status"] in ("swapped", "rolled_back"), result
+        swap_windows.append((start, time.perf_counter()))
+        time.sleep(1)
+    stop.set()
+    for t in pool:
+        t.join()
+    shutil.rmtree(scratch, ignore_errors=True)
+
+    during = np.array([ms for end, ms in samples if any(a <= end <= b + 0.1 for a, b in swap_windows)])
+    steady = np.array([ms for end, ms in samples if not any(a <= end <= b + 0.1 for a, b in swap_windows)])
+    print(f"{args.threads} threads, {args.swaps} swaps (reload / rollback alternating), {len(samples)} requests")
+    for name, latencies in [("steady", steady), ("during swap", during)]:
+        if len(latencies):
+            print(f"{name:<12} n={len(latencies):6d}  p50 {np.percentile(latencies, 50):7.2f} ms  "
+                  f"p99 {np.percentile(latencies, 99):7.2f} ms  max {latencies.max():7.2f} ms")
+    print(f"Swap durations: {', '.join(f'{(b - a) * 1000:.0f} ms' for a, b in swap_windows)}")
+    print(f"Failed requests: {len(errors)}")
+
+    if errors:
+        print(errors[:5])
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
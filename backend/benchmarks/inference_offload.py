@@ -0,0 +1,116 @@
+"""
+Mixed-traffic latency with and without the process-pool inference offload.
+
+Runs, for a fixed duration, scoring clients (alternating uncached /predict
+rows and chatbot vectors) next to light I/O-bound clients that stand in for
+the other routes (a simulated database round trip plus JSON work). Reports
+p50/p95/p99 latency and throughput per traffic class, first with inference in
+the serving process and then with it offloaded to services/inference_pool.py.
+
+Offload mostly helps the light routes, which no longer wait for the GIL
+behind forward passes; with fewer cores than pool workers + 1 the scoring
+clients themselves gain little.
+
+Run from the backend directory:
+    python -m benchmarks.inference_offload [--duration 10] [--pool-size 2]
+"""
+import argparse
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+from services.chatbot_predictor import score_symptom_vectors
+from services.inference_pool import InferencePool
+from services.predictor import current_models, predict_disease, prediction_cache
+
+DOCUMENT = {"disease_name": "Fungal infection", "specialty_id": "x" * 24,
+            "description": "lorem ipsum " * 40, "precautions": ["a", "b", "c", "d"]}
+
+
+def light_request(io_ms):
+    """A route that mostly waits on the database."""
+    time.sleep(io_ms / 1000)
+    return json.loads(json.dumps([DOCUMENT] * 5))
+
+
+def run(duration, scoring_clients, light_clients, io_ms, pool, seed):
+    symptoms = current_models().metadata["symptoms"]
+    latencies = {"scoring": [], "light": []}
+    stop = time.perf_counter() + duration
+
+    def scoring_client(index):
+        rng = np.random.default_rng(seed + index)
+        i = 0
+        while time.perf_counter() < stop:
+            picked = rng.choice(len(symptoms), rng.integers(3, 7), replace=False)
+            start = time.perf_counter()
+            if i % 2 == 0:
+                names = [symptoms[j].replace("_", " ") for j in picked]
+                if pool:
+                    pool.predict({"symptoms": names})
+                else:
+                    predict_disease({"symptoms": names})
+            else:
+                vector = np.zeros(len(symptoms))
+                vector[picked] = 1
+                if pool:
+                    pool.chatbot_probs(vector)
+                else:
+                    score_symptom_vectors(vector[np.newaxis, :])
+            latencies["scoring"].append(time.perf_counter() - start)
+            i += 1
+
+    def light_client():
+        while time.perf_counter() < stop:
+            start = time.perf_counter()
+            light_request(io_ms)
+            latencies["light"].append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=scoring_client, args=(i,)) for i in range(scoring_clients)]
+    threads += [threading.Thread(target=light_client) for _ in range(light_clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies
+
+
+def report(mode, latencies, duration):
+    for kind, values in latencies.items():
+        ms = np.array(values) * 1000
+        p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+        print(f"{mode:<10} {kind:<8} {len(ms) / duration:>9.1f} {p50:>8.1f} {p95:>8.1f} {p99:>8.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="p99 of mixed traffic with and without inference offload")
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--scoring-clients", type=int, default=4)
+    parser.add_argument("--light-clients", type=int, default=8)
+    parser.add_argument("--io-ms", type=float, default=2.0, help="simulated database wait of a light request")
+    parser.add_argument("--pool-size", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"CPUs: {os.cpu_count()}, scoring clients: {args.scoring_clients}, light clients: {args.light_clients}")
+    print(f"{'mode':<10} {'traffic':<8} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+
+    prediction_cache.clear()
+    report("in-process", run(args.duration, args.scoring_clients, args.light_clients, args.io_ms, None, args.seed),
+           args.duration)
+
+    prediction_cache.clear()
+    pool = InferencePool(args.pool_size, queue_depth=256, timeout=30.0)
+    try:
+        report("offload", run(args.duration, args.scoring_clients, args.light_clients, args.io_ms, pool, args.seed),
+               args.duration)
+        print(f"pool: {pool.stats()['completed']} jobs, {pool.stats()['failed']} failed")
+    finally:
+        pool.close()
+
+
+if __name__ == "__main__":
+    main()
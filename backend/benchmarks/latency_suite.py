@@ -0,0 +1,229 @@
+"""
+Inference latency suite with stored JSON baselines.
+
+Replays datasets/Testing.csv rows and synthetic sparse (1-6 symptom) vectors
+at batch sizes 1, 8, 64 and 512 through:
+    model:<name>            predict_proba of every loaded model (base models,
+                            voting, stacking and the sparse NB tables)
+    get_enhanced_prediction the per-model + ensemble dict
+    predict_disease         the full request path (symptom names in, response
+                            out; batches go through predict_disease_batch),
+                            with the prediction cache cleared before each call
+and reports p50/p95/p99 latency per call and rows/sec. Only services/predictor.py
+is loaded, so no Mongo is needed.
+
+Run from the backend directory:
+    python -m benchmarks.latency_suite run [--output benchmarks/baselines/latency.json]
+    python -m benchmarks.latency_suite compare benchmarks/baselines/latency.json [--threshold 0.10]
+
+`compare` runs the suite again (or loads --current) and exits non-zero when
+any case is slower than the baseline by more than the threshold.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+import sklearn
+
+from services.predictor import (
+    CASCADE_MODE, FAST_INFERENCE_MODELS, MODEL_MMAP, PROFILE_INDEX_MODE, current_models,
+    get_enhanced_prediction, predict_disease, predict_disease_batch, prediction_cache
+)
+from services.symptom_dataset import load_dataset
+
+BATCH_SIZES = [1, 8, 64, 512]
+DEFAULT_BASELINE = os.path.join("benchmarks", "baselines", "latency.json")
+
+# Each case runs at least MIN_CALLS calls and MIN_ROWS rows, unless MAX_SECONDS runs out first
+MIN_CALLS = 20
+MIN_ROWS = 4096
+MAX_SECONDS = 5.0
+
+# Metrics compared against a baseline, and whether higher is better
+METRICS = {"p50_ms": False, "p95_ms": False, "p99_ms": False, "rows_per_s": True}
+
+
+def load_datasets(n_symptoms, synthetic_rows=2048, seed=0):
+    test_X = np.asarray(load_dataset(os.path.join("datasets", "Testing.csv")).X)
+    rng = np.random.default_rng(seed)
+    sparse_X = np.zeros((synthetic_rows, n_symptoms), dtype=np.uint8)
+    for row in sparse_X:
+        row[rng.choice(n_symptoms, rng.integers(1, 7), replace=False)] = 1
+    return {"testing": test_X, "sparse": sparse_X}
+
+
+def targets(models):
+    """name -> function(batch matrix, symptom name lists)."""
+    scorers = {**models.base_models, "nb_sparse": models.nb_scorer}
+    if models.voting_model is not None:
+        scorers["voting"] = models.voting_model
+    if models.stacking_model is not None:
+        scorers["stacking"] = models.stacking_model
+
+    cases = {f"model:{name}": (lambda X, _, model=model: model.predict_proba(X)) for name, model in scorers.items()}
+    cases["get_enhanced_prediction"] = lambda X, _: get_enhanced_prediction(X, models)
+
+    def full_request(_, symptom_lists):
+        prediction_cache.clear()
+        if len(symptom_lists) == 1:
+            return predict_disease({"symptoms": symptom_lists[0]})
+        return predict_disease_batch(symptom_lists)
+
+    cases["predict_disease"] = full_request
+    return cases
+
+
+def time_case(func, X, symptoms, batch_size, rng):
+    calls = max(MIN_CALLS, -(-MIN_ROWS // batch_size))
+    latencies = []
+    deadline = time.perf_counter() + MAX_SECONDS
+    for _ in range(calls):
+        rows = X[rng.integers(0, len(X), batch_size)]
+        symptom_lists = [[symptoms[j] for j in np.flatnonzero(row)] for row in rows]
+        start = time.perf_counter()
+        func(rows, symptom_lists)
+        latencies.append(time.perf_counter() - start)
+        if time.perf_counter() > deadline and len(latencies) >= 3:
+            break
+
+    ms = np.array(latencies) * 1000
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    return {
+        "p50_ms": float(p50),
+        "p95_ms": float(p95),
+        "p99_ms": float(p99),
+        "rows_per_s": float(batch_size * len(ms) / (ms.sum() / 1000)),
+        "calls": len(ms)
+    }
+
+
+def environment(models):
+    versions = {"python": platform.python_version(), "numpy": np.__version__, "sklearn": sklearn.__version__}
+    try:
+        import xgboost
+        versions["xgboost"] = xgboost.__version__
+    except ImportError:
+        pass
+    return {
+        **versions,
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "model_version": models.version,
+        "degraded": bool(models.missing_artifacts),
+        "fast_inference_models": sorted(FAST_INFERENCE_MODELS),
+        "cascade": CASCADE_MODE,
+        "profile_index": PROFILE_INDEX_MODE and bool(models.profile_index),
+        "composition": [f"{weight:g}*{name}" for name, weight in models.composition],
+        "mmap": MODEL_MMAP
+    }
+
+
+def run_suite(batch_sizes, only=None, seed=0):
+    models = current_models()
+    datasets = load_datasets(models.vocabulary.size, seed=seed)
+    cases = targets(models)
+    rng = np.random.default_rng(seed)
+    results = {}
+
+    print(f"{'case':<44} {'calls':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'rows/s':>10}")
+    for name, func in cases.items():
+        if only and not any(part in name for part in only):
+            continue
+        for dataset, X in datasets.items():
+            for batch_size in batch_sizes:
+                key = f"{name}/{dataset}/{batch_size}"
+                result = time_case(func, X, models.vocabulary.symptoms, batch_size, rng)
+                results[key] = result
+                print(f"{key:<44} {result['calls']:>6} {result['p50_ms']:>9.3f} {result['p95_ms']:>9.3f} "
+                      f"{result['p99_ms']:>9.3f} {result['rows_per_s']:>10.0f}", flush=True)
+
+    return {"created_at": datetime.utcnow().isoformat(), "environment": environment(models), "results": results}
+
+
+def compare(baseline, current, threshold, min_delta_ms):
+    """
+    Regressed (case, metric, baseline, current) rows: worse by more than
+    `threshold` (relative) and, for latencies, by more than min_delta_ms.
+    """
+    regressions = []
+    print(f"{'case':<44} {'metric':<11} {'baseline':>10} {'current':>10} {'change':>8}")
+    for key, base in baseline["results"].items():
+        now = current["results"].get(key)
+        if now is None:
+            continue
+        for metric, higher_is_better in METRICS.items():
+            change = (now[metric] - base[metric]) / base[metric] if base[metric] else 0.0
+            if higher_is_better:
+                regressed = change < -threshold
+            else:
+                # Sub-millisecond tails jitter by whole scheduler ticks; ignore tiny absolute moves
+                regressed = change > threshold and now[metric] - base[metric] > min_delta_ms
+            if regressed:
+                regressions.append((key, metric, base[metric], now[metric]))
+            flag = "  ❌" if regressed else ""
+            print(f"{key:<44} {metric:<11} {base[metric]:>10.3f} {now[metric]:>10.3f} {change:>+7.1%}{flag}")
+
+    missing = set(baseline["results"]) - set(current["results"])
+    if missing:
+        print(f"⚠️ {len(missing)} baseline cases were not measured now")
+    changed = {
+        key: (baseline["environment"].get(key), value) for key, value in current["environment"].items()
+        if baseline["environment"].get(key) != value
+    }
+    if changed:
+        print(f"⚠️ Environment differs from the baseline: {changed}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inference latency suite with JSON baselines")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = sub.add_parser("run", help="measure and store a baseline")
+    run_parser.add_argument("--output", default=DEFAULT_BASELINE)
+
+    compare_parser = sub.add_parser("compare", help="measure (or load --current) and compare with a baseline")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("--current", help="stored results to compare instead of measuring again")
+    compare_parser.add_argument("--output", help="also store the new measurements here")
+    compare_parser.add_argument("--threshold", type=float, default=0.10, help="relative slowdown that counts as a regression")
+    compare_parser.add_argument("--min-delta-ms", type=float, default=0.5, help="smallest latency increase that counts as a regression")
+
+    for sub_parser in (run_parser, compare_parser):
+        sub_parser.add_argument("--batch-sizes", default=",".join(map(str, BATCH_SIZES)))
+        sub_parser.add_argument("--only", help="comma-separated substrings of the cases to run, e.g. model:nb,predict_disease")
+        sub_parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    batch_sizes = [int(n) for n in args.batch_sizes.split(",")]
+    only = args.only.split(",") if args.only else None
+
+    if args.command == "compare" and args.current:
+        with open(args.current) as f:
+            current = json.load(f)
+    else:
+        current = run_suite(batch_sizes, only, args.seed)
+
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(current, f, indent=2)
+        print(f"✅ Results saved to {args.output}")
+
+    if args.command == "compare":
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, current, args.threshold, args.min_delta_ms)
+        if regressions:
+            print(f"❌ {len(regressions)} regressions beyond {args.threshold:.0%}")
+            sys.exit(1)
+        print(f"✅ No regressions beyond {args.threshold:.0%}")
+
+
+if __name__ == "__main__":
+    main()
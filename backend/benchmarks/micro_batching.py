@@ -0,0 +1,95 @@
+"""
+Throughput / latency of /predict inference with and without the micro-batcher.
+
+Simulates concurrent request threads calling predict_disease directly and via
+MicroBatcher, checks both return identical responses and prints rows/sec,
+p50/p99 latency and the batcher's batch-size and queue-wait histograms.
+
+Run from the backend directory:
+    python -m benchmarks.micro_batching [--threads 32] [--requests 20] [--max-batch 32] [--max-wait-ms 5]
+"""
+import argparse
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+from services.micro_batcher import MicroBatcher
+from services.predictor import predict_disease, prediction_cache
+from services.symptom_dataset import load_dataset
+
+
+def load_requests():
+    test_data = load_dataset(os.path.join("datasets", "Testing.csv")).frame()
+    symptom_columns = test_data.columns[:-1]
+    return [
+        {"symptoms": [col.replace("_", " ") for col in symptom_columns if row[col] == 1]}
+        for _, row in test_data.iterrows()
+    ]
+
+
+def run_load(predict_fn, requests, threads, per_thread):
+    """Fire requests from concurrent threads; return (latencies_ms, wall_seconds)."""
+    latencies = []
+    lock = threading.Lock()
+
+    def worker(offset):
+        local = []
+        for i in range(per_thread):
+            req = requests[(offset + i) % len(requests)]
+            start = time.perf_counter()
+            predict_fn(req)
+            local.append((time.perf_counter() - start) * 1000)
+        with lock:
+            latencies.extend(local)
+
+    pool = [threading.Thread(target=worker, args=(t,)) for t in range(threads)]
+    start = time.perf_counter()
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    return np.array(latencies), time.perf_counter() - start
+
+
+def report(name, latencies, wall):
+    print(f"{name:<14} {len(latencies) / wall:8.1f} req/s   "
+          f"p50 {np.percentile(latencies, 50):7.2f} ms   p99 {np.percentile(latencies, 99):7.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=20, help="requests per thread")
+    parser.add_argument("--max-batch", type=int, default=32)
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    args = parser.parse_args()
+
+    # Measure the models, not the prediction cache
+    prediction_cache.maxsize = 0
+    requests = load_requests()
+    batcher = MicroBatcher(args.max_batch, args.max_wait_ms)
+
+    mismatches = sum(
+        json.dumps(predict_disease(req)) != json.dumps(batcher.predict(req))
+        for req in requests
+    )
+
+    direct = run_load(predict_disease, requests, args.threads, args.requests)
+    batched = run_load(batcher.predict, requests, args.threads, args.requests)
+
+    print(f"{args.threads} threads x {args.requests} requests, "
+          f"max_batch_size={args.max_batch}, max_wait_ms={args.max_wait_ms}")
+    report("direct", *direct)
+    report("micro-batched", *batched)
+    print(json.dumps(batcher.stats(), indent=2))
+    print(f"Response mismatches (direct vs batched): {mismatches}")
+
+    if mismatches:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
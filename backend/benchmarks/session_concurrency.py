@@ -0,0 +1,126 @@
+"""
+Stress test of concurrent chatbot sessions under a threaded worker.
+
+--sessions chats each get --tabs clients ("browser tabs") sending
+--messages messages one after another, all clients running at once on
+--threads threads. Every message reports one more symptom, so a session must
+end with every message in its history (each tab's in order), 1 + 2 * n
+entries and the union of all reported symptoms; anything else is a lost
+update. The store adds --latency-ms to every get / put, like a Redis or
+Mongo round trip, which is where threads overlap.
+
+Session locking:
+    unlocked   no lock around the read-modify-write (the old behaviour)
+    global     one lock for every session
+    striped    services/session_store.py StripedLocks (the chatbot default)
+
+Run from the backend directory:
+    python -m benchmarks.session_concurrency [--sessions 300] [--threads 1,16,64,256]
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+
+from services import chatbot_predictor, session_store
+from services.predictor import current_models
+from services.session_store import MemorySessionStore, StripedLocks, bitset_of
+
+SYMPTOMS = ["itching", "skin rash", "chills", "vomiting", "fatigue", "joint pain", "cough", "headache",
+            "back pain", "nausea", "dizziness", "anxiety"]
+
+
+class LatencyStore(MemorySessionStore):
+    """Memory store with a network-like delay on every call."""
+
+    def __init__(self, latency):
+        super().__init__(max_bytes=1 << 40)
+        self.latency = latency
+
+    def get(self, session_id):
+        time.sleep(self.latency)
+        return super().get(session_id)
+
+    def put(self, session_id, session):
+        time.sleep(self.latency)
+        super().put(session_id, session)
+
+
+class NoLocks:
+    def lock(self, session_id):
+        return nullcontext()
+
+
+def message_text(tab, k, n_messages):
+    return f"tab {tab} message {k}: I also have {SYMPTOMS[(tab * n_messages + k) % len(SYMPTOMS)]}"
+
+
+def run(locks, args, threads):
+    """Messages per second and lost updates of one configuration."""
+    chatbot_predictor.session_locks = locks
+    session_store._store = LatencyStore(args.latency_ms / 1000)
+    session_ids = [f"session-{i}" for i in range(args.sessions)]
+    for session_id in session_ids:
+        chatbot_predictor.start_chat(session_id)
+
+    def client(session_id, tab):
+        for k in range(args.messages):
+            chatbot_predictor.process_message(session_id, message_text(tab, k, args.messages))
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(threads) as pool:
+        jobs = [pool.submit(client, session_id, tab) for session_id in session_ids for tab in range(args.tabs)]
+        for job in jobs:
+            job.result()
+    elapsed = time.perf_counter() - start
+
+    vocabulary = current_models().vocabulary
+    expected_symptoms = bitset_of(
+        vocabulary.resolve(SYMPTOMS[(tab * args.messages + k) % len(SYMPTOMS)])
+        for tab in range(args.tabs) for k in range(args.messages)
+    )
+    n_messages = args.tabs * args.messages
+    lost = broken = 0
+    for session_id in session_ids:
+        session = session_store._store.get(session_id)
+        user_messages = [m["message"] for m in session.messages() if m["role"] == "user"]
+        lost += n_messages - len(set(user_messages))
+        in_order = all(
+            [m for m in user_messages if m.startswith(f"tab {tab} ")] ==
+            [message_text(tab, k, args.messages) for k in range(args.messages)]
+            for tab in range(args.tabs)
+        )
+        broken += not (in_order and len(session.history) == 1 + 2 * n_messages
+                       and session.symptoms == expected_symptoms)
+    return args.sessions * n_messages / elapsed, lost, broken
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent chatbot sessions")
+    parser.add_argument("--sessions", type=int, default=300)
+    parser.add_argument("--tabs", type=int, default=2, help="concurrent clients per session")
+    parser.add_argument("--messages", type=int, default=4, help="messages per client")
+    parser.add_argument("--threads", default="1,16,64,256")
+    parser.add_argument("--latency-ms", type=float, default=0.5, help="per store call")
+    parser.add_argument("--stripes", type=int, default=session_store.CHAT_SESSION_LOCK_STRIPES)
+    args = parser.parse_args()
+
+    modes = {"unlocked": NoLocks, "global": lambda: StripedLocks(1), "striped": lambda: StripedLocks(args.stripes)}
+    print(f"{args.sessions} sessions x {args.tabs} clients x {args.messages} messages, "
+          f"{args.latency_ms} ms per store call, {args.stripes} stripes\n")
+    print(f"{'locking':<9} {'threads':>7} {'messages/s':>11} {'lost messages':>14} {'bad sessions':>13}")
+    failures = 0
+    for name, make_locks in modes.items():
+        for threads in [int(n) for n in args.threads.split(",")]:
+            throughput, lost, broken = run(make_locks(), args, threads)
+            if name != "unlocked":
+                failures += lost + broken
+            print(f"{name:<9} {threads:>7} {throughput:>11.0f} {lost:>14} {broken:>13}", flush=True)
+
+    print(f"\n{'OK  ' if not failures else 'FAIL'} no lost or reordered updates with locking")
+    if failures:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+Memory per chatbot session and the store's eviction policy.
+
+Runs --sessions scripted conversations through services/chatbot_predictor.py
+and measures (tracemalloc, so Python object overhead included), after the
+greeting, half-way and at the end of the conversation:
+    legacy dict    the old user_sessions[session_id] layout (name lists,
+                   role/message dicts, possible_diseases)
+    ChatSession    the compact live state (bitsets, indices)
+    stored bytes   ChatSession.to_bytes(), what every store keeps
+    memory store   one MemorySessionStore entry including its bookkeeping
+Then fills a MemorySessionStore capped at a quarter of the sessions' bytes
+and checks the cap holds, expires sessions with a short TTL, and times a
+get + put round trip per backend (Redis when --redis-url answers).
+
+Run from the backend directory:
+    python -m benchmarks.session_store [--sessions 300] [--redis-url redis://localhost:6379/0]
+"""
+import argparse
+import random
+import time
+import tracemalloc
+from datetime import datetime
+
+from services import chatbot_predictor
+from services.predictor import current_models
+from services.session_store import ChatSession, MemorySessionStore, RedisSessionStore, bits_of, get_session_store
+
+SCRIPT = [
+    "I have a fever and a bad headache since yesterday", "it was 39 degrees this morning",
+    "it started on monday evening", "no fever today, but I feel tired and a bit dizzy",
+    "there is a rash on my arms and it is itchy", "not really, my appetite is fine",
+    "I'm coughing a lot at night", "it is a dry cough", "no problems with my eyes or ears",
+    "nothing else I can think of", "thank you"
+]
+
+
+def legacy_session(session):
+    """The session as the old module-global dict held it."""
+    symptoms = current_models().vocabulary.symptoms
+    state = {
+        "start_time": datetime.fromtimestamp(session.started).strftime("%Y-%m-%d %H:%M:%S"),
+        "current_group": None if session.current_group < 0 else chatbot_predictor.group_names[session.current_group],
+        "asked_groups": [chatbot_predictor.group_names[i] for i in bits_of(session.asked_groups)],
+        "reported_symptoms": [symptoms[col] for col in bits_of(session.symptoms)],
+        "conversation_history": [dict(message) for message in session.messages()],
+        "followup_symptoms": [symptoms[col] for col in session.followups],
+        "possible_diseases": list(current_models().label_encoder.classes_),
+        "last_message_type": chatbot_predictor.message_types[session.last_type]
+    }
+    if session.prediction is not None:
+        (disease, confidence), *alternatives = session.prediction
+        state["prediction"] = {
+            "main": {"disease": disease, "confidence": confidence},
+            "alternatives": [{"disease": d, "confidence": c} for d, c in alternatives]
+        }
+    return state
+
+
+def traced_bytes(build):
+    """Bytes still allocated by what build() returns."""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    kept = build()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del kept
+    return after - before
+
+
+def fill_store(store, blobs):
+    for session_id, data in blobs.items():
+        store.put(session_id, ChatSession.from_bytes(data))
+    return store
+
+
+def round_trip_us(store, session, repeats=2000):
+    store.put("bench", session)
+    start = time.perf_counter()
+    for _ in range(repeats):
+        store.put("bench", store.get("bench"))
+    elapsed = time.perf_counter() - start
+    store.delete("bench")
+    return elapsed / repeats * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chatbot session memory and eviction")
+    parser.add_argument("--sessions", type=int, default=300)
+    parser.add_argument("--redis-url", default=None, help="also time a Redis(-compatible) server")
+    args = parser.parse_args()
+
+    random.seed(7)
+    store = get_session_store("memory", ttl=3600, max_bytes=1 << 40)
+    stages = {"greeting": 0, "half-way": len(SCRIPT) // 2, "end": len(SCRIPT)}
+    blobs = {}
+    for name, n_messages in stages.items():
+        for i in range(args.sessions):
+            session_id = f"{name}-{i}"
+            chatbot_predictor.start_chat(session_id)
+            for message in SCRIPT[:n_messages]:
+                chatbot_predictor.process_message(session_id, message)
+            blobs[session_id] = store._entries[session_id][0]
+
+    print(f"Bytes per session over {args.sessions} sessions (tracemalloc):\n")
+    print(f"{'stage':<10} {'messages':>8} {'legacy dict':>12} {'ChatSession':>12} {'stored bytes':>13} {'memory store':>13}")
+    for name, n_messages in stages.items():
+        stage = {session_id: data for session_id, data in blobs.items() if session_id.startswith(name + "-")}
+        sessions = [ChatSession.from_bytes(data) for data in stage.values()]
+        legacy = traced_bytes(lambda: [legacy_session(session) for session in sessions]) / len(sessions)
+        compact = traced_bytes(lambda: [ChatSession.from_bytes(data) for data in stage.values()]) / len(sessions)
+        stored = sum(len(data) for data in stage.values()) / len(stage)
+        in_store = traced_bytes(lambda: fill_store(MemorySessionStore(max_bytes=1 << 40), stage)) / len(stage)
+        print(f"{name:<10} {len(sessions[0].history):>8} {legacy:>12.0f} {compact:>12.0f} {stored:>13.0f} {in_store:>13.0f}"
+              f"  ({legacy / in_store:.1f}x smaller in the store)")
+
+    # Byte budget: least recently used sessions are evicted once the cap is reached
+    cap = sum(MemorySessionStore._cost(session_id, data) for session_id, data in blobs.items()) // 4
+    capped = MemorySessionStore(max_bytes=cap)
+    traced = traced_bytes(lambda: fill_store(capped, blobs))
+    stats = capped.stats()
+    ok = stats["bytes"] <= cap
+    print(f"\n{'OK  ' if ok else 'FAIL'} budget {cap / 1024:.0f} KiB: {stats['sessions']}/{len(blobs)} sessions kept, "
+          f"{stats['evictions']} evicted, accounted {stats['bytes'] / 1024:.0f} KiB, traced {traced / 1024:.0f} KiB")
+    newest = list(blobs)[-1]
+    print(f"{'OK  ' if capped.get(newest) else 'FAIL'} most recent session kept, "
+          f"{'OK  ' if capped.get(list(blobs)[0]) is None else 'FAIL'} least recent evicted")
+
+    # Idle TTL
+    idle = dict(list(blobs.items())[:50])
+    expiring = fill_store(MemorySessionStore(ttl=0.05), idle)
+    time.sleep(0.1)
+    expiring.put("fresh", ChatSession())
+    stats = expiring.stats()
+    ok = stats["sessions"] == 1 and stats["expirations"] == len(idle)
+    print(f"{'OK  ' if ok else 'FAIL'} idle TTL: {stats['expirations']} expired, {stats['sessions']} left")
+
+    session = ChatSession.from_bytes(blobs[newest])
+    print(f"\nget + put round trip: memory {round_trip_us(MemorySessionStore(), session):.1f} us", end="")
+    if args.redis_url:
+        redis_store = RedisSessionStore(args.redis_url)
+        print(f", redis {round_trip_us(redis_store, session, 500):.1f} us ({redis_store.stats()['maxmemory_policy']})", end="")
+    print()
+
+
+if __name__ == "__main__":
+    main()
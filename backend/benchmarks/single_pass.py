@@ -0,0 +1,151 @@
+"""
+Compare the legacy predict_disease flow with the single-pass inference engine.
+
+Counts model forward passes (predict / predict_proba / decision_function calls
+on every fitted estimator, including voting and stacking members), times both
+paths over the rows of datasets/Testing.csv and checks that the JSON responses
+are byte-for-byte identical.
+
+Run from the backend directory:
+    python -m benchmarks.single_pass
+"""
+import json
+import os
+import time
+
+import numpy as np
+
+# Compare the full ensemble only: exact training profiles would otherwise be answered by the
+# profile index, and a serving composition would replace the voting label
+os.environ.setdefault("PROFILE_INDEX", "false")
+os.environ.setdefault("SERVING_CONFIG", "false")
+
+from services import predictor  # noqa: E402
+from services.symptom_dataset import load_dataset  # noqa: E402
+
+REPEATS = 20
+COUNTED_METHODS = ("predict", "predict_proba", "decision_function")
+
+forward_passes = 0
+_depth = 0
+
+
+def legacy_predict_disease(input_json):
+    """predict_disease as it was before the single-pass engine."""
+    loaded = predictor.current_models()
+    input_symptoms = input_json.get("symptoms", [])
+
+    input_data = [0] * len(loaded.symptom_index)
+    for symptom in input_symptoms:
+        symptom = symptom.capitalize()
+        if symptom in loaded.symptom_index:
+            input_data[loaded.symptom_index[symptom]] = 1
+
+    input_data = np.array(input_data).reshape(1, -1)
+
+    rf_pred = loaded.prediction_classes[loaded.rf_model.predict(input_data)[0]]
+    nb_pred = loaded.prediction_classes[loaded.nb_model.predict(input_data)[0]]
+    svm_pred = loaded.prediction_classes[loaded.svm_model.predict(input_data)[0]]
+
+    models = [loaded.rf_model, loaded.nb_model, loaded.svm_model, loaded.xgb_model]
+    predictions = np.array([model.predict_proba(input_data) for model in models])
+    weighted_preds = np.sum(predictions * loaded.ensemble_weights[:, np.newaxis, np.newaxis], axis=0)
+    voting_pred = loaded.voting_model.predict(input_data)[0]
+    stacking_pred = loaded.stacking_model.predict(input_data)[0]
+    final_pred = loaded.prediction_classes[voting_pred]
+
+    return {
+        "rf_prediction": rf_pred,
+        "nb_prediction": nb_pred,
+        "svm_prediction": svm_pred,
+        "final_prediction": final_pred,
+        "confidence_scores": {
+            "rf": float(max(loaded.rf_model.predict_proba(input_data)[0])),
+            "nb": float(max(loaded.nb_model.predict_proba(input_data)[0])),
+            "svm": float(max(loaded.svm_model.predict_proba(input_data)[0]))
+        }
+    }
+
+
+def _counting(method):
+    """Wrap a bound model method so only top-level calls count as a forward pass."""
+    def wrapper(*args, **kwargs):
+        global forward_passes, _depth
+        if _depth == 0:
+            forward_passes += 1
+        _depth += 1
+        try:
+            return method(*args, **kwargs)
+        finally:
+            _depth -= 1
+    return wrapper
+
+
+def instrument_models():
+    """Attach pass counters to every distinct fitted estimator used by the predictor."""
+    models = predictor.current_models()
+    estimators = list(models.base_models.values())
+    estimators += list(models.voting_model.estimators_)
+    estimators += [est for est in models.stacking_model.estimators_ if est != "drop"]
+    estimators.append(models.stacking_model.final_estimator_)
+
+    seen = set()
+    for estimator in estimators:
+        if id(estimator) in seen:
+            continue
+        seen.add(id(estimator))
+        for name in COUNTED_METHODS:
+            if hasattr(estimator, name):
+                setattr(estimator, name, _counting(getattr(estimator, name)))
+
+
+def load_requests():
+    """Turn each Testing.csv row into a /predict style symptom list."""
+    test_data = load_dataset(os.path.join("datasets", "Testing.csv")).frame()
+    symptom_columns = test_data.columns[:-1]
+    requests = []
+    for _, row in test_data.iterrows():
+        active = [col.replace("_", " ") for col in symptom_columns if row[col] == 1]
+        requests.append({"symptoms": active})
+    return requests
+
+
+def measure(predict_fn, requests):
+    """Return (forward passes per call, mean milliseconds per call, responses)."""
+    global forward_passes
+    forward_passes = 0
+    responses = [json.dumps(predict_fn(req)) for req in requests]
+    passes_per_call = forward_passes / len(requests)
+
+    start = time.perf_counter()
+    for _ in range(REPEATS):
+        for req in requests:
+            predict_fn(req)
+    elapsed_ms = (time.perf_counter() - start) * 1000 / (REPEATS * len(requests))
+    return passes_per_call, elapsed_ms, responses
+
+
+def main():
+    # Measure the models, not the prediction cache
+    predictor.prediction_cache.maxsize = 0
+    instrument_models()
+    requests = load_requests()
+
+    legacy_passes, legacy_ms, legacy_responses = measure(legacy_predict_disease, requests)
+    new_passes, new_ms, new_responses = measure(predictor.predict_disease, requests)
+
+    mismatches = sum(a != b for a, b in zip(legacy_responses, new_responses))
+
+    print(f"Requests replayed: {len(requests)} x {REPEATS}")
+    print(f"Legacy      : {legacy_passes:5.1f} forward passes/call, {legacy_ms:7.2f} ms/call")
+    print(f"Single-pass : {new_passes:5.1f} forward passes/call, {new_ms:7.2f} ms/call")
+    print(f"Saved       : {legacy_passes - new_passes:5.1f} forward passes/call, {legacy_ms - new_ms:7.2f} ms/call "
+          f"({(1 - new_ms / legacy_ms) * 100:.1f}%)")
+    print(f"Byte-for-byte JSON mismatches: {mismatches}")
+
+    if mismatches:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Parity and speed of the sparse GaussianNB tables against nb_model.predict_proba.
+
+Checks the dense (matrix), single-row and active-index entry points over
+datasets/Testing.csv, Training.csv and synthetic 1-6 symptom vectors, then
+times 1-row scoring. Exits non-zero if any probability differs by more than
+TOLERANCE.
+
+Run from the backend directory:
+    python -m benchmarks.sparse_nb
+"""
+import os
+import time
+import warnings
+
+import joblib
+import numpy as np
+
+from services.fast_inference import CompiledGaussianNB
+from services.symptom_dataset import load_dataset
+
+warnings.filterwarnings("ignore", category=UserWarning)
+
+TOLERANCE = 1e-9
+REPEATS = 2000
+
+
+def main():
+    nb_model = joblib.load(os.path.join("ml_models", "nb_model.pkl"))
+    scorer = CompiledGaussianNB.from_sklearn(nb_model)
+
+    test_X = load_dataset(os.path.join("datasets", "Testing.csv")).X
+    train_X = load_dataset(os.path.join("datasets", "Training.csv")).X
+    rng = np.random.default_rng(7)
+    synthetic = np.zeros((1000, test_X.shape[1]), dtype=int)
+    for row in synthetic:
+        row[rng.choice(test_X.shape[1], rng.integers(1, 7), replace=False)] = 1
+    X = np.vstack([test_X, train_X, synthetic])
+
+    expected = nb_model.predict_proba(X)
+    dense_diff = np.abs(scorer.predict_proba(X) - expected).max()
+    active_diff = max(
+        np.abs(scorer.predict_proba_active(np.flatnonzero(row)) - expected[i]).max()
+        for i, row in enumerate(X)
+    )
+    labels_match = np.mean(scorer.predict(X) == nb_model.predict(X))
+
+    row = synthetic[:1]
+    active = np.flatnonzero(row[0])
+    start = time.perf_counter()
+    for _ in range(REPEATS):
+        nb_model.predict_proba(row)
+    sklearn_us = (time.perf_counter() - start) * 1e6 / REPEATS
+    start = time.perf_counter()
+    for _ in range(REPEATS):
+        scorer.predict_proba_active(active)
+    sparse_us = (time.perf_counter() - start) * 1e6 / REPEATS
+
+    print(f"Rows checked: {len(X)}")
+    print(f"max |dp| matrix path : {dense_diff:.2e}")
+    print(f"max |dp| active path : {active_diff:.2e}")
+    print(f"label agreement      : {labels_match:.4f}")
+    print(f"1-row scoring        : sklearn {sklearn_us:.1f} us -> sparse tables {sparse_us:.1f} us")
+
+    if max(dense_diff, active_diff) > TOLERANCE or labels_match < 1.0:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
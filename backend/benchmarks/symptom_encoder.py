@@ -0,0 +1,108 @@
+"""
+Coverage and speed of the symptom vocabulary against the old encoders.
+
+Coverage: how many of the frontend's display names (frontend/public/symptoms.txt),
+raw model column names and typo'd variants each encoder maps to a column.
+Speed: encoding throughput of the old capitalize() + symptom_index loop and the
+chatbot's symptoms.index() scan against SymptomVocabulary.encode_batch into a
+preallocated matrix.
+
+Run from the backend directory:
+    python -m benchmarks.symptom_encoder
+"""
+import os
+import time
+
+import joblib
+import numpy as np
+
+from services.symptom_vocabulary import SymptomVocabulary, read_display_names
+
+BATCH_SIZES = [1, 64, 1024]
+REPEATS = 200
+
+
+def legacy_encode(symptom_lists, symptom_index):
+    """predict_disease's encoder before the vocabulary."""
+    rows = []
+    for input_symptoms in symptom_lists:
+        input_data = [0] * len(symptom_index)
+        for symptom in input_symptoms:
+            symptom = symptom.capitalize()
+            if symptom in symptom_index:
+                input_data[symptom_index[symptom]] = 1
+        rows.append(input_data)
+    return np.array(rows)
+
+
+def chatbot_encode(symptom_lists, symptoms):
+    """The chatbot's encoder before the vocabulary."""
+    rows = np.zeros((len(symptom_lists), len(symptoms)))
+    for row, reported in enumerate(symptom_lists):
+        for symp in reported:
+            if symp in symptoms:
+                rows[row, symptoms.index(symp)] = 1
+    return rows
+
+
+def typo(name, rng):
+    """Drop, double or swap one character of a name."""
+    i = int(rng.integers(1, len(name) - 1))
+    edit = rng.integers(3)
+    if edit == 0:
+        return name[:i] + name[i + 1:]
+    if edit == 1:
+        return name[:i] + name[i] + name[i:]
+    return name[:i - 1] + name[i] + name[i - 1] + name[i + 1:]
+
+
+def main():
+    metadata = joblib.load(os.path.join("ml_models", "metadata.pkl"))
+    symptoms = metadata["symptoms"]
+    symptom_index = metadata["symptom_index"]
+    vocabulary = SymptomVocabulary.from_metadata(metadata)
+    display_names = read_display_names()
+    rng = np.random.default_rng(3)
+
+    term_sets = {
+        "frontend names": display_names,
+        "column names": symptoms,
+        "typos": [typo(name, rng) for name in display_names]
+    }
+    print(f"{'terms':<16} {'count':>6} {'legacy':>7} {'chatbot':>8} {'vocabulary':>11}")
+    for label, terms in term_sets.items():
+        legacy = sum(term.capitalize() in symptom_index for term in terms)
+        chatbot = sum(term in symptoms for term in terms)
+        matched = sum(vocabulary.resolve(term) is not None for term in terms)
+        print(f"{label:<16} {len(terms):>6} {legacy:>7} {chatbot:>8} {matched:>11}")
+
+    _, unmatched = vocabulary.encode_batch([term_sets["typos"]])
+    print(f"unmatched typos: {unmatched[0]}")
+
+    # Typo'd terms are only counted when they resolve to the right column
+    wrong = [
+        (term, name) for term, name in zip(term_sets["typos"], display_names)
+        if vocabulary.resolve(term) not in (None, vocabulary.resolve(name))
+    ]
+    print(f"typos resolved to the wrong column: {wrong}")
+
+    print(f"\n{'batch':>6} {'legacy rows/s':>14} {'chatbot rows/s':>15} {'vocabulary rows/s':>18}")
+    for batch_size in BATCH_SIZES:
+        lists = [[display_names[j] for j in rng.choice(len(display_names), rng.integers(1, 7), replace=False)]
+                 for _ in range(batch_size)]
+        column_lists = [[name.strip().lower().replace(" ", "_") for name in names] for names in lists]
+        out = np.zeros((batch_size, vocabulary.size), dtype=np.uint8)
+        repeats = max(1, REPEATS * 64 // batch_size)
+        timings = []
+        for encode in (lambda: legacy_encode(lists, symptom_index),
+                       lambda: chatbot_encode(column_lists, symptoms),
+                       lambda: vocabulary.encode_batch(lists, out)):
+            start = time.perf_counter()
+            for _ in range(repeats):
+                encode()
+            timings.append(batch_size * repeats / (time.perf_counter() - start))
+        print(f"{batch_size:>6} {timings[0]:>14.0f} {timings[1]:>15.0f} {timings[2]:>18.0f}")
+
+
+if __name__ == "__main__":
+    main()
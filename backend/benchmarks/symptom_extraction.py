@@ -0,0 +1,159 @@
+"""
+Throughput of the chatbot symptom extractor on long messages.
+
+Compares, over synthetic messages of --lengths words (filler sentences with
+symptom phrasings and some negated mentions mixed in):
+    legacy        extract_symptoms as it was: a substring test of every
+                  keyword of the 13 keyword-mapped symptoms
+    legacy-full   the same loop over every pattern the matcher knows, i.e.
+                  what the old approach costs at full vocabulary coverage
+    matcher       services/symptom_matcher.py (one Aho–Corasick pass, word
+                  boundaries, leftmost-longest, negation)
+Reports microseconds per message, MB/s and symptoms found per message, after
+checking the matcher's present / negated split on NEGATION_CASES.
+
+Run from the backend directory:
+    python -m benchmarks.symptom_extraction [--lengths 20,200,2000] [--messages 200]
+"""
+import argparse
+import random
+import time
+
+from services.chatbot_predictor import symptom_matcher, symptom_synonyms
+from services.predictor import current_models
+from services.symptom_vocabulary import normalize_symptom
+
+# symptom_keywords of the chatbot before the matcher
+LEGACY_KEYWORDS = {
+    "fever": ["fever", "high temperature", "hot", "burning up"],
+    "fatigue": ["tired", "fatigue", "exhausted", "no energy", "weakness"],
+    "headache": ["headache", "head pain", "migraine", "head hurts"],
+    "skin_rash": ["rash", "skin eruption", "hives", "spots"],
+    "cough": ["cough", "coughing", "hacking"],
+    "nausea": ["nausea", "feel sick", "queasy", "want to vomit"],
+    "vomiting": ["vomit", "throwing up", "puking"],
+    "diarrhoea": ["diarrhea", "diarrhoea", "loose stools", "loose bowels"],
+    "chest_pain": ["chest pain", "chest tightness", "chest discomfort"],
+    "breathlessness": ["shortness of breath", "can't breathe", "hard to breathe", "breathless"],
+    "joint_pain": ["joint pain", "painful joints", "sore joints", "arthritis"],
+    "abdominal_pain": ["stomach pain", "abdominal pain", "tummy hurts", "belly pain"],
+    "back_pain": ["back pain", "backache", "sore back", "back hurts"],
+}
+
+FILLER = [
+    "I have been feeling off since last week", "it started after the trip",
+    "my sister had something similar", "I went to work anyway", "it gets worse in the evening",
+    "I tried drinking more water", "the pharmacy suggested some tablets", "I slept badly again"
+]
+
+
+# (message, present, negated) the matcher must reproduce exactly
+NEGATION_CASES = [
+    ("no fever or cough", [], ["high_fever", "cough"]),
+    ("I have no fever and I have a headache", ["headache"], ["high_fever"]),
+    ("not feeling well, vomiting a lot", ["vomiting"], []),
+    ("Im not sure, I have itching", ["itching"], []),
+    ("no headache and I have vomiting", ["vomiting"], ["headache"]),
+    ("I have been vomiting, no fever", ["vomiting"], ["high_fever"]),
+    ("no fever but a bad cough", ["cough"], ["high_fever"]),
+]
+
+
+def check_negation():
+    """Print OK / FAIL per NEGATION_CASES message; return the number of failures."""
+    failures = 0
+    for message, present, negated in NEGATION_CASES:
+        found = symptom_matcher.extract(message)
+        ok = found == (present, negated)
+        failures += not ok
+        print(f"{'OK  ' if ok else 'FAIL'} {message!r}: present {found[0]}, negated {found[1]}")
+    return failures
+
+
+def substring_extract(text, keywords):
+    """The legacy loop: every keyword of every symptom tested against the lowered message."""
+    found_symptoms = []
+    text = text.lower()
+    for symptom, phrases in keywords.items():
+        for keyword in phrases:
+            if keyword in text:
+                found_symptoms.append(symptom)
+                break
+    return list(set(found_symptoms))
+
+
+def full_keywords():
+    """Every symptom phrasing the matcher knows, in the legacy keyword layout."""
+    vocabulary = current_models().vocabulary
+    keywords = {}
+    for key, col in vocabulary.index.items():
+        keywords.setdefault(vocabulary.symptoms[col], []).append(key)
+    for name, phrases in symptom_synonyms.items():
+        keywords.setdefault(name, []).extend(normalize_symptom(phrase) for phrase in phrases)
+    return keywords
+
+
+def make_messages(count, words, phrases, seed):
+    rng = random.Random(seed)
+    messages = []
+    for _ in range(count):
+        parts, length = [], 0
+        while length < words:
+            roll = rng.random()
+            if roll < 0.3:
+                part = f"I also have {rng.choice(phrases)}"
+            elif roll < 0.4:
+                part = f"there is no {rng.choice(phrases)}"
+            else:
+                part = rng.choice(FILLER)
+            parts.append(part)
+            length += len(part.split())
+        messages.append(". ".join(parts) + ".")
+    return messages
+
+
+def measure(func, messages, repeats):
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        results = [func(message) for message in messages]
+        best = min(best, time.perf_counter() - start)
+    return best, sum(len(result) for result in results) / len(messages)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chatbot symptom extraction throughput")
+    parser.add_argument("--lengths", default="20,200,2000", help="words per message")
+    parser.add_argument("--messages", type=int, default=200)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    failures = check_negation()
+    print()
+    keywords = full_keywords()
+    phrases = sorted({phrase for phrase_list in keywords.values() for phrase in phrase_list})
+    extractors = {
+        "legacy": lambda text: substring_extract(text, LEGACY_KEYWORDS),
+        "legacy-full": lambda text: substring_extract(text, keywords),
+        "matcher": lambda text: symptom_matcher.extract(text)[0]
+    }
+    print(f"Matcher: {symptom_matcher.n_patterns} patterns, {len(symptom_matcher.goto)} states; "
+          f"legacy-full: {sum(len(p) for p in keywords.values())} keywords\n")
+
+    print(f"{'words':>6} {'extractor':<12} {'us/message':>11} {'MB/s':>8} {'symptoms/message':>17}")
+    for words in [int(n) for n in args.lengths.split(",")]:
+        messages = make_messages(args.messages, words, phrases, args.seed)
+        megabytes = sum(len(message) for message in messages) / 1e6
+        baseline = None
+        for name, func in extractors.items():
+            seconds, found = measure(func, messages, args.repeats)
+            baseline = baseline or seconds
+            print(f"{words:>6} {name:<12} {seconds / len(messages) * 1e6:>11.1f} {megabytes / seconds:>8.2f} {found:>17.1f}"
+                  + (f"  ({baseline / seconds:.1f}x legacy)" if name != "legacy" else ""), flush=True)
+    if failures:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
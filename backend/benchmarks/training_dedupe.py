@@ -0,0 +1,104 @@
+"""
+Training time and held-out quality with and without duplicate compaction.
+
+Both variants refit clones of the trained models in ml_models (same
+hyperparameters) the way modeltraining.py does:
+    full     base models on the SMOTETomek-resampled training split,
+             ensembles on the training split
+    dedupe   every model on the unique rows of the split, weighted by their
+             counts (class-balanced for the base models, as --dedupe trains)
+A 5-fold NB grid search is timed both ways too. Held-out rows are the split's
+test rows plus Testing.csv, each with sparse 1-6 symptom samples, since full
+profiles are classified perfectly by every model.
+
+Run from the backend directory after modeltraining.py:
+    python -m benchmarks.training_dedupe
+"""
+import os
+import time
+
+import joblib
+import numpy as np
+from sklearn.base import clone
+from sklearn.metrics import accuracy_score, f1_score
+
+from build_profile_index import sparse_samples
+from modeltraining import (
+    DATA_PATH_TEST, DATA_PATH_TRAIN, GaussianNB, NB_PARAM_GRID, MODELS_DIR,
+    dedupe, ensemble_rows, fit_kwargs, load_data, resample, search, split
+)
+from services.symptom_dataset import load_dataset
+
+BASE_MODELS = ["svm", "nb", "rf", "xgb"]
+ENSEMBLES = ["voting", "stacking"]
+
+
+def held_out_rows(data, split_data, per_row=3, seed=24):
+    test = load_dataset(DATA_PATH_TEST)
+    X = np.vstack([split_data["X_test"].values, test.X])
+    y = np.concatenate([split_data["y_test"].values, data["label_encoder"].transform(test.labels)])
+    return np.vstack([X, sparse_samples(X, per_row, seed)]), np.concatenate([y, np.repeat(y, per_row)])
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+
+def main():
+    templates = {}
+    for name in BASE_MODELS + ENSEMBLES:
+        path = os.path.join(MODELS_DIR, f"{name}_model.pkl")
+        if os.path.exists(path):
+            templates[name] = joblib.load(path)
+        else:
+            print(f"⚠️ {path} not found, skipping {name}")
+
+    data = load_data(DATA_PATH_TRAIN, n_jobs=1)
+    split_data = split(data, n_jobs=1)
+    compact, dedupe_s = timed(lambda: dedupe(split_data, n_jobs=1))
+    X_eval, y_eval = held_out_rows(data, split_data)
+    print(f"Held-out rows: {len(X_eval)}\n")
+
+    variants = {}
+    for variant, use_dedupe in [("full", False), ("dedupe", True)]:
+        rows, prep_s = timed(lambda: resample(split_data, compact, use_dedupe, n_jobs=1))
+        if use_dedupe:
+            prep_s += dedupe_s
+        X_ens, y_ens, ens_kwargs = ensemble_rows(split_data, compact, use_dedupe)
+        results = {"prepare": {"seconds": prep_s, "rows": len(rows["y"])}}
+        for name, template in templates.items():
+            if name in ENSEMBLES:
+                model, seconds = timed(lambda: clone(template).fit(X_ens, y_ens, **ens_kwargs))
+            else:
+                model, seconds = timed(lambda: clone(template).fit(rows["X"], rows["y"], **fit_kwargs(rows["sample_weight"])))
+            labels = model.predict(X_eval)
+            results[name] = {
+                "seconds": seconds,
+                "accuracy": accuracy_score(y_eval, labels),
+                "f1": f1_score(y_eval, labels, average="macro")
+            }
+            print(f"{variant:<7} {name:<9} fit {seconds:6.2f} s", flush=True)
+        _, seconds = timed(lambda: search(rows, "NB", GaussianNB(), NB_PARAM_GRID, "grid", n_jobs=1))
+        results["nb_grid_search"] = {"seconds": seconds}
+        variants[variant] = results
+
+    full, compacted = variants["full"], variants["dedupe"]
+    print(f"\n{'step':<15} {'full s':>8} {'dedupe s':>9} {'speed-up':>9} {'acc full':>9} {'acc dedupe':>11} "
+          f"{'F1 full':>8} {'F1 dedupe':>10}")
+    for step in full:
+        before, after = full[step], compacted[step]
+        line = f"{step:<15} {before['seconds']:>8.2f} {after['seconds']:>9.2f} {before['seconds'] / max(after['seconds'], 1e-9):>8.1f}x"
+        if "accuracy" in before:
+            line += (f" {before['accuracy']:>9.4f} {after['accuracy']:>11.4f} "
+                     f"{before['f1']:>8.4f} {after['f1']:>10.4f}")
+        print(line)
+    total_before = sum(step["seconds"] for step in full.values())
+    total_after = sum(step["seconds"] for step in compacted.values())
+    print(f"{'total':<15} {total_before:>8.2f} {total_after:>9.2f} {total_before / total_after:>8.1f}x")
+    print(f"Training rows: {full['prepare']['rows']} -> {compacted['prepare']['rows']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Per-worker memory of gunicorn workers serving the models, with and without
+memory-mapped artifacts.
+
+Starts gunicorn with 4, 8 and 16 workers (no --preload, like the default
+deployment) on a minimal WSGI app that loads services/predictor.py and
+services/chatbot_predictor.py. Once every worker has loaded and scored a
+request, reads /proc/<pid>/smaps_rollup of each worker and prints mean RSS,
+PSS (RSS with shared pages split between the processes mapping them) and USS
+(private pages), plus the total PSS of all workers.
+
+Configurations:
+    pickles          default: every worker unpickles a private copy
+    pickles+mmap     MODEL_MMAP=true: arrays inside the pickles are shared maps
+    compiled+mmap    MODEL_MMAP=true and every model on the compiled engine
+                     (run compile_models.py first)
+
+Run from the backend directory (Linux only, needs gunicorn):
+    python -m benchmarks.worker_memory [--workers 4,8,16]
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+READY_DIR_ENV = "WORKER_MEMORY_READY_DIR"
+
+CONFIGS = {
+    "pickles": {"MODEL_MMAP": "false", "FAST_INFERENCE_MODELS": ""},
+    "pickles+mmap": {"MODEL_MMAP": "true", "FAST_INFERENCE_MODELS": ""},
+    "compiled+mmap": {
+        "MODEL_MMAP": "true",
+        "FAST_INFERENCE_MODELS": "svm_model,nb_model,rf_model,xgb_model,voting_model,stacking_model"
+    },
+}
+
+if os.getenv(READY_DIR_ENV):
+    # Imported by a gunicorn worker: load everything, serve one request, report ready
+    from services import chatbot_predictor  # noqa: F401
+    from services.predictor import predict_disease
+
+    predict_disease({"symptoms": ["itching", "skin rash", "nodal skin eruptions"]})
+    open(os.path.join(os.environ[READY_DIR_ENV], str(os.getpid())), "w").close()
+
+
+def application(environ, start_response):
+    body = json.dumps(predict_disease({"symptoms": ["headache", "nausea"]})).encode()
+    start_response("200 OK", [("Content-Type", "application/json")])
+    return [body]
+
+
+def read_memory(pid):
+    """RSS / PSS / USS of one process in MiB, from /proc/<pid>/smaps_rollup."""
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                fields[parts[0].rstrip(":")] = int(parts[1]) / 1024
+    return {
+        "rss": fields["Rss"],
+        "pss": fields["Pss"],
+        "uss": fields["Private_Clean"] + fields["Private_Dirty"]
+    }
+
+
+def measure(config, workers, timeout):
+    ready_dir = tempfile.mkdtemp()
+    env = {**os.environ, **CONFIGS[config], READY_DIR_ENV: ready_dir}
+    server = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-w", str(workers), "-b", "127.0.0.1:0",
+         "--timeout", str(timeout), "benchmarks.worker_memory:application"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        deadline = time.time() + timeout
+        while len(os.listdir(ready_dir)) < workers:
+            if time.time() > deadline or server.poll() is not None:
+                raise RuntimeError(f"{config}: only {len(os.listdir(ready_dir))}/{workers} workers became ready")
+            time.sleep(0.5)
+        time.sleep(1)
+        return [read_memory(int(pid)) for pid in os.listdir(ready_dir)]
+    finally:
+        server.terminate()
+        server.wait()
+        shutil.rmtree(ready_dir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-worker RSS/PSS/USS of gunicorn workers")
+    parser.add_argument("--workers", default="4,8,16")
+    parser.add_argument("--configs", default=",".join(CONFIGS))
+    parser.add_argument("--timeout", type=int, default=600, help="seconds to wait for all workers to load")
+    args = parser.parse_args()
+
+    print(f"{'config':<15} {'workers':>7} {'RSS/worker':>11} {'PSS/worker':>11} {'USS/worker':>11} {'total PSS':>10}  (MiB)")
+    for config in args.configs.split(","):
+        for workers in [int(n) for n in args.workers.split(",")]:
+            memory = measure(config, workers, args.timeout)
+            mean = {key: sum(m[key] for m in memory) / len(memory) for key in ("rss", "pss", "uss")}
+            total_pss = sum(m["pss"] for m in memory)
+            print(f"{config:<15} {workers:>7} {mean['rss']:>11.1f} {mean['pss']:>11.1f} {mean['uss']:>11.1f} {total_pss:>10.1f}",
+                  flush=True)
+
+
+if __name__ == "__main__":
+    main()
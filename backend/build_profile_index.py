@@ -0,0 +1,113 @@
+"""
+Build the exact symptom-profile index used by services/predictor.py.
+
+Every distinct symptom row of datasets/Training.csv is stored as its packed
+bitset with the count of each prognosis seen for it; predict_disease answers
+an exact match with the majority label (prediction_type "profile-index")
+without running any model.
+
+Also reports how often the index label agrees with the served ensemble label
+(voting, or the serving composition) on the indexed profiles, the hit rate on
+Testing.csv and on sparse 1-6 symptom samples, and lookup vs. ensemble latency.
+
+Run from the backend directory after modeltraining.py:
+    python build_profile_index.py [--output ml_models/profile_index.npz]
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+
+from services.model_versions import file_sha256
+from services.predictor import PROFILE_INDEX_PATH, current_models, run_serving
+from services.prediction_cache import symptom_bitset
+from services.symptom_dataset import load_dataset
+
+TRAINING_CSV = os.path.join("datasets", "Training.csv")
+TESTING_CSV = os.path.join("datasets", "Testing.csv")
+
+
+def build_index(X, y):
+    """Distinct rows as packed bitsets, and a (profiles x classes) label count matrix."""
+    bitsets = np.packbits(X.astype(bool), axis=1)
+    bitsets, profile_of_row = np.unique(bitsets, axis=0, return_inverse=True)
+    classes, label_of_row = np.unique(y, return_inverse=True)
+    counts = np.zeros((len(bitsets), len(classes)), dtype=np.uint32)
+    np.add.at(counts, (profile_of_row.ravel(), label_of_row), 1)
+    return bitsets, classes, counts
+
+
+def sparse_samples(X, per_row, seed=24):
+    """1-6 symptom subsets of each row, like the partial inputs users send."""
+    rng = np.random.default_rng(seed)
+    samples = np.zeros((len(X) * per_row, X.shape[1]), dtype=np.uint8)
+    for i, row in enumerate(np.repeat(X, per_row, axis=0)):
+        active = np.flatnonzero(row)
+        samples[i, rng.choice(active, min(len(active), rng.integers(1, 7)), replace=False)] = 1
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the exact symptom-profile index")
+    parser.add_argument("--output", default=PROFILE_INDEX_PATH)
+    parser.add_argument("--sparse-samples", type=int, default=3, help="sparse samples per Testing.csv row for the hit rate")
+    args = parser.parse_args()
+
+    models = current_models()
+    data = load_dataset(TRAINING_CSV)
+    X, y = np.asarray(data.X), data.labels
+    if X.shape[1] != models.vocabulary.size:
+        raise SystemExit(f"❌ {TRAINING_CSV} has {X.shape[1]} symptom columns, the models expect {models.vocabulary.size}")
+
+    start = time.perf_counter()
+    bitsets, classes, counts = build_index(X, y)
+    build_ms = (time.perf_counter() - start) * 1000
+    ambiguous = int(((counts > 0).sum(axis=1) > 1).sum())
+
+    # Agreement of the majority label with the full ensemble on every indexed profile
+    profiles = np.unpackbits(bitsets, axis=1, count=X.shape[1])
+    ensemble_labels = np.asarray(models.prediction_classes)[run_serving(profiles, models)["final_labels"]]
+    index_labels = classes[np.argmax(counts, axis=1)]
+    agreement = float(np.mean(index_labels == ensemble_labels))
+
+    np.savez(
+        args.output,
+        bitsets=bitsets,
+        counts=counts,
+        classes=classes.astype(str),
+        n_symptoms=X.shape[1],
+        source_sha256=file_sha256(TRAINING_CSV),
+        model_version=models.fingerprint,
+        ensemble_agreement=agreement
+    )
+
+    index = {bitset.tobytes() for bitset in bitsets}
+    test_X = load_dataset(TESTING_CSV).X
+    sparse_X = sparse_samples(test_X, args.sparse_samples)
+    test_hits = np.mean([symptom_bitset(row) in index for row in test_X])
+    sparse_hits = np.mean([symptom_bitset(row) in index for row in sparse_X])
+
+    row = profiles[:1]
+    repeats = 200
+    start = time.perf_counter()
+    for _ in range(repeats):
+        symptom_bitset(row[0]) in index
+    lookup_us = (time.perf_counter() - start) * 1e6 / repeats
+    start = time.perf_counter()
+    for _ in range(repeats // 10):
+        run_serving(row, models)
+    ensemble_us = (time.perf_counter() - start) * 1e6 / (repeats // 10)
+
+    print(f"Training rows        : {len(X)} in {build_ms:.1f} ms")
+    print(f"Distinct profiles    : {len(bitsets)} ({ambiguous} with more than one prognosis)")
+    print(f"Index file           : {args.output} ({os.path.getsize(args.output) / 1024:.1f} KiB)")
+    print(f"Ensemble agreement   : {agreement:.4f} on indexed profiles")
+    print(f"Hit rate Testing.csv : {test_hits:.3f}")
+    print(f"Hit rate sparse 1-6  : {sparse_hits:.3f}")
+    print(f"1-row latency        : ensemble {ensemble_us:.0f} us -> index lookup {lookup_us:.1f} us")
+    print(f"✅ Profile index saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Parity check of the client-side NB bundle (services/client_bundle.py).
+
+Builds the bundle GET /prediction/client_bundle serves for the models in
+--models-dir and checks:
+    reference   BundleScorer against the served GaussianNB on
+                datasets/Testing.csv, a sample of Training.csv rows and
+                synthetic sparse symptom vectors (float32 tables, so within
+                the compiled engine's float32 NB tolerance, and identical
+                labels on Testing.csv), and on symptom-name lists encoded by
+                the bundle's own spellings against the server's vocabulary
+    browser     frontend/src/utils/nbBundle.js, run with Node.js when it is
+                installed, against the reference scorer on the same lists
+
+Run from the backend directory:
+    python check_client_bundle.py [--models-dir ml_models] [--output nb_bundle.bin]
+"""
+import argparse
+import gzip
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+
+import numpy as np
+
+from compile_models import FLOAT32_TOLERANCES, parity_inputs
+from services.client_bundle import BundleScorer, get_bundle
+from services.model_versions import resolve_models_dir
+from services.predictor import ModelSet
+
+FRONTEND_SCORER = os.path.join("..", "frontend", "src", "utils", "nbBundle.js")
+
+# Scores one symptom list per input line with the browser scorer
+NODE_SCRIPT = """
+import { readFileSync } from 'fs';
+import { pathToFileURL } from 'url';
+const { parseBundle, scoreSymptoms } = await import(pathToFileURL(process.argv[1]).href);
+const data = readFileSync(process.argv[2]);
+const bundle = parseBundle(data.buffer.slice(data.byteOffset, data.byteOffset + data.byteLength));
+const lists = JSON.parse(readFileSync(process.argv[3], 'utf8'));
+console.log(JSON.stringify(lists.map((symptoms) => scoreSymptoms(bundle, symptoms).probabilities)));
+"""
+
+
+def symptom_lists(X, symptoms):
+    """Symptom names of every row, spelled like the frontend list ('skin rash')."""
+    return [[symptoms[col].replace("_", " ").strip() for col in np.flatnonzero(row)] for row in X]
+
+
+def run_browser_scorer(data, lists):
+    """Probabilities from nbBundle.js under Node.js, or None without node."""
+    if shutil.which("node") is None or not os.path.exists(FRONTEND_SCORER):
+        return None
+    with tempfile.TemporaryDirectory() as scratch:
+        bundle_path = os.path.join(scratch, "bundle.bin")
+        lists_path = os.path.join(scratch, "lists.json")
+        with open(bundle_path, "wb") as f:
+            f.write(data)
+        with open(lists_path, "w") as f:
+            json.dump(lists, f)
+        done = subprocess.run(
+            ["node", "--input-type=module", "-e", NODE_SCRIPT, "--", os.path.abspath(FRONTEND_SCORER), bundle_path, lists_path],
+            capture_output=True, text=True, check=True
+        )
+    return np.array(json.loads(done.stdout))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the client NB bundle against the served model")
+    parser.add_argument("--models-dir", default=None, help="default: the active version")
+    parser.add_argument("--output", help="also write the bundle here")
+    args = parser.parse_args()
+
+    models = ModelSet(args.models_dir or resolve_models_dir())
+    data, etag = get_bundle(models)
+    print(f"Bundle {etag} for model version {models.version}: {len(data) / 1024:.1f} KiB, "
+          f"{len(gzip.compress(data)) / 1024:.1f} KiB gzipped")
+    if args.output:
+        with open(args.output, "wb") as f:
+            f.write(data)
+
+    scorer = BundleScorer(data)
+    tolerance = FLOAT32_TOLERANCES["gaussian_nb"]
+    test_X, all_X = parity_inputs(models.vocabulary.size)
+    failures = 0
+
+    expected = models.nb_model.predict_proba(all_X)
+    actual = scorer.predict_proba(all_X)
+    max_diff = float(np.abs(expected - actual).max())
+    test_match = float(np.mean(np.argmax(expected[:len(test_X)], axis=1) == np.argmax(actual[:len(test_X)], axis=1)))
+    all_match = float(np.mean(np.argmax(expected, axis=1) == np.argmax(actual, axis=1)))
+    ok = max_diff <= tolerance and test_match == 1.0
+    failures += not ok
+    print(f"{'OK  ' if ok else 'FAIL'} reference rows   max|dp|={max_diff:.2e} (tolerance {tolerance:.0e})  "
+          f"labels Testing={test_match:.3f} all={all_match:.3f}")
+
+    lists = symptom_lists(all_X, models.vocabulary.symptoms)
+    encoded, _ = models.vocabulary.encode_batch(lists)
+    by_name = np.array([scorer.predict_proba_active(scorer.encode(symptoms)[0]) for symptoms in lists])
+    max_diff = float(np.abs(by_name - models.nb_model.predict_proba(encoded)).max())
+    ok = max_diff <= tolerance and np.array_equal(encoded, all_X)
+    failures += not ok
+    print(f"{'OK  ' if ok else 'FAIL'} reference names  max|dp|={max_diff:.2e}  "
+          f"names encode to the same rows: {np.array_equal(encoded, all_X)}")
+
+    browser = run_browser_scorer(data, lists)
+    if browser is None:
+        print("SKIP browser scorer (no node or no frontend checkout)")
+    else:
+        max_diff = float(np.abs(browser - by_name).max())
+        labels_match = float(np.mean(np.argmax(browser, axis=1) == np.argmax(by_name, axis=1)))
+        ok = max_diff <= 1e-9 and labels_match == 1.0
+        failures += not ok
+        print(f"{'OK  ' if ok else 'FAIL'} browser scorer   max|dp|={max_diff:.2e} vs reference  labels={labels_match:.3f}")
+
+    if failures:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
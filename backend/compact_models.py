@@ -0,0 +1,339 @@
+"""
+Compact the fitted artifacts for serving and publish them as a new model version.
+
+Steps, applied to the standalone models and to the members of the voting and
+stacking ensembles:
+    forests    keep the fewest trees / shallowest depth whose labels still agree
+               with the unpruned forest on --min-agreement of the calibration
+               rows (the same rows fit_cascade.py uses)
+    SVC        merge duplicate support vectors of a class (identical rows, so
+               their dual coefficients simply add up)
+    NB / LR    parameters stored as float32
+    ensembles  drop the fitted copies kept in the voting / stacking `estimators`
+               parameter (training-only; predictions use estimators_)
+    compiled/  recompiled with float32 / int32 arrays when the source has one
+    export/    the portable export, rebuilt when the source has one
+feature_selector.pkl (training-only) and cascade_thresholds.json (fitted for the
+old artifacts) are not carried over.
+
+Size, load time, 1/64-row latency and accuracy / macro F1 on Testing.csv are
+reported before and after for every artifact and for the served ensemble. The
+compacted set is published with publish_models.py's versioning only if the
+ensemble keeps --min-accuracy, loses at most --max-accuracy-drop and agrees with
+the original ensemble on --min-agreement of the calibration rows.
+
+Run from the backend directory after modeltraining.py (and compile_models.py):
+    python compact_models.py [--source ml_models] [--output ml_models/compact] [--no-publish]
+"""
+import argparse
+import copy
+import json
+import os
+import shutil
+import time
+import warnings
+
+import joblib
+import numpy as np
+from sklearn.base import clone
+from sklearn.metrics import accuracy_score, f1_score
+from sklearn.tree._tree import TREE_LEAF, TREE_UNDEFINED, Tree
+
+from compile_models import compile_directory
+from export_models import check_export, export
+from fit_cascade import calibration_rows
+from services.model_versions import publish_version
+from services.portable_model import EXPORT_DIR_NAME
+from services.predictor import ModelSet, run_inference
+from services.symptom_dataset import load_dataset
+
+warnings.filterwarnings("ignore", category=UserWarning)
+
+MODEL_ARTIFACTS = ["svm_model", "nb_model", "rf_model", "xgb_model", "voting_model", "stacking_model"]
+COPIED_ARTIFACTS = ["label_encoder.pkl", "metadata.pkl", "ensemble_weights.pkl", "profile_index.npz"]
+REPORT_NAME = "compaction_report.json"
+
+# Forest pruning candidates (None = unpruned depth); tree counts are fractions of the forest
+DEPTH_CANDIDATES = [None, 40, 30, 25, 20, 15, 12, 10, 8]
+TREE_FRACTIONS = [1.0, 0.75, 0.5, 0.4, 0.3, 0.25, 0.2, 0.1]
+MIN_TREES = 5
+
+# Attributes only fit-time tooling reads
+TRAINING_ONLY_ATTRIBUTES = ["oob_score_", "oob_decision_function_", "evals_result_", "cv_results_"]
+
+
+def prune_tree(estimator, max_depth):
+    """Fitted decision tree cut at max_depth: deeper subtrees become leaves, unreachable nodes are dropped."""
+    tree = estimator.tree_
+    state = tree.__getstate__()
+    nodes, values = state["nodes"], state["values"]
+
+    # Pre-order walk of the nodes that survive the cut
+    order, depths = [], []
+    stack = [(0, 0)]
+    while stack:
+        node, depth = stack.pop()
+        order.append(node)
+        depths.append(depth)
+        if nodes["left_child"][node] != TREE_LEAF and depth < max_depth:
+            stack.append((nodes["right_child"][node], depth + 1))
+            stack.append((nodes["left_child"][node], depth + 1))
+
+    order = np.array(order)
+    new_id = np.full(len(nodes), TREE_LEAF, dtype=np.intp)
+    new_id[order] = np.arange(len(order))
+    leaf = (nodes["left_child"][order] == TREE_LEAF) | (np.array(depths) >= max_depth)
+
+    new_nodes = nodes[order].copy()
+    new_nodes["left_child"] = np.where(leaf, TREE_LEAF, new_id[nodes["left_child"][order]])
+    new_nodes["right_child"] = np.where(leaf, TREE_LEAF, new_id[nodes["right_child"][order]])
+    new_nodes["feature"][leaf] = TREE_UNDEFINED
+    new_nodes["threshold"][leaf] = TREE_UNDEFINED
+
+    pruned_tree = Tree(tree.n_features, np.asarray(tree.n_classes, dtype=np.intp), tree.n_outputs)
+    pruned_tree.__setstate__({
+        "max_depth": int(min(state["max_depth"], max_depth)),
+        "node_count": len(order),
+        "nodes": new_nodes,
+        "values": np.ascontiguousarray(values[order])
+    })
+    pruned = copy.copy(estimator)
+    pruned.tree_ = pruned_tree
+    return pruned
+
+
+def compact_forest(forest, X, min_agreement):
+    """Prune a random forest in place to its smallest node count that keeps min_agreement; return a note."""
+    reference = forest.predict(X)
+    X = np.asarray(X, dtype=np.float32)
+    n_trees = len(forest.estimators_)
+    tree_counts = sorted({max(MIN_TREES, int(n_trees * fraction)) for fraction in TREE_FRACTIONS if fraction * n_trees >= MIN_TREES} | {n_trees})
+    original_nodes = sum(estimator.tree_.node_count for estimator in forest.estimators_)
+    best = (original_nodes, None, n_trees, forest.estimators_, 1.0)
+
+    for depth in DEPTH_CANDIDATES:
+        trees = forest.estimators_ if depth is None else [prune_tree(estimator, depth) for estimator in forest.estimators_]
+        # Forest probabilities are the mean over trees, so every prefix length is a running sum
+        total = np.zeros((len(X), len(forest.classes_)))
+        for count, tree in enumerate(trees, start=1):
+            total += tree.predict_proba(X, check_input=False)
+            if count not in tree_counts:
+                continue
+            agreement = float(np.mean(forest.classes_[np.argmax(total, axis=1)] == reference))
+            node_count = sum(t.tree_.node_count for t in trees[:count])
+            if agreement >= min_agreement and node_count < best[0]:
+                best = (node_count, depth, count, trees[:count], agreement)
+
+    node_count, depth, count, trees, agreement = best
+    forest.estimators_ = list(trees)
+    forest.n_estimators = count
+    return (f"forest {n_trees} -> {count} trees, depth {'unpruned' if depth is None else f'<= {depth}'}, "
+            f"{original_nodes} -> {node_count} nodes (agreement {agreement:.4f})")
+
+
+def merge_support_vectors(svc):
+    """Merge identical support vectors of the same class in place (their dual coefficients add up); return a note."""
+    starts = np.concatenate([[0], np.cumsum(svc._n_support)])
+    vectors, dual_coef, public_coef, support, n_support = [], [], [], [], []
+    for c in range(len(svc._n_support)):
+        block = slice(starts[c], starts[c + 1])
+        unique, first, inverse = np.unique(svc.support_vectors_[block], axis=0, return_index=True, return_inverse=True)
+        inverse = inverse.ravel()
+        for source, target in ((svc._dual_coef_, dual_coef), (svc.dual_coef_, public_coef)):
+            merged = np.zeros((source.shape[0], len(unique)))
+            np.add.at(merged.T, inverse, source[:, block].T)
+            target.append(merged)
+        vectors.append(unique)
+        support.append(svc.support_[block][first])
+        n_support.append(len(unique))
+
+    before = len(svc.support_vectors_)
+    svc.support_vectors_ = np.ascontiguousarray(np.vstack(vectors), dtype=np.float64)
+    svc._dual_coef_ = np.ascontiguousarray(np.hstack(dual_coef))
+    svc.dual_coef_ = np.ascontiguousarray(np.hstack(public_coef))
+    svc.support_ = np.concatenate(support).astype(np.int32)
+    svc._n_support = np.array(n_support, dtype=np.int32)
+    return f"support vectors {before} -> {len(svc.support_vectors_)}"
+
+
+def downcast_parameters(model, names):
+    for name in names:
+        setattr(model, name, np.asarray(getattr(model, name), dtype=np.float32))
+    return f"float32 {', '.join(names)}"
+
+
+def strip_training_attributes(model):
+    stripped = [name for name in TRAINING_ONLY_ATTRIBUTES if name in vars(model)]
+    for name in stripped:
+        delattr(model, name)
+    return stripped
+
+
+def compact_estimator(model, X, min_agreement):
+    """Compact one fitted estimator in place; return notes on what changed."""
+    notes = []
+    kind = type(model).__name__
+    if kind == "RandomForestClassifier":
+        notes.append(compact_forest(model, X, min_agreement))
+    elif kind == "SVC":
+        notes.append(merge_support_vectors(model))
+    elif kind == "GaussianNB":
+        notes.append(downcast_parameters(model, ["theta_", "var_"]))
+    elif kind == "LogisticRegression":
+        notes.append(downcast_parameters(model, ["coef_", "intercept_"]))
+    elif kind in ("VotingClassifier", "StackingClassifier"):
+        # The `estimators` parameter still holds the fitted models passed in at training time
+        model.estimators = [(name, estimator if estimator == "drop" else clone(estimator)) for name, estimator in model.estimators]
+        notes.append("dropped fitted copies in `estimators`")
+        for name, member in model.named_estimators_.items():
+            notes += [f"{name}: {note}" for note in compact_estimator(member, X, min_agreement)]
+        if kind == "StackingClassifier":
+            notes += [f"final_estimator: {note}" for note in compact_estimator(model.final_estimator_, model.transform(X), min_agreement)]
+    stripped = strip_training_attributes(model)
+    if stripped:
+        notes.append(f"stripped {', '.join(stripped)}")
+    return notes
+
+
+def directory_bytes(path):
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+
+def time_calls(func, X, repeats):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        func(X)
+    return (time.perf_counter() - start) * 1000 / repeats
+
+
+def measure_artifact(path, test_X, test_y):
+    start = time.perf_counter()
+    model = joblib.load(path)
+    load_ms = (time.perf_counter() - start) * 1000
+    predicted = model.predict(test_X)
+    return {
+        "file_bytes": os.path.getsize(path),
+        "load_ms": load_ms,
+        "latency_1_ms": time_calls(model.predict_proba, test_X[:1], 20),
+        "latency_64_ms": time_calls(model.predict_proba, np.resize(test_X, (64, test_X.shape[1])), 5),
+        "accuracy": float(accuracy_score(test_y, predicted)),
+        "f1_macro": float(f1_score(test_y, predicted, average="macro"))
+    }
+
+
+def measure_ensemble(models, test_X, test_y):
+    labels = run_inference(test_X, models=models)["voting_labels"]
+    return {
+        "latency_1_ms": time_calls(lambda X: run_inference(X, models=models), test_X[:1], 20),
+        "latency_64_ms": time_calls(lambda X: run_inference(X, models=models), np.resize(test_X, (64, test_X.shape[1])), 5),
+        "accuracy": float(accuracy_score(test_y, labels)),
+        "f1_macro": float(f1_score(test_y, labels, average="macro"))
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compact model artifacts and publish them if accuracy holds")
+    parser.add_argument("--source", default="ml_models")
+    parser.add_argument("--output", default=os.path.join("ml_models", "compact"))
+    parser.add_argument("--min-agreement", type=float, default=0.99, help="label agreement each pruned model and the ensemble must keep")
+    parser.add_argument("--min-accuracy", type=float, default=0.95, help="min ensemble accuracy on Testing.csv")
+    parser.add_argument("--max-accuracy-drop", type=float, default=0.0, help="max ensemble accuracy loss on Testing.csv")
+    parser.add_argument("--no-compile", action="store_true", help="do not write float32 compiled/ artifacts")
+    parser.add_argument("--no-publish", action="store_true", help="write and report only")
+    parser.add_argument("--no-activate", action="store_true", help="publish without pointing servers at the new version")
+    args = parser.parse_args()
+
+    shutil.rmtree(args.output, ignore_errors=True)
+    os.makedirs(args.output)
+    for name in COPIED_ARTIFACTS:
+        if os.path.exists(os.path.join(args.source, name)):
+            shutil.copy2(os.path.join(args.source, name), os.path.join(args.output, name))
+
+    label_encoder = joblib.load(os.path.join(args.source, "label_encoder.pkl"))
+    test_data = load_dataset(os.path.join("datasets", "Testing.csv"))
+    test_X, test_y = np.asarray(test_data.X), label_encoder.transform(test_data.labels)
+    calib_X = calibration_rows(partial_profiles=3)
+
+    report = {"source": args.source, "output": args.output, "artifacts": {}}
+    for name in MODEL_ARTIFACTS:
+        path = os.path.join(args.source, f"{name}.pkl")
+        if not os.path.exists(path):
+            continue
+        model = joblib.load(path)
+        notes = compact_estimator(model, calib_X, args.min_agreement)
+        joblib.dump(model, os.path.join(args.output, f"{name}.pkl"))
+        report["artifacts"][name] = {
+            "changes": notes,
+            "before": measure_artifact(path, test_X, test_y),
+            "after": measure_artifact(os.path.join(args.output, f"{name}.pkl"), test_X, test_y)
+        }
+
+    compile_failures = 0
+    if os.path.isdir(os.path.join(args.source, "compiled")) and not args.no_compile:
+        compile_failures = compile_directory(args.output, float32=True)
+        report["compiled"] = {
+            "before_bytes": directory_bytes(os.path.join(args.source, "compiled")),
+            "after_bytes": directory_bytes(os.path.join(args.output, "compiled"))
+        }
+    if os.path.isdir(os.path.join(args.source, EXPORT_DIR_NAME)):
+        export(args.output)
+        compile_failures += check_export(args.output)
+
+    before_models, after_models = ModelSet(args.source), ModelSet(args.output)
+    agreement = float(np.mean(
+        run_inference(calib_X, models=before_models)["voting_labels"] == run_inference(calib_X, models=after_models)["voting_labels"]
+    ))
+    report["ensemble"] = {
+        "before": measure_ensemble(before_models, test_X, test_y),
+        "after": measure_ensemble(after_models, test_X, test_y),
+        "agreement": agreement
+    }
+
+    def arrow(before, after, key, fmt, scale=1):
+        if key not in before:
+            return "-"
+        return f"{before[key] / scale:{fmt}}->{after[key] / scale:{fmt}}"
+
+    print(f"\n{'artifact':<16} {'MiB':>13} {'load ms':>11} {'1-row ms':>13} {'64-row ms':>13} {'accuracy':>12} {'F1':>12}")
+    rows = [(name, entry["before"], entry["after"]) for name, entry in report["artifacts"].items()]
+    rows.append(("ensemble", report["ensemble"]["before"], report["ensemble"]["after"]))
+    for name, before, after in rows:
+        print(f"{name:<16} {arrow(before, after, 'file_bytes', '.2f', 2**20):>13} {arrow(before, after, 'load_ms', '.0f'):>11} "
+              f"{arrow(before, after, 'latency_1_ms', '.2f'):>13} {arrow(before, after, 'latency_64_ms', '.1f'):>13} "
+              f"{arrow(before, after, 'accuracy', '.3f'):>12} {arrow(before, after, 'f1_macro', '.3f'):>12}")
+    for name, entry in report["artifacts"].items():
+        for note in entry["changes"]:
+            print(f"  {name}: {note}")
+    if "compiled" in report:
+        print(f"compiled/: {report['compiled']['before_bytes'] / 2**20:.2f} -> {report['compiled']['after_bytes'] / 2**20:.2f} MiB")
+    print(f"Ensemble agreement with the original on {len(calib_X)} calibration rows: {agreement:.4f}")
+    print("⚠️ feature_selector.pkl and cascade_thresholds.json were not carried over (re-run fit_cascade.py for the new version)")
+
+    after_accuracy = report["ensemble"]["after"]["accuracy"]
+    problems = []
+    if after_accuracy < args.min_accuracy:
+        problems.append(f"ensemble accuracy {after_accuracy:.3f} < {args.min_accuracy:.3f}")
+    if after_accuracy < report["ensemble"]["before"]["accuracy"] - args.max_accuracy_drop:
+        problems.append(f"ensemble accuracy dropped {report['ensemble']['before']['accuracy']:.3f} -> {after_accuracy:.3f}")
+    if agreement < args.min_agreement:
+        problems.append(f"ensemble agreement {agreement:.4f} < {args.min_agreement:.4f}")
+    if compile_failures:
+        problems.append(f"{compile_failures} compiled model(s) failed parity")
+
+    report["refused"] = problems
+    report["published"] = None
+    if problems:
+        print(f"❌ Not publishing: {'; '.join(problems)}")
+    elif not args.no_publish:
+        report["published"] = publish_version(args.output, activate=not args.no_activate)
+        print(f"✅ Published compacted version {report['published']}{'' if args.no_activate else ' (active)'}")
+
+    with open(os.path.join(args.output, REPORT_NAME), "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Report written to {os.path.join(args.output, REPORT_NAME)}")
+    if problems:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
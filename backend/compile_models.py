@@ -0,0 +1,189 @@
+"""
+Compile the fitted artifacts in ml_models/ into plain NumPy arrays for the
+fast inference engine (services/fast_inference.py).
+
+Every compiled model is checked against its sklearn / XGBoost original over
+datasets/Testing.csv, a sample of Training.csv rows and synthetic sparse
+symptom vectors before it is written to ml_models/compiled/.
+
+With --float32 the arrays are stored as float32 / int32 (half the size on
+disk and in mapped memory) and checked against looser FLOAT32_TOLERANCES.
+
+Run from the backend directory after modeltraining.py:
+    python compile_models.py            # compile + parity check + write
+    python compile_models.py --check    # re-check the written artifacts, write nothing
+    python compile_models.py --float32 [--models-dir ml_models]
+"""
+import argparse
+import os
+import shutil
+import time
+import warnings
+
+import joblib
+import numpy as np
+
+from services.fast_inference import EnsembleSpec, compile_model, load_compiled
+from services.symptom_dataset import load_dataset
+
+warnings.filterwarnings("ignore", category=UserWarning)
+
+MODELS_DIR = os.path.join("ml_models")
+
+# Max absolute probability difference allowed per compiled model kind.
+# SVC couples its pairwise Platt probabilities in closed form instead of
+# libsvm's iterative solver (stopping tolerance 0.005 / n_classes).
+TOLERANCES = {
+    "gaussian_nb": 1e-9,
+    "forest": 1e-9,
+    "xgboost": 1e-5,
+    "logistic_regression": 1e-9,
+    "svc": 2e-3,
+}
+
+# The same for float32 artifacts: float32 rounding (~1e-7 relative) accumulates
+# over the 132-term NB log-likelihood sums and the SVC kernel rows
+FLOAT32_TOLERANCES = {
+    "gaussian_nb": 1e-4,
+    "forest": 1e-6,
+    "xgboost": 1e-5,
+    "logistic_regression": 1e-5,
+    "svc": 2e-3,
+}
+
+
+def collect_models(models_dir=MODELS_DIR):
+    """Every fitted estimator the predictor can run, keyed by its compiled artifact name."""
+    models = {}
+    for name in ["svm_model", "nb_model", "rf_model", "xgb_model"]:
+        path = os.path.join(models_dir, f"{name}.pkl")
+        if os.path.exists(path):
+            models[name] = joblib.load(path)
+
+    for ensemble in ["voting_model", "stacking_model"]:
+        path = os.path.join(models_dir, f"{ensemble}.pkl")
+        if not os.path.exists(path):
+            continue
+        model = joblib.load(path)
+        for member, estimator in model.named_estimators_.items():
+            models[f"{ensemble}.{member}"] = estimator
+        if ensemble == "stacking_model":
+            models[f"{ensemble}.final_estimator"] = model.final_estimator_
+    return models
+
+
+def parity_inputs(n_features, n_synthetic=500, seed=42):
+    """Testing.csv rows, every 5th Training.csv row and random 1-6 symptom vectors."""
+    test_X = load_dataset(os.path.join("datasets", "Testing.csv")).X
+    train_X = load_dataset(os.path.join("datasets", "Training.csv")).X[::5]
+
+    rng = np.random.default_rng(seed)
+    synthetic = np.zeros((n_synthetic, n_features), dtype=int)
+    for row in synthetic:
+        row[rng.choice(n_features, rng.integers(1, 7), replace=False)] = 1
+    return test_X, np.vstack([test_X, train_X, synthetic])
+
+
+def check_parity(name, model, compiled, test_X, all_X, meta_inputs, tolerances=TOLERANCES):
+    """Compare probabilities and labels; return (ok, report line)."""
+    if name == "stacking_model.final_estimator":
+        test_X = all_X = meta_inputs
+
+    expected = model.predict_proba(all_X)
+    actual = compiled.predict_proba(all_X)
+    max_diff = float(np.abs(expected - actual).max())
+    test_labels_match = float(np.mean(model.predict(test_X) == compiled.predict(test_X)))
+    all_labels_match = float(np.mean(model.predict(all_X) == compiled.predict(all_X)))
+
+    x1 = all_X[:1]
+    start = time.perf_counter()
+    for _ in range(50):
+        model.predict_proba(x1)
+    sklearn_ms = (time.perf_counter() - start) * 1000 / 50
+    start = time.perf_counter()
+    for _ in range(50):
+        compiled.predict_proba(x1)
+    numpy_ms = (time.perf_counter() - start) * 1000 / 50
+
+    # Labels must agree everywhere: sparse synthetic rows hit the ties that dense Testing.csv rows never do
+    ok = max_diff <= tolerances[compiled.kind] and test_labels_match == 1.0 and all_labels_match == 1.0
+    line = (f"{'OK  ' if ok else 'FAIL'} {name:<34} max|dp|={max_diff:.2e}  "
+            f"labels Testing={test_labels_match:.3f} all={all_labels_match:.3f}  "
+            f"1-row {sklearn_ms:.3f} ms -> {numpy_ms:.3f} ms")
+    return ok, line
+
+
+def compile_directory(models_dir=MODELS_DIR, check=False, float32=False):
+    """Compile (or with check, re-check) every model in `models_dir`; return the number of failures."""
+    compiled_dir = os.path.join(models_dir, "compiled")
+    tolerances = FLOAT32_TOLERANCES if float32 else TOLERANCES
+    models = collect_models(models_dir)
+    metadata = joblib.load(os.path.join(models_dir, "metadata.pkl"))
+    test_X, all_X = parity_inputs(len(metadata["symptoms"]))
+
+    # The stacking meta-learner sees the concatenated member probabilities
+    meta_inputs = None
+    if "stacking_model.final_estimator" in models:
+        stacking_model = joblib.load(os.path.join(models_dir, "stacking_model.pkl"))
+        meta_inputs = stacking_model.transform(all_X)
+
+    compiled_models = {}
+    failures = 0
+    for name, model in models.items():
+        if check:
+            compiled = load_compiled(name, compiled_dir, mmap=True)
+        else:
+            compiled = compile_model(model)
+            if float32:
+                compiled = compiled.downcast()
+        if compiled is None:
+            print(f"MISS {name:<34} not compiled")
+            failures += 1
+            continue
+        ok, line = check_parity(name, model, compiled, test_X, all_X, meta_inputs, tolerances)
+        print(line)
+        if ok:
+            compiled_models[name] = compiled
+        else:
+            failures += 1
+
+    if check:
+        return failures
+
+    os.makedirs(compiled_dir, exist_ok=True)
+    for name in models:
+        path = os.path.join(compiled_dir, name)
+        # Replace (or, for a model that failed parity, never leave) any older compiled copy
+        shutil.rmtree(path, ignore_errors=True)
+        if os.path.exists(f"{path}.npz"):
+            os.remove(f"{path}.npz")
+        if name in compiled_models:
+            compiled_models[name].save(path)
+    # Ensemble shells, so fully compiled ensembles are served without their pickles
+    for ensemble in ["voting_model", "stacking_model"]:
+        spec_path = os.path.join(compiled_dir, f"{ensemble}.json")
+        if os.path.exists(spec_path):
+            os.remove(spec_path)
+        members = [name for name in models if name.startswith(f"{ensemble}.")]
+        if members and all(name in compiled_models for name in members):
+            EnsembleSpec.from_sklearn(joblib.load(os.path.join(models_dir, f"{ensemble}.pkl"))).save(spec_path)
+    print(f"Wrote {len(compiled_models)} compiled models to {compiled_dir}")
+
+    if failures:
+        print(f"{failures} model(s) failed the parity check and were not written")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compile ml_models/ into NumPy arrays")
+    parser.add_argument("--check", action="store_true", help="parity-check the compiled artifacts on disk without writing")
+    parser.add_argument("--float32", action="store_true", help="store float32 / int32 arrays")
+    parser.add_argument("--models-dir", default=MODELS_DIR)
+    args = parser.parse_args()
+
+    if compile_directory(args.models_dir, args.check, args.float32):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
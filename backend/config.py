@@ -16,6 +16,26 @@ class Config:
     MODEL_PATH = os.getenv("MODEL_PATH", "backend/ml/disease_prediction.pkl")
     VECTOR_PATH = os.getenv("VECTOR_PATH", "backend/ml/vectorizer.pkl")  # If using NLP
 
+    # Micro-batching for /prediction/predict
+    PREDICT_BATCHING = os.getenv("PREDICT_BATCHING", "false").lower() == "true"
+    PREDICT_BATCH_MAX_SIZE = int(os.getenv("PREDICT_BATCH_MAX_SIZE", "32"))  # Rows per batched forward pass
+    PREDICT_BATCH_MAX_WAIT_MS = float(os.getenv("PREDICT_BATCH_MAX_WAIT_MS", "5"))  # Max time a request waits for batch-mates
+
+    # Offload /prediction/predict and chatbot scoring to worker processes
+    INFERENCE_POOL = os.getenv("INFERENCE_POOL", "false").lower() == "true"
+    INFERENCE_POOL_SIZE = int(os.getenv("INFERENCE_POOL_SIZE", "2"))  # Worker processes, each with its own copy of the models
+    INFERENCE_POOL_QUEUE_DEPTH = int(os.getenv("INFERENCE_POOL_QUEUE_DEPTH", "64"))  # Waiting jobs before requests are rejected
+    INFERENCE_POOL_TIMEOUT_S = float(os.getenv("INFERENCE_POOL_TIMEOUT_S", "5"))  # Max time a request waits for its result
+
+    # Chatbot sessions: "memory" (per process), or "redis" / "mongo" to share them between workers
+    CHAT_SESSION_STORE = os.getenv("CHAT_SESSION_STORE", "memory")
+    CHAT_SESSION_TTL_S = float(os.getenv("CHAT_SESSION_TTL_S", "1800"))  # Idle time before a session is dropped
+    CHAT_SESSION_MAX_MB = float(os.getenv("CHAT_SESSION_MAX_MB", "64"))  # Memory store budget; least recently used sessions go first
+    CHAT_SESSION_REDIS_URL = os.getenv("CHAT_SESSION_REDIS_URL", "redis://localhost:6379/0")
+
+    # Bearer token for /admin (doctors, model reload/rollback); the admin API is off while it is unset
+    ADMIN_API_TOKEN = os.getenv("ADMIN_API_TOKEN", "")
+
 class DevelopmentConfig(Config):
     """Development environment configuration"""
     DEBUG = True
@@ -0,0 +1,175 @@
+"""
+Export the served ensemble into the portable, pickle-free format loaded by
+services/portable_model.py with only NumPy.
+
+The members of the serving composition (serving_config.json, or the voting
+ensemble without one) are compiled with the fast inference engine and
+written to <models dir>/export/ as graph.json plus arrays.npz; the export
+directory travels with published model versions like compiled/.
+
+Every export is parity-checked against the predictor on the pickled models
+over datasets/Testing.csv, a sample of Training.csv rows and synthetic sparse
+symptom vectors: probabilities within the compiled engine's tolerance for the
+kinds involved and identical labels on Testing.csv.
+
+Run from the backend directory after modeltraining.py (and optimize_ensemble.py):
+    python export_models.py [--models-dir ml_models] [--float32]
+    python export_models.py --check     # re-check the written export, write nothing
+"""
+import argparse
+import json
+import os
+import shutil
+from datetime import datetime
+
+import numpy as np
+
+from compile_models import FLOAT32_TOLERANCES, TOLERANCES, collect_models, parity_inputs
+from services.fast_inference import compile_model
+from services.model_versions import MODELS_DIR
+from services.portable_model import ARRAYS_NAME, FORMAT_VERSION, GRAPH_NAME, PortableEnsemble, export_dir_for
+from services.predictor import BASE_MODEL_NAMES, ModelSet, run_serving
+
+
+def serving_members(models):
+    """[(member, weight)] the predictor serves for this set (see run_serving)."""
+    if models.composition:
+        return models.composition
+    if models.voting_model is not None:
+        return [("voting", 1)]
+    # Degraded set: the ensemble_weights blend of the base models decides
+    return list(zip(models.base_models, models.ensemble_weights.tolist()))
+
+
+def build_graph(models, fitted, composition):
+    """The graph.json skeleton and the names of the fitted models it needs."""
+    ensembles, needed = {}, []
+    serving = []
+    for member, weight in composition:
+        if member in BASE_MODEL_NAMES:
+            name = f"{member}_model"
+            needed.append(name)
+        else:
+            model = getattr(models, f"{member}_model")
+            name = member
+            members = [f"{member}_model.{est}" for est in model.named_estimators_]
+            needed += members
+            if member == "voting":
+                ensembles[name] = {"kind": "voting", "members": members, "weights": models.voting_weights()}
+            else:
+                unsupported = [method for method in model.stack_method_ if method != "predict_proba"]
+                if unsupported:
+                    raise ValueError(f"Stacking members with stack_method {unsupported} cannot be exported")
+                ensembles[name] = {
+                    "kind": "stacking",
+                    "members": members,
+                    "passthrough": bool(model.passthrough),
+                    "final_estimator": f"{member}_model.final_estimator"
+                }
+                needed.append(f"{member}_model.final_estimator")
+        serving.append({"name": name, "weight": weight})
+
+    missing = [name for name in needed if name not in fitted]
+    if missing:
+        raise ValueError(f"Models of the serving ensemble are missing: {', '.join(missing)}")
+    graph = {
+        "format": FORMAT_VERSION,
+        "model_version": models.fingerprint,
+        "created_at": datetime.utcnow().isoformat(),
+        "symptoms": list(models.vocabulary.symptoms),
+        "classes": [str(name) for name in models.prediction_classes],
+        "models": {},
+        "ensembles": ensembles,
+        "serving": serving
+    }
+    return graph, list(dict.fromkeys(needed))
+
+
+def export(models_dir, float32=False):
+    """Write <models_dir>/export/ for the served ensemble; return the export directory."""
+    models = ModelSet(models_dir)
+    fitted = collect_models(models_dir)
+    graph, needed = build_graph(models, fitted, serving_members(models))
+
+    graph["float32"] = float32
+    arrays = {}
+    n_classes = len(graph["classes"])
+    for name in needed:
+        compiled = compile_model(fitted[name])
+        if float32:
+            compiled = compiled.downcast()
+        # Every model is fitted on the encoded labels, so column i is class i
+        if name != "stacking_model.final_estimator" and not np.array_equal(compiled.classes_, np.arange(n_classes)):
+            raise ValueError(f"{name} was not fitted on the encoded labels 0..{n_classes - 1}")
+        node = {"kind": compiled.kind, "arrays": [], "params": {}}
+        for key, array in compiled.stored_arrays().items():
+            array = np.asarray(array)
+            # Scalars (kernel, gamma, ...) are readable in the graph, arrays go to the npz
+            if array.ndim == 0:
+                node["params"][key] = array.item()
+            else:
+                node["arrays"].append(key)
+                arrays[f"{name}/{key}"] = array
+        graph["models"][name] = node
+
+    # Built in a scratch directory and renamed, so a half-written export is never loaded
+    target = export_dir_for(models_dir)
+    staging = f"{target}.staging"
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+    np.savez(os.path.join(staging, ARRAYS_NAME), **arrays)
+    with open(os.path.join(staging, GRAPH_NAME), "w") as f:
+        json.dump(graph, f, indent=2)
+    shutil.rmtree(target, ignore_errors=True)
+    os.replace(staging, target)
+
+    size = sum(os.path.getsize(os.path.join(target, name)) for name in os.listdir(target))
+    composition = " + ".join(f"{member['weight']:g}*{member['name']}" for member in graph["serving"])
+    print(f"Wrote {len(needed)} models ({composition}) to {target}, {size / 2 ** 20:.2f} MiB")
+    return target
+
+
+def check_export(models_dir):
+    """Compare the portable runtime with the predictor; return the number of failures (0 or 1)."""
+    models = ModelSet(models_dir)
+    portable = PortableEnsemble(export_dir_for(models_dir))
+    if portable.model_version != models.fingerprint:
+        print(f"FAIL export was built for model artifacts {portable.model_version}, these are {models.fingerprint}")
+        return 1
+    served, _ = build_graph(models, collect_models(models_dir), serving_members(models))
+    if served["serving"] != portable.graph["serving"]:
+        print(f"FAIL export serves {portable.graph['serving']}, the predictor serves {served['serving']} (SERVING_CONFIG?)")
+        return 1
+
+    test_X, all_X = parity_inputs(models.vocabulary.size)
+    result = run_serving(all_X, models)
+    expected = result.get("final_proba", result.get("voting_proba"))
+    actual = portable.predict_proba(all_X)
+    tolerances = FLOAT32_TOLERANCES if portable.graph["float32"] else TOLERANCES
+    tolerance = max(tolerances[node["kind"]] for node in portable.graph["models"].values())
+
+    max_diff = float(np.abs(expected - actual).max())
+    expected_names = np.asarray(models.prediction_classes)[result["final_labels"]]
+    test_match = float(np.mean(expected_names[:len(test_X)] == portable.predict(all_X[:len(test_X)])))
+    all_match = float(np.mean(expected_names == portable.predict(all_X)))
+    ok = max_diff <= tolerance and test_match == 1.0
+    print(f"{'OK  ' if ok else 'FAIL'} portable export  max|dp|={max_diff:.2e} (tolerance {tolerance:.0e})  "
+          f"labels Testing={test_match:.3f} all={all_match:.3f}")
+    return 0 if ok else 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the served ensemble without pickles")
+    parser.add_argument("--models-dir", default=MODELS_DIR)
+    parser.add_argument("--float32", action="store_true", help="store float32 / int32 arrays")
+    parser.add_argument("--check", action="store_true", help="parity-check the written export without writing")
+    args = parser.parse_args()
+
+    if not args.check:
+        export(args.models_dir, args.float32)
+    if check_export(args.models_dir):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
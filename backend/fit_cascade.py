@@ -0,0 +1,132 @@
+"""
+Fit the confidence-gated cascade thresholds used by services/predictor.py.
+
+For each tier (cheapest model first) the threshold is the smallest top-1 minus
+top-2 probability margin at which the rows the tier would answer still agree
+with the served ensemble label (voting, or the serving composition) at least
+--target of the time. Rows that do not clear a tier fall through to the next
+one and finally to the ensemble.
+
+Calibration rows are datasets/Testing.csv plus the Training.csv rows held out
+by modeltraining.py's split, each also sampled down to 1-6 of its symptoms so
+the thresholds see the sparse inputs real users send.
+
+Run from the backend directory after modeltraining.py:
+    python fit_cascade.py [--target 0.99] [--tiers nb,rf] [--partial-profiles 3]
+"""
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+from sklearn.model_selection import train_test_split
+
+from services.predictor import CASCADE_CONFIG_PATH, current_models, run_serving, top_margin
+from services.symptom_dataset import load_dataset
+
+
+def calibration_rows(partial_profiles, seed=24):
+    """Testing.csv + held-out Training.csv rows, plus sparse samples of each."""
+    test_X = load_dataset(os.path.join("datasets", "Testing.csv")).X
+    data = load_dataset(os.path.join("datasets", "Training.csv"))
+    # Same split as modeltraining.py so no training row leaks into calibration
+    _, held_out_X = train_test_split(np.asarray(data.X), test_size=0.2, random_state=24, stratify=data.labels)
+    full_X = np.vstack([test_X, held_out_X])
+
+    rng = np.random.default_rng(seed)
+    partial = []
+    for row in full_X:
+        active = np.flatnonzero(row)
+        for _ in range(partial_profiles):
+            sample = np.zeros_like(row)
+            sample[rng.choice(active, min(len(active), rng.integers(1, 7)), replace=False)] = 1
+            partial.append(sample)
+    return np.vstack([full_X] + partial) if partial else full_X
+
+
+def fit_threshold(margins, agrees, target):
+    """Smallest margin whose exited rows (margin >= it) agree at least `target` of the time."""
+    order = np.argsort(-margins, kind="stable")
+    sorted_margins = margins[order]
+    precision = np.cumsum(agrees[order]) / np.arange(1, len(order) + 1)
+    # Only cut between distinct margins, ties all exit together
+    cut = np.append(sorted_margins[:-1] > sorted_margins[1:], True)
+    valid = np.flatnonzero(cut & (precision >= target))
+    if not len(valid):
+        return None
+    return float(sorted_margins[valid[-1]])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fit cascade early-exit thresholds")
+    parser.add_argument("--target", type=float, default=0.99, help="min agreement with the full ensemble per tier")
+    parser.add_argument("--tiers", default="nb,rf", help="comma-separated models, cheapest first")
+    parser.add_argument("--partial-profiles", type=int, default=3, help="sparse samples per calibration row")
+    parser.add_argument("--output", default=CASCADE_CONFIG_PATH)
+    args = parser.parse_args()
+
+    models = current_models()
+    cascade_models = models.cascade_models
+    X = calibration_rows(args.partial_profiles)
+    full_labels = run_serving(X)["final_labels"]
+    print(f"Calibration rows: {len(X)}, target agreement {args.target:.3f}")
+
+    tiers = []
+    pending = np.arange(len(X))
+    cascade_labels = np.empty(len(X), dtype=full_labels.dtype)
+    for name in args.tiers.split(","):
+        model = cascade_models[name]
+        proba = model.predict_proba(X[pending])
+        labels = model.classes_[np.argmax(proba, axis=1)]
+        margins = top_margin(proba)
+        threshold = fit_threshold(margins, labels == full_labels[pending], args.target)
+
+        exits = margins >= threshold if threshold is not None else np.zeros(len(pending), dtype=bool)
+        agreement = float(np.mean(labels[exits] == full_labels[pending][exits])) if exits.any() else None
+        cascade_labels[pending[exits]] = labels[exits]
+        tiers.append({
+            "model": name,
+            "threshold": threshold,
+            "hit_rate": float(exits.sum() / len(X)),
+            "agreement": agreement
+        })
+        print(f"  {name:<4} threshold={threshold}  hit rate {exits.sum() / len(X):.3f}  agreement {agreement}")
+        pending = pending[~exits]
+
+    cascade_labels[pending] = full_labels[pending]
+    overall = float(np.mean(cascade_labels == full_labels))
+    print(f"  full hit rate {len(pending) / len(X):.3f}")
+    print(f"Overall agreement with the full ensemble: {overall:.4f}")
+
+    # Mean 1-row latency, full ensemble vs cascade, over a sample of calibration rows
+    sample = X[np.random.default_rng(0).choice(len(X), min(200, len(X)), replace=False)]
+    start = time.perf_counter()
+    for row in sample:
+        run_serving(row.reshape(1, -1))
+    full_ms = (time.perf_counter() - start) * 1000 / len(sample)
+    start = time.perf_counter()
+    for row in sample:
+        row = row.reshape(1, -1)
+        for tier in tiers:
+            if tier["threshold"] is not None and top_margin(cascade_models[tier["model"]].predict_proba(row))[0] >= tier["threshold"]:
+                break
+        else:
+            run_serving(row)
+    cascade_ms = (time.perf_counter() - start) * 1000 / len(sample)
+    print(f"1-row latency: full ensemble {full_ms:.2f} ms -> cascade {cascade_ms:.2f} ms")
+
+    with open(args.output, "w") as f:
+        json.dump({
+            "model_version": models.fingerprint,
+            "target_agreement": args.target,
+            "calibration_rows": len(X),
+            "overall_agreement": overall,
+            "full_hit_rate": float(len(pending) / len(X)),
+            "tiers": tiers
+        }, f, indent=2)
+    print(f"Wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,384 @@
+"""
+Update the served models from confirmed prediction feedback, without a full
+modeltraining.py run, and publish the result only if it is no worse.
+
+Feedback is every previous_predictions document with a confirmed_disease
+(set by POST /prediction/confirm_prediction). New documents are read after a
+watermark on (confirmed_at, _id) in keyset-paged batches, so the job never
+holds a cursor open and confirmations of old predictions are still picked up.
+Starting from the active model version, the models that can learn without
+refitting are updated:
+    nb    GaussianNB.partial_fit on every batch (the standalone model and the
+          voting member), keeping the variance smoothing of the full fit
+    xgb   --rounds more boosting rounds on the feedback rows plus --replay
+          Training.csv rows per feedback row, so old classes are not forgotten
+rf, svm and the stacking ensemble (whose meta-learner was fitted on the old
+members) are carried over unchanged, as are serving_config.json and
+profile_index.npz; compiled/ and export/ are rebuilt and cascade_thresholds.json
+dropped.
+
+The served prediction is scored before and after on Testing.csv rows plus
+sparse 1-6 symptom samples of them. The update is published with
+publish_models.py's versioning only if accuracy and macro F1 each drop by at
+most --max-drop; the watermark only moves past the feedback of a published
+update, so rejected feedback is retried with more data on the next run.
+
+A JSON-lines file stands in for Mongo (--feedback-file), one document per
+line with _id, symptoms, confirmed_disease and confirmed_at (ISO time);
+--make-standin writes one from sparse samples of Training.csv.
+
+Run from the backend directory:
+    python incremental_update.py [--batch-size 500] [--rounds 10] [--no-publish]
+    python incremental_update.py --make-standin feedback.jsonl [--records 2000]
+    python incremental_update.py --feedback-file feedback.jsonl --state feedback_state.json
+"""
+import argparse
+import json
+import os
+import shutil
+import time
+import warnings
+from datetime import datetime, timedelta
+
+import joblib
+import numpy as np
+import xgboost as xgb
+from bson import ObjectId
+from sklearn.metrics import accuracy_score, f1_score
+
+from build_profile_index import TESTING_CSV, TRAINING_CSV, sparse_samples
+from compile_models import compile_directory
+from export_models import check_export, export
+from optimize_ensemble import load_rows, with_sparse
+from services.model_versions import (
+    EXTRA_ARTIFACTS, MODELS_DIR, artifact_fingerprint, publish_version, resolve_models_dir
+)
+from services.portable_model import EXPORT_DIR_NAME
+from services.predictor import CASCADE_CONFIG_NAME, SERVING_CONFIG_NAME, ModelSet, member_proba, run_serving
+
+warnings.filterwarnings("ignore", category=UserWarning)
+
+FEEDBACK_COLLECTION = "previous_predictions"
+STATE_PATH = os.path.join(MODELS_DIR, "incremental_state.json")
+OUTPUT_DIR = os.path.join(MODELS_DIR, "incremental")
+
+# Artifacts holding NB / XGBoost models (the voting ensemble has one of each as members)
+UPDATED_MODELS = ["nb_model", "xgb_model", "voting_model"]
+
+
+class MongoFeedback:
+    """Confirmed predictions in the previous_predictions collection."""
+
+    def __init__(self, uri):
+        from pymongo import MongoClient
+        self.client = MongoClient(uri)
+        database = self.client.get_default_database()
+        self.collection = database[FEEDBACK_COLLECTION]
+        # Watermark key; the URI itself may hold credentials
+        self.name = f"mongo:{database.name}.{FEEDBACK_COLLECTION}"
+
+    def page(self, after, limit):
+        """Up to `limit` confirmed documents after the (confirmed_at, _id) watermark, in watermark order."""
+        query = {"confirmed_disease": {"$exists": True}, "confirmed_at": {"$exists": True}}
+        if after is not None:
+            confirmed_at, last_id = after
+            last_id = ObjectId(last_id) if ObjectId.is_valid(last_id) else last_id
+            query["$or"] = [
+                {"confirmed_at": {"$gt": confirmed_at}},
+                {"confirmed_at": confirmed_at, "_id": {"$gt": last_id}}
+            ]
+        projection = {"symptoms": 1, "confirmed_disease": 1, "confirmed_at": 1}
+        return list(self.collection.find(query, projection).sort([("confirmed_at", 1), ("_id", 1)]).limit(limit))
+
+
+class FileFeedback:
+    """Local stand-in for the collection: one JSON document per line."""
+
+    def __init__(self, path):
+        self.name = path
+        with open(path) as f:
+            documents = [json.loads(line) for line in f if line.strip()]
+        for document in documents:
+            if isinstance(document.get("confirmed_at"), str):
+                document["confirmed_at"] = datetime.fromisoformat(document["confirmed_at"])
+        self.documents = sorted(
+            (d for d in documents if d.get("confirmed_disease") and d.get("confirmed_at")),
+            key=lambda d: (d["confirmed_at"], str(d["_id"]))
+        )
+
+    def page(self, after, limit):
+        if after is not None:
+            confirmed_at, last_id = after
+            rows = [d for d in self.documents if (d["confirmed_at"], str(d["_id"])) > (confirmed_at, last_id)]
+        else:
+            rows = self.documents
+        return rows[:limit]
+
+
+def stream_feedback(source, after, batch_size, max_records=None):
+    """Yield pages of new feedback documents until the source is drained (or max_records were read)."""
+    read = 0
+    while max_records is None or read < max_records:
+        limit = batch_size if max_records is None else min(batch_size, max_records - read)
+        page = source.page(after, limit)
+        if not page:
+            return
+        read += len(page)
+        after = (page[-1]["confirmed_at"], str(page[-1]["_id"]))
+        yield page, after
+
+
+def read_state(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def write_state(path, state):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def state_watermark(state, source_name):
+    entry = state.get("sources", {}).get(source_name)
+    if not entry:
+        return None
+    return datetime.fromisoformat(entry["confirmed_at"]), entry["_id"]
+
+
+def encode_page(page, models):
+    """Model rows and encoded labels of a feedback page; documents with an unknown disease or no known symptom are skipped."""
+    known = set(models.label_encoder.classes_)
+    kept = [d for d in page if d["confirmed_disease"] in known]
+    X, _ = models.vocabulary.encode_batch([d.get("symptoms") or [] for d in kept])
+    has_symptoms = X.any(axis=1)
+    y = models.label_encoder.transform([d["confirmed_disease"] for d in kept])
+    return X[has_symptoms], y[has_symptoms], len(page) - int(has_symptoms.sum())
+
+
+def nb_partial_fit(model, X, y):
+    """
+    GaussianNB.partial_fit that keeps the full fit's variance smoothing.
+
+    partial_fit subtracts and re-adds var_smoothing times the largest
+    variance of the *batch*, which on small sparse batches shifts every
+    variance; this offsets var_ so the original epsilon_ is removed and kept.
+    """
+    epsilon = model.epsilon_
+    X = np.asarray(X, dtype=np.float64)
+    model.var_ += model.var_smoothing * np.var(X, axis=0).max() - epsilon
+    model.partial_fit(X, y)
+    model.var_ += epsilon - model.epsilon_
+    model.epsilon_ = epsilon
+
+
+def continue_boosting(model, X, y, rounds, n_jobs=1):
+    """Add `rounds` trees to a fitted XGBClassifier, trained on (X, y)."""
+    booster = model.get_booster()
+    params = {**model.get_xgb_params(), "num_class": model.n_classes_, "nthread": n_jobs}
+    data = xgb.DMatrix(X, label=y, feature_names=booster.feature_names)
+    model._Booster = xgb.train(params, data, num_boost_round=rounds, xgb_model=booster)
+    model.n_estimators = model.get_booster().num_boosted_rounds()
+
+
+def models_of(artifact, kind):
+    """The GaussianNB / XGBClassifier objects inside a loaded artifact (itself, or voting members)."""
+    if hasattr(artifact, "named_estimators_"):
+        return [est for est in artifact.named_estimators_.values() if type(est).__name__ == kind]
+    return [artifact] if type(artifact).__name__ == kind else []
+
+
+def replay_rows(label_encoder, count, seed):
+    X, y = load_rows(TRAINING_CSV, label_encoder)
+    rows = np.random.default_rng(seed).choice(len(X), min(count, len(X)), replace=False)
+    return X[rows], y[rows]
+
+
+def score(models, X, y):
+    """Served accuracy / macro F1, plus the nb and xgb members' accuracy."""
+    labels = run_serving(X, models)["final_labels"]
+    result = {"accuracy": accuracy_score(y, labels), "f1": f1_score(y, labels, average="macro")}
+    proba_cache = {}
+    for name in ["nb", "xgb"]:
+        if models.has_member(name):
+            proba = member_proba(name, X, proba_cache, models)
+            result[f"{name}_accuracy"] = accuracy_score(y, models.base_models[name].classes_[np.argmax(proba, axis=1)])
+    return result
+
+
+def prepare_output(source, output):
+    """Copy the artifacts of `source` that carry over into a fresh `output` directory."""
+    shutil.rmtree(output, ignore_errors=True)
+    os.makedirs(output)
+    names = [name for name in os.listdir(source) if name.endswith(".pkl")]
+    names += [name for name in EXTRA_ARTIFACTS if name != CASCADE_CONFIG_NAME and os.path.exists(os.path.join(source, name))]
+    for name in names:
+        shutil.copy2(os.path.join(source, name), os.path.join(output, name))
+
+
+def carry_serving_config(output):
+    """Point serving_config.json at the updated artifacts; the update gate scores that same composition."""
+    path = os.path.join(output, SERVING_CONFIG_NAME)
+    if not os.path.exists(path):
+        return
+    with open(path) as f:
+        config = json.load(f)
+    config["carried_from"] = config.get("model_version")
+    config["model_version"] = artifact_fingerprint(output)
+    with open(path, "w") as f:
+        json.dump(config, f, indent=2)
+
+
+def make_standin(path, records, seed):
+    """Write a stand-in feedback file of sparse Training.csv samples with confirmed labels."""
+    models = ModelSet(resolve_models_dir())
+    X, y = load_rows(TRAINING_CSV, models.label_encoder)
+    rng = np.random.default_rng(seed)
+    rows = rng.choice(len(X), records, replace=len(X) < records)
+    samples = sparse_samples(X[rows], 1, seed)
+    start = datetime.now() - timedelta(days=1)
+    with open(path, "w") as f:
+        for i, (sample, label) in enumerate(zip(samples, y[rows])):
+            document = {
+                "_id": str(ObjectId()),
+                "symptoms": [models.vocabulary.symptoms[col] for col in np.flatnonzero(sample)],
+                "disease_name": str(models.label_encoder.classes_[label]),
+                "confirmed_disease": str(models.label_encoder.classes_[label]),
+                "confirmed_at": (start + timedelta(seconds=i)).isoformat()
+            }
+            f.write(json.dumps(document) + "\n")
+    print(f"✅ Wrote {records} stand-in feedback documents to {path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Update the models from confirmed prediction feedback")
+    parser.add_argument("--feedback-file", help="JSON-lines stand-in for the previous_predictions collection")
+    parser.add_argument("--mongo-uri", default=None, help="defaults to MONGO_URI from config.py")
+    parser.add_argument("--state", default=STATE_PATH, help="watermark file")
+    parser.add_argument("--source", default=None, help="models to update (default: the active version)")
+    parser.add_argument("--output", default=OUTPUT_DIR)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--max-records", type=int, default=None, help="stop after this many feedback documents")
+    parser.add_argument("--rounds", type=int, default=10, help="boosting rounds added to XGBoost")
+    parser.add_argument("--replay", type=float, default=1.0, help="Training.csv rows per feedback row in the XGBoost update")
+    parser.add_argument("--sparse-samples", type=int, default=3, help="sparse samples per Testing.csv row in the evaluation")
+    parser.add_argument("--max-drop", type=float, default=0.0, help="max served accuracy / F1 loss on the evaluation rows")
+    parser.add_argument("--from-start", action="store_true", help="ignore the watermark and read all feedback")
+    parser.add_argument("--no-publish", action="store_true", help="update and report only")
+    parser.add_argument("--no-activate", action="store_true", help="publish without pointing servers at the new version")
+    parser.add_argument("--make-standin", metavar="PATH", help="write a stand-in feedback file and exit")
+    parser.add_argument("--records", type=int, default=2000, help="documents in the stand-in file")
+    parser.add_argument("--seed", type=int, default=24)
+    args = parser.parse_args()
+
+    if args.make_standin:
+        make_standin(args.make_standin, args.records, args.seed)
+        return
+
+    started = time.perf_counter()
+    timings = {}
+    if args.feedback_file:
+        source = FileFeedback(args.feedback_file)
+    else:
+        from config import Config
+        source = MongoFeedback(args.mongo_uri or Config.MONGO_URI)
+    state = read_state(args.state)
+    after = None if args.from_start else state_watermark(state, source.name)
+
+    source_dir = args.source or resolve_models_dir()
+    prepare_output(source_dir, args.output)
+    artifacts = {name: joblib.load(os.path.join(args.output, f"{name}.pkl")) for name in UPDATED_MODELS
+                 if os.path.exists(os.path.join(args.output, f"{name}.pkl"))}
+    nb_models = [model for artifact in artifacts.values() for model in models_of(artifact, "GaussianNB")]
+    xgb_models = [model for artifact in artifacts.values() for model in models_of(artifact, "XGBClassifier")]
+    before_models = ModelSet(source_dir)
+    timings["load"] = time.perf_counter() - started
+
+    # Stream: NB learns batch by batch, XGBoost gets every row at the end
+    feedback_X, feedback_y, skipped, watermark = [], [], 0, after
+    step = time.perf_counter()
+    for page, watermark in stream_feedback(source, after, args.batch_size, args.max_records):
+        X, y, dropped = encode_page(page, before_models)
+        skipped += dropped
+        if len(y):
+            for model in nb_models:
+                nb_partial_fit(model, X, y)
+            feedback_X.append(X)
+            feedback_y.append(y)
+        print(f"▶️ Batch of {len(page)} documents ({len(y)} usable), up to {watermark[0].isoformat()}", flush=True)
+    timings["stream + nb"] = time.perf_counter() - step
+
+    if not feedback_X:
+        print(f"✅ No new confirmed feedback in {source.name}" + (f" ({skipped} unusable documents)" if skipped else ""))
+        return
+    feedback_X, feedback_y = np.vstack(feedback_X), np.concatenate(feedback_y)
+
+    step = time.perf_counter()
+    if xgb_models and args.rounds:
+        replay_X, replay_y = replay_rows(before_models.label_encoder, int(len(feedback_y) * args.replay), args.seed)
+        X, y = np.vstack([feedback_X, replay_X]), np.concatenate([feedback_y, replay_y])
+        for model in xgb_models:
+            continue_boosting(model, X, y, args.rounds, n_jobs=os.cpu_count() or 1)
+    timings["xgb"] = time.perf_counter() - step
+
+    step = time.perf_counter()
+    for name, artifact in artifacts.items():
+        joblib.dump(artifact, os.path.join(args.output, f"{name}.pkl"))
+    compile_failures = 0
+    if os.path.isdir(os.path.join(source_dir, "compiled")):
+        compile_failures = compile_directory(args.output)
+    carry_serving_config(args.output)
+    if os.path.isdir(os.path.join(source_dir, EXPORT_DIR_NAME)):
+        export(args.output)
+        compile_failures += check_export(args.output)
+    timings["save + compile"] = time.perf_counter() - step
+
+    step = time.perf_counter()
+    test_X, test_y = with_sparse(*load_rows(TESTING_CSV, before_models.label_encoder), args.sparse_samples, args.seed)
+    after_models = ModelSet(args.output)
+    results = {
+        "test": (score(before_models, test_X, test_y), score(after_models, test_X, test_y)),
+        "feedback": (score(before_models, feedback_X, feedback_y), score(after_models, feedback_X, feedback_y))
+    }
+    timings["evaluate"] = time.perf_counter() - step
+
+    print(f"\nFeedback rows: {len(feedback_y)} ({skipped} documents skipped), evaluation rows: {len(test_y)}")
+    print(f"{'rows':<10} {'metric':<14} {'before':>8} {'after':>8}")
+    for rows, (before, after_scores) in results.items():
+        for metric in before:
+            print(f"{rows:<10} {metric:<14} {before[metric]:>8.4f} {after_scores[metric]:>8.4f}")
+    for name, seconds in timings.items():
+        print(f"{name:<16} {seconds:>7.1f} s")
+    print(f"{'total':<16} {time.perf_counter() - started:>7.1f} s")
+
+    before, after_scores = results["test"]
+    problems = [
+        f"{metric} {after_scores[metric]:.4f} < {before[metric]:.4f} - {args.max_drop}"
+        for metric in ["accuracy", "f1"] if after_scores[metric] < before[metric] - args.max_drop
+    ]
+    if compile_failures:
+        problems.append(f"{compile_failures} compiled / exported models failed parity")
+    if problems:
+        print(f"❌ Not publishing: {'; '.join(problems)}")
+        return
+    if args.no_publish:
+        print(f"✅ Updated models written to {args.output} (not published)")
+        return
+
+    version = publish_version(args.output, activate=not args.no_activate)
+    state.setdefault("sources", {})[source.name] = {
+        "confirmed_at": watermark[0].isoformat(),
+        "_id": watermark[1],
+        "version": version,
+        "records": int(len(feedback_y)),
+        "updated_at": datetime.utcnow().isoformat()
+    }
+    write_state(args.state, state)
+    print(f"✅ Published incrementally updated version {version}{'' if args.no_activate else ' (active)'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -81,12 +81,38 @@
 ####################################################enhanced ensemble model####################################################
 #############################
 
+"""
+Train the disease prediction models as a DAG of cached stages.
+
+    load_data -> split -> feature_selection
+                       -> dedupe -> resample -> svm_search / rf_search / nb_search / xgb
+                                                -> stacking, voting -> evaluate -> save
+
+Independent stages (the three hyperparameter searches and XGBoost, then the
+two ensembles) run concurrently on at most --cores cores. Every stage's output
+is cached in ml_models/training_cache keyed by a hash of its inputs, so a
+rerun after a small change (or after a crash) only recomputes what changed.
+--search halving swaps the grid searches for successive halving.
+
+Training.csv repeats each symptom profile many times. The dedupe stage
+collapses the training split into unique rows with their counts, and lists
+profile pairs that differ by a single symptom (plots/near_duplicates.csv).
+With --dedupe every model trains on the unique rows with the counts as
+sample weights (class-balanced weights stand in for SMOTETomek), instead of
+on every duplicate.
+
+Run from the backend directory:
+    python modeltraining.py [--cores 4] [--search grid|halving] [--dedupe] [--force svm_search] [--no-cache]
+"""
+import argparse
 import os
 import joblib
 import numpy as np
 import pandas as pd
 from sklearn.preprocessing import LabelEncoder, StandardScaler
 from sklearn.model_selection import train_test_split, StratifiedKFold, GridSearchCV
+from sklearn.experimental import enable_halving_search_cv  # noqa: F401
+from sklearn.model_selection import HalvingGridSearchCV
 from sklearn.svm import SVC
 from sklearn.naive_bayes import GaussianNB
 from sklearn.ensemble import RandomForestClassifier, VotingClassifier, StackingClassifier
@@ -102,266 +128,427 @@ from sklearn.linear_model import LogisticRegression
 from sklearn.neural_network import MLPClassifier
 from xgboost import XGBClassifier
 
+from services.symptom_dataset import SymptomDataset, build_cache, load_dataset
+from training_pipeline import CACHE_DIR, Stage, run_pipeline
+
 # Create necessary directories
 MODELS_DIR = os.path.join("ml_models")
-os.makedirs(MODELS_DIR, exist_ok=True)
-os.makedirs(os.path.join("plots"), exist_ok=True)
+PLOTS_DIR = os.path.join("plots")
 
-# Load dataset
 DATA_PATH_TRAIN = os.path.join("datasets", "Training.csv")
-data = pd.read_csv(DATA_PATH_TRAIN).dropna(axis=1)
-
-# Encode target values
-label_encoder = LabelEncoder()
-data["prognosis"] = label_encoder.fit_transform(data["prognosis"])
-
-# Split data into features and target
-X = data.iloc[:, :-1]
-y = data.iloc[:, -1]
-
-# Analyze class distribution
-class_counts = pd.Series(y).value_counts()
-print(f"Number of classes: {len(class_counts)}")
-print(f"Class distribution: Min: {min(class_counts)}, Max: {max(class_counts)}")
-
-# Plot class distribution
-plt.figure(figsize=(12, 6))
-sns.countplot(y=pd.Series(y).map(lambda x: label_encoder.inverse_transform([x])[0]))
-plt.title('Class Distribution')
-plt.xticks(rotation=90)
-plt.tight_layout()
-plt.savefig(os.path.join("plots", "class_distribution.png"))
-plt.close()
-
-# Split data stratifying by target class
-X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=24, stratify=y)
-
-# Feature importance analysis using a baseline Random Forest
-baseline_rf = RandomForestClassifier(n_estimators=100, random_state=42)
-baseline_rf.fit(X_train, y_train)
-feature_importances = pd.DataFrame(
-    {'feature': X.columns, 'importance': baseline_rf.feature_importances_}
-).sort_values('importance', ascending=False)
-
-# Plot feature importances
-plt.figure(figsize=(12, 8))
-sns.barplot(x='importance', y='feature', data=feature_importances.head(20))
-plt.title('Top 20 Feature Importances')
-plt.tight_layout()
-plt.savefig(os.path.join("plots", "feature_importances.png"))
-plt.close()
-
-# Feature selection based on importance
-selector = SelectFromModel(baseline_rf, threshold="median", prefit=True)
-X_train_selected = selector.transform(X_train)
-X_test_selected = selector.transform(X_test)
-selected_features = X.columns[selector.get_support()]
-print(f"Selected {len(selected_features)} features out of {X.shape[1]}")
-
-# Apply SMOTE to handle class imbalance
-print("Applying SMOTE to balance classes...")
-smote = SMOTETomek(random_state=42)
-X_train_resampled, y_train_resampled = smote.fit_resample(X_train, y_train)
-print(f"Original training set shape: {X_train.shape}, Resampled: {X_train_resampled.shape}")
+DATA_PATH_TEST = os.path.join("datasets", "Testing.csv")
 
 # Define an enhanced SVM model with hyperparameter tuning
-svm_param_grid = {
+SVM_PARAM_GRID = {
     'C': [0.1, 1, 10, 100],
     'gamma': ['scale', 'auto', 0.01, 0.1],
     'kernel': ['rbf', 'poly']
 }
-svm_cv = StratifiedKFold(n_splits=5, shuffle=True, random_state=42)
-svm_grid = GridSearchCV(
-    SVC(probability=True, class_weight='balanced'),
-    param_grid=svm_param_grid,
-    cv=svm_cv,
-    scoring='f1_macro',
-    n_jobs=-1
-)
-svm_grid.fit(X_train_resampled, y_train_resampled)
-svm_model = svm_grid.best_estimator_
-print(f"Best SVM params: {svm_grid.best_params_}")
 
 # Define an enhanced Random Forest model
-rf_param_grid = {
+RF_PARAM_GRID = {
     'n_estimators': [100, 200],
     'max_depth': [None, 15, 30],
     'min_samples_split': [2, 5],
     'min_samples_leaf': [1, 2, 4],
     'class_weight': ['balanced', 'balanced_subsample']
 }
-rf_cv = StratifiedKFold(n_splits=5, shuffle=True, random_state=42)
-rf_grid = GridSearchCV(
-    RandomForestClassifier(random_state=18),
-    param_grid=rf_param_grid,
-    cv=rf_cv,
-    scoring='f1_macro',
-    n_jobs=-1
-)
-rf_grid.fit(X_train_resampled, y_train_resampled)
-rf_model = rf_grid.best_estimator_
-print(f"Best RF params: {rf_grid.best_params_}")
 
 # Define an enhanced Naive Bayes model
-nb_param_grid = {
+NB_PARAM_GRID = {
     'var_smoothing': np.logspace(0, -9, num=10)
 }
-nb_cv = StratifiedKFold(n_splits=5, shuffle=True, random_state=42)
-nb_grid = GridSearchCV(
-    GaussianNB(),
-    param_grid=nb_param_grid,
-    cv=nb_cv,
-    scoring='f1_macro',
-    n_jobs=-1
-)
-nb_grid.fit(X_train_resampled, y_train_resampled)
-nb_model = nb_grid.best_estimator_
-print(f"Best NB params: {nb_grid.best_params_}")
 
 # Add XGBoost as an additional model
-xgb_model = XGBClassifier(
-    n_estimators=200,
-    max_depth=7,
-    learning_rate=0.1,
-    subsample=0.8,
-    colsample_bytree=0.8,
-    random_state=42,
-    use_label_encoder=False,
-    eval_metric='mlogloss'
-)
-xgb_model.fit(X_train_resampled, y_train_resampled)
-
-# Save trained models and label encoder
-joblib.dump(svm_model, os.path.join(MODELS_DIR, "svm_model.pkl"))
-joblib.dump(nb_model, os.path.join(MODELS_DIR, "nb_model.pkl"))
-joblib.dump(rf_model, os.path.join(MODELS_DIR, "rf_model.pkl"))
-joblib.dump(label_encoder, os.path.join(MODELS_DIR, "label_encoder.pkl"))
-joblib.dump(xgb_model, os.path.join(MODELS_DIR, "xgb_model.pkl"))
-joblib.dump(selector, os.path.join(MODELS_DIR, "feature_selector.pkl"))
-
-# Create a stacking classifier for better ensemble learning
-stacking_model = StackingClassifier(
-    estimators=[
-        ('rf', rf_model),
-        ('svm', svm_model),
-        ('nb', nb_model),
-        ('xgb', xgb_model)
-    ],
-    final_estimator=LogisticRegression(max_iter=1000, class_weight='balanced'),
-    cv=5
-)
-stacking_model.fit(X_train, y_train)  # Using original train set to avoid data leakage
-joblib.dump(stacking_model, os.path.join(MODELS_DIR, "stacking_model.pkl"))
-
-# Create a weighted voting classifier for improved predictions
-voting_model = VotingClassifier(
-    estimators=[
-        ('rf', rf_model),
-        ('svm', svm_model),
-        ('nb', nb_model),
-        ('xgb', xgb_model)
-    ],
-    voting='soft',
-    weights=[2, 1, 1, 2]  # Starting with higher weights for RF and XGBoost
-)
-voting_model.fit(X_train, y_train)  # Using original train set to avoid data leakage
-joblib.dump(voting_model, os.path.join(MODELS_DIR, "voting_model.pkl"))
+XGB_PARAMS = {
+    'n_estimators': 200,
+    'max_depth': 7,
+    'learning_rate': 0.1,
+    'subsample': 0.8,
+    'colsample_bytree': 0.8,
+    'random_state': 42,
+    'use_label_encoder': False,
+    'eval_metric': 'mlogloss'
+}
+
+# Starting with higher weights for RF and XGBoost
+VOTING_WEIGHTS = [2, 1, 1, 2]
+
+
+def load_data(path, n_jobs):
+    data = load_dataset(path).frame()
+
+    # Encode target values
+    label_encoder = LabelEncoder()
+    data["prognosis"] = label_encoder.fit_transform(data["prognosis"])
+
+    # Split data into features and target
+    X = data.iloc[:, :-1]
+    y = data.iloc[:, -1]
+
+    # Analyze class distribution
+    class_counts = pd.Series(y).value_counts()
+    print(f"Number of classes: {len(class_counts)}")
+    print(f"Class distribution: Min: {min(class_counts)}, Max: {max(class_counts)}")
+    return {"X": X, "y": y, "label_encoder": label_encoder}
+
+
+def split(load_data, n_jobs):
+    # Split data stratifying by target class
+    X_train, X_test, y_train, y_test = train_test_split(
+        load_data["X"], load_data["y"], test_size=0.2, random_state=24, stratify=load_data["y"]
+    )
+    return {"X_train": X_train, "X_test": X_test, "y_train": y_train, "y_test": y_test}
+
+
+def feature_selection(split, n_jobs):
+    # Feature importance analysis using a baseline Random Forest
+    X_train = split["X_train"]
+    baseline_rf = RandomForestClassifier(n_estimators=100, random_state=42, n_jobs=n_jobs)
+    baseline_rf.fit(X_train, split["y_train"])
+    baseline_rf.set_params(n_jobs=None)
+    feature_importances = pd.DataFrame(
+        {'feature': X_train.columns, 'importance': baseline_rf.feature_importances_}
+    ).sort_values('importance', ascending=False)
+
+    # Feature selection based on importance
+    selector = SelectFromModel(baseline_rf, threshold="median", prefit=True)
+    selected_features = X_train.columns[selector.get_support()]
+    print(f"Selected {len(selected_features)} features out of {X_train.shape[1]}")
+    return {"selector": selector, "feature_importances": feature_importances, "selected_features": selected_features}
+
+
+def near_duplicates(X, y, counts):
+    """Pairs of unique profiles that differ in exactly one symptom."""
+    profiles = X.values.astype(np.int32)
+    # Hamming distance between every pair of profiles in two matrix products
+    distance = profiles @ (1 - profiles).T + (1 - profiles) @ profiles.T
+    pairs = []
+    for a, b in zip(*np.nonzero(np.triu(distance == 1))):
+        column = int(np.flatnonzero(profiles[a] != profiles[b])[0])
+        # Profile a is always the one with the extra symptom
+        if not profiles[a, column]:
+            a, b = b, a
+        pairs.append({
+            "extra_symptom": X.columns[column],
+            "shared_symptoms": ";".join(X.columns[profiles[b].astype(bool)]),
+            "label_with": int(y.iloc[a]),
+            "label_without": int(y.iloc[b]),
+            "rows_with": int(counts[a]),
+            "rows_without": int(counts[b])
+        })
+    return pd.DataFrame(pairs, columns=["extra_symptom", "shared_symptoms", "label_with", "label_without",
+                                        "rows_with", "rows_without"])
+
+
+def dedupe(split, n_jobs):
+    """Unique (symptoms, prognosis) rows of the training split, with how often each occurs."""
+    X_train, y_train = split["X_train"], split["y_train"]
+    rows, counts = np.unique(np.column_stack([X_train.values, y_train.values]), axis=0, return_counts=True)
+    X = pd.DataFrame(rows[:, :-1], columns=X_train.columns)
+    y = pd.Series(rows[:, -1], name=y_train.name)
+    pairs = near_duplicates(X, y, counts)
+    print(f"Collapsed {len(X_train)} training rows into {len(X)} unique rows; "
+          f"{len(pairs)} profile pairs differ by one symptom "
+          f"({int((pairs['label_with'] != pairs['label_without']).sum())} of them with different prognoses)")
+    return {"X": X, "y": y, "sample_weight": counts.astype(float), "near_duplicates": pairs}
+
+
+def resample(split, dedupe, use_dedupe, n_jobs):
+    if use_dedupe:
+        # Weighted unique rows: scale each class to the same total weight instead of synthesising rows
+        y, weights = dedupe["y"], dedupe["sample_weight"]
+        class_totals = pd.Series(weights).groupby(y.values).transform("sum").values
+        balanced = weights * (weights.sum() / y.nunique()) / class_totals
+        print(f"Training on {len(y)} weighted unique rows instead of {len(split['y_train'])}")
+        return {"X": dedupe["X"], "y": y, "sample_weight": balanced}
+
+    # Apply SMOTE to handle class imbalance
+    print("Applying SMOTE to balance classes...")
+    smote = SMOTETomek(random_state=42)
+    X_train_resampled, y_train_resampled = smote.fit_resample(split["X_train"], split["y_train"])
+    print(f"Original training set shape: {split['X_train'].shape}, Resampled: {X_train_resampled.shape}")
+    return {"X": X_train_resampled, "y": y_train_resampled, "sample_weight": None}
+
+
+def fit_kwargs(sample_weight):
+    return {} if sample_weight is None else {"sample_weight": sample_weight}
+
+
+def search(resample, label, estimator, param_grid, method, n_jobs):
+    """Best estimator of a 5-fold grid (or successive-halving) search on the resampled set."""
+    cv = StratifiedKFold(n_splits=5, shuffle=True, random_state=42)
+    # Halving starts every candidate on 2 x folds x classes samples, which the
+    # unique rows of --dedupe may not even reach; the full grid is cheap there
+    if method == "halving" and len(resample["y"]) < 2 * 5 * pd.Series(resample["y"]).nunique() * 3:
+        print(f"{label}: too few rows for successive halving, running the full grid")
+        method = "grid"
+    if method == "halving":
+        # Every candidate starts on a few samples; only the best third survives each round
+        grid = HalvingGridSearchCV(estimator, param_grid=param_grid, cv=cv, scoring='f1_macro',
+                                   factor=3, random_state=42, n_jobs=n_jobs)
+    else:
+        grid = GridSearchCV(estimator, param_grid=param_grid, cv=cv, scoring='f1_macro', n_jobs=n_jobs)
+    grid.fit(resample["X"], resample["y"], **fit_kwargs(resample["sample_weight"]))
+    print(f"Best {label} params: {grid.best_params_} ({len(grid.cv_results_['params'])} fits per fold)")
+    return {"model": grid.best_estimator_, "params": grid.best_params_, "score": grid.best_score_}
+
+
+def xgb(resample, params, n_jobs):
+    xgb_model = XGBClassifier(**params, n_jobs=n_jobs)
+    xgb_model.fit(resample["X"], resample["y"], **fit_kwargs(resample["sample_weight"]))
+    # Inference decides its own threads
+    xgb_model.set_params(n_jobs=None)
+    return xgb_model
+
+
+def base_estimators(svm_search, rf_search, nb_search, xgb):
+    return [
+        ('rf', rf_search["model"]),
+        ('svm', svm_search["model"]),
+        ('nb', nb_search["model"]),
+        ('xgb', xgb)
+    ]
+
+
+def ensemble_rows(split, dedupe, use_dedupe):
+    """(X, y, fit kwargs) the ensembles are fitted on: the training split, or its weighted unique rows."""
+    if use_dedupe:
+        return dedupe["X"], dedupe["y"], fit_kwargs(dedupe["sample_weight"])
+    return split["X_train"], split["y_train"], {}
+
+
+def stacking(split, dedupe, svm_search, rf_search, nb_search, xgb, use_dedupe, n_jobs):
+    # Create a stacking classifier for better ensemble learning
+    stacking_model = StackingClassifier(
+        estimators=base_estimators(svm_search, rf_search, nb_search, xgb),
+        final_estimator=LogisticRegression(max_iter=1000, class_weight='balanced'),
+        cv=5,
+        n_jobs=n_jobs
+    )
+    X_train, y_train, kwargs = ensemble_rows(split, dedupe, use_dedupe)
+    stacking_model.fit(X_train, y_train, **kwargs)  # Using original train set to avoid data leakage
+    stacking_model.set_params(n_jobs=None)
+    return stacking_model
+
+
+def voting(split, dedupe, svm_search, rf_search, nb_search, xgb, weights, use_dedupe, n_jobs):
+    # Create a weighted voting classifier for improved predictions
+    voting_model = VotingClassifier(
+        estimators=base_estimators(svm_search, rf_search, nb_search, xgb),
+        voting='soft',
+        weights=weights,
+        n_jobs=n_jobs
+    )
+    X_train, y_train, kwargs = ensemble_rows(split, dedupe, use_dedupe)
+    voting_model.fit(X_train, y_train, **kwargs)  # Using original train set to avoid data leakage
+    voting_model.set_params(n_jobs=None)
+    return voting_model
+
 
 # Enhanced ensemble prediction function with weighted voting
 def get_enhanced_ensemble_prediction(models, X, weights=None):
     """
     Get enhanced ensemble prediction with weighted averaging of probabilities.
-    
+
     Args:
         models: List of trained models
         X: Input features
         weights: Optional weights for each model
-    
+
     Returns:
         Predicted class label
     """
     if weights is None:
         weights = np.ones(len(models)) / len(models)
-    
+
     predictions = np.array([model.predict_proba(X) for model in models])
     # Apply weights to each model's prediction
     weighted_preds = np.sum(predictions * weights[:, np.newaxis, np.newaxis], axis=0)
     return np.argmax(weighted_preds, axis=1)
 
-# Load test data for validation
-DATA_PATH_TEST = os.path.join("datasets", "Testing.csv")
-test_data = pd.read_csv(DATA_PATH_TEST).dropna(axis=1)
-test_X = test_data.iloc[:, :-1]
-test_Y = label_encoder.transform(test_data.iloc[:, -1])
-
-# Evaluate each individual model
-models = {
-    "SVM": svm_model,
-    "Naive Bayes": nb_model,
-    "Random Forest": rf_model,
-    "XGBoost": xgb_model,
-    "Stacking": stacking_model,
-    "Voting": voting_model
-}
 
-results = {}
-for name, model in models.items():
-    y_pred = model.predict(test_X)
-    acc = accuracy_score(test_Y, y_pred)
-    f1 = f1_score(test_Y, y_pred, average='weighted')
-    results[name] = {"accuracy": acc, "f1_score": f1}
-    print(f"{name} - Accuracy: {acc:.4f}, F1-Score: {f1:.4f}")
-
-# Optimize weights based on model performance
-model_list = [rf_model, nb_model, svm_model, xgb_model]
-weights = np.array([results["Random Forest"]["f1_score"],
-                   results["Naive Bayes"]["f1_score"],
-                   results["SVM"]["f1_score"], 
-                   results["XGBoost"]["f1_score"]])
-weights = weights / np.sum(weights)  # Normalize weights
-
-# Get optimized ensemble predictions
-final_preds = get_enhanced_ensemble_prediction(model_list, test_X, weights)
-accuracy = accuracy_score(test_Y, final_preds)
-f1 = f1_score(test_Y, final_preds, average='weighted')
-print(f"Enhanced Weighted Ensemble - Accuracy: {accuracy:.4f}, F1-Score: {f1:.4f}")
-
-# Save optimal weights
-joblib.dump(weights, os.path.join(MODELS_DIR, "ensemble_weights.pkl"))
-
-# Store model metadata
-symptoms = X.columns.values
-symptom_index = {symptom.replace("_", " ").capitalize(): idx for idx, symptom in enumerate(symptoms)}
-prediction_classes = label_encoder.classes_
-
-# Save metadata
-metadata = {
-    "symptoms": symptoms.tolist(),
-    "symptom_index": symptom_index,
-    "prediction_classes": prediction_classes.tolist(),
-    "selected_features": selected_features.tolist(),
-    "model_weights": weights.tolist()
-}
-joblib.dump(metadata, os.path.join(MODELS_DIR, "metadata.pkl"))
-
-# Create confusion matrix for visualization
-cm = confusion_matrix(test_Y, final_preds)
-plt.figure(figsize=(15, 12))
-sns.heatmap(cm, annot=True, fmt='g', cmap='Blues', 
-            xticklabels=label_encoder.classes_, 
-            yticklabels=label_encoder.classes_)
-plt.xlabel('Predicted')
-plt.ylabel('True')
-plt.title('Confusion Matrix')
-plt.tight_layout()
-plt.savefig(os.path.join("plots", "confusion_matrix.png"))
-plt.close()
-
-# Calculate per-class performance
-classification_rep = classification_report(test_Y, final_preds, 
-                                          target_names=label_encoder.classes_,
-                                          output_dict=True)
-per_class_df = pd.DataFrame(classification_rep).transpose()
-per_class_df.to_csv(os.path.join("plots", "per_class_metrics.csv"))
-
-print("Training and evaluation complete. Models saved.")
\ No newline at end of file
+def evaluate(load_data, svm_search, rf_search, nb_search, xgb, stacking, voting, path, n_jobs):
+    # Load test data for validation
+    test_data = load_dataset(path).frame()
+    test_X = test_data.iloc[:, :-1]
+    test_Y = load_data["label_encoder"].transform(test_data.iloc[:, -1])
+
+    # Evaluate each individual model
+    models = {
+        "SVM": svm_search["model"],
+        "Naive Bayes": nb_search["model"],
+        "Random Forest": rf_search["model"],
+        "XGBoost": xgb,
+        "Stacking": stacking,
+        "Voting": voting
+    }
+
+    results = {}
+    for name, model in models.items():
+        y_pred = model.predict(test_X)
+        acc = accuracy_score(test_Y, y_pred)
+        f1 = f1_score(test_Y, y_pred, average='weighted')
+        results[name] = {"accuracy": acc, "f1_score": f1}
+        print(f"{name} - Accuracy: {acc:.4f}, F1-Score: {f1:.4f}")
+
+    # Optimize weights based on model performance
+    model_list = [rf_search["model"], nb_search["model"], svm_search["model"], xgb]
+    weights = np.array([results["Random Forest"]["f1_score"],
+                       results["Naive Bayes"]["f1_score"],
+                       results["SVM"]["f1_score"],
+                       results["XGBoost"]["f1_score"]])
+    weights = weights / np.sum(weights)  # Normalize weights
+
+    # Get optimized ensemble predictions
+    final_preds = get_enhanced_ensemble_prediction(model_list, test_X, weights)
+    accuracy = accuracy_score(test_Y, final_preds)
+    f1 = f1_score(test_Y, final_preds, average='weighted')
+    print(f"Enhanced Weighted Ensemble - Accuracy: {accuracy:.4f}, F1-Score: {f1:.4f}")
+    return {"results": results, "weights": weights, "test_Y": test_Y, "final_preds": final_preds}
+
+
+def save(load_data, feature_selection, dedupe, svm_search, rf_search, nb_search, xgb, stacking, voting, evaluate, n_jobs):
+    """Write the models, metadata and plots (always runs, even when every stage was cached)."""
+    os.makedirs(MODELS_DIR, exist_ok=True)
+    os.makedirs(PLOTS_DIR, exist_ok=True)
+    label_encoder = load_data["label_encoder"]
+
+    # Save trained models and label encoder
+    joblib.dump(svm_search["model"], os.path.join(MODELS_DIR, "svm_model.pkl"))
+    joblib.dump(nb_search["model"], os.path.join(MODELS_DIR, "nb_model.pkl"))
+    joblib.dump(rf_search["model"], os.path.join(MODELS_DIR, "rf_model.pkl"))
+    joblib.dump(label_encoder, os.path.join(MODELS_DIR, "label_encoder.pkl"))
+    joblib.dump(xgb, os.path.join(MODELS_DIR, "xgb_model.pkl"))
+    joblib.dump(feature_selection["selector"], os.path.join(MODELS_DIR, "feature_selector.pkl"))
+    joblib.dump(stacking, os.path.join(MODELS_DIR, "stacking_model.pkl"))
+    joblib.dump(voting, os.path.join(MODELS_DIR, "voting_model.pkl"))
+
+    # Save optimal weights
+    weights = evaluate["weights"]
+    joblib.dump(weights, os.path.join(MODELS_DIR, "ensemble_weights.pkl"))
+
+    # Store model metadata
+    symptoms = load_data["X"].columns.values
+    symptom_index = {symptom.replace("_", " ").capitalize(): idx for idx, symptom in enumerate(symptoms)}
+    prediction_classes = label_encoder.classes_
+
+    # Save metadata
+    metadata = {
+        "symptoms": symptoms.tolist(),
+        "symptom_index": symptom_index,
+        "prediction_classes": prediction_classes.tolist(),
+        "selected_features": feature_selection["selected_features"].tolist(),
+        "model_weights": weights.tolist()
+    }
+    joblib.dump(metadata, os.path.join(MODELS_DIR, "metadata.pkl"))
+
+    # Plot class distribution
+    plt.figure(figsize=(12, 6))
+    sns.countplot(y=pd.Series(load_data["y"]).map(lambda x: label_encoder.inverse_transform([x])[0]))
+    plt.title('Class Distribution')
+    plt.xticks(rotation=90)
+    plt.tight_layout()
+    plt.savefig(os.path.join(PLOTS_DIR, "class_distribution.png"))
+    plt.close()
+
+    # Plot feature importances
+    plt.figure(figsize=(12, 8))
+    sns.barplot(x='importance', y='feature', data=feature_selection["feature_importances"].head(20))
+    plt.title('Top 20 Feature Importances')
+    plt.tight_layout()
+    plt.savefig(os.path.join(PLOTS_DIR, "feature_importances.png"))
+    plt.close()
+
+    # Create confusion matrix for visualization
+    cm = confusion_matrix(evaluate["test_Y"], evaluate["final_preds"])
+    plt.figure(figsize=(15, 12))
+    sns.heatmap(cm, annot=True, fmt='g', cmap='Blues',
+                xticklabels=label_encoder.classes_,
+                yticklabels=label_encoder.classes_)
+    plt.xlabel('Predicted')
+    plt.ylabel('True')
+    plt.title('Confusion Matrix')
+    plt.tight_layout()
+    plt.savefig(os.path.join(PLOTS_DIR, "confusion_matrix.png"))
+    plt.close()
+
+    # Calculate per-class performance
+    classification_rep = classification_report(evaluate["test_Y"], evaluate["final_preds"],
+                                              target_names=label_encoder.classes_,
+                                              output_dict=True)
+    per_class_df = pd.DataFrame(classification_rep).transpose()
+    per_class_df.to_csv(os.path.join(PLOTS_DIR, "per_class_metrics.csv"))
+
+    # Profiles one symptom apart, for later analysis of the labels
+    pairs = dedupe["near_duplicates"].copy()
+    for column in ["label_with", "label_without"]:
+        pairs[column] = label_encoder.inverse_transform(pairs[column].astype(int)) if len(pairs) else pairs[column]
+    pairs.to_csv(os.path.join(PLOTS_DIR, "near_duplicates.csv"), index=False)
+
+
+def build_stages(search_method="grid", use_dedupe=False):
+    base_deps = ["svm_search", "rf_search", "nb_search", "xgb"]
+    ensemble_helpers = [base_estimators, ensemble_rows, fit_kwargs]
+    return [
+        Stage("load_data", load_data, params={"path": DATA_PATH_TRAIN}, files=[DATA_PATH_TRAIN],
+              helpers=[load_dataset, build_cache, SymptomDataset]),
+        Stage("split", split, deps=["load_data"]),
+        Stage("feature_selection", feature_selection, deps=["split"], cores=-1),
+        Stage("dedupe", dedupe, deps=["split"], helpers=[near_duplicates]),
+        Stage("resample", resample, deps=["split", "dedupe"], params={"use_dedupe": use_dedupe}),
+        Stage("svm_search", search, deps=["resample"], cores=-1, helpers=[fit_kwargs], params={
+            "label": "SVM",
+            "estimator": SVC(probability=True, class_weight='balanced'),
+            "param_grid": SVM_PARAM_GRID,
+            "method": search_method
+        }),
+        Stage("rf_search", search, deps=["resample"], cores=-1, helpers=[fit_kwargs], params={
+            "label": "RF",
+            "estimator": RandomForestClassifier(random_state=18),
+            "param_grid": RF_PARAM_GRID,
+            "method": search_method
+        }),
+        Stage("nb_search", search, deps=["resample"], cores=-1, helpers=[fit_kwargs], params={
+            "label": "NB",
+            "estimator": GaussianNB(),
+            "param_grid": NB_PARAM_GRID,
+            "method": search_method
+        }),
+        Stage("xgb", xgb, deps=["resample"], cores=-1, helpers=[fit_kwargs], params={"params": XGB_PARAMS}),
+        Stage("stacking", stacking, deps=["split", "dedupe"] + base_deps, cores=-1, helpers=ensemble_helpers,
+              params={"use_dedupe": use_dedupe}),
+        Stage("voting", voting, deps=["split", "dedupe"] + base_deps, cores=-1, helpers=ensemble_helpers,
+              params={"weights": VOTING_WEIGHTS, "use_dedupe": use_dedupe}),
+        Stage("evaluate", evaluate, deps=["load_data"] + base_deps + ["stacking", "voting"],
+              params={"path": DATA_PATH_TEST}, files=[DATA_PATH_TEST],
+              helpers=[get_enhanced_ensemble_prediction, load_dataset, build_cache, SymptomDataset]),
+        Stage("save", save, deps=["load_data", "feature_selection", "dedupe"] + base_deps + ["stacking", "voting", "evaluate"],
+              cache=False)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the disease prediction models")
+    parser.add_argument("--cores", type=int, default=os.cpu_count(), help="cores shared by all running stages")
+    parser.add_argument("--search", choices=["grid", "halving"], default="grid",
+                        help="exhaustive grid search or successive halving for SVM / RF / NB")
+    parser.add_argument("--dedupe", action="store_true",
+                        help="train on unique rows weighted by their counts instead of every duplicate")
+    parser.add_argument("--force", default="", help="comma-separated stages to recompute (with everything downstream) even when cached")
+    parser.add_argument("--no-cache", action="store_true", help="recompute every stage")
+    parser.add_argument("--cache-dir", default=CACHE_DIR)
+    args = parser.parse_args()
+
+    run_pipeline(
+        build_stages(args.search, args.dedupe),
+        cores=args.cores,
+        cache_dir=args.cache_dir,
+        use_cache=not args.no_cache,
+        force={name for name in args.force.split(",") if name}
+    )
+    print("Training and evaluation complete. Models saved.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+"""
+Choose the ensemble composition served by services/predictor.py.
+
+Every subset of {rf, nb, svm, xgb, voting, stacking}, under every weighting
+from --weights (plus the F1-derived ensemble_weights.pkl blend), is scored on
+    test   datasets/Testing.csv rows plus sparse 1-6 symptom samples of them
+    cv     out-of-fold predictions of clones refitted on Training.csv folds
+           grouped by symptom profile (so no validation profile is ever seen
+           in training), again plus sparse samples
+and costed by its 1-row p99 latency (members timed one row at a time on the
+served engines, summed per row) and the memory of its fitted members.
+
+The Pareto frontier of --metric against p99 latency and memory is printed,
+and the cheapest frontier point within --tolerance of the best score is
+written to ml_models/serving_config.json, which the predictor loads for the
+artifacts it was chosen for (SERVING_CONFIG=false keeps the voting ensemble).
+
+Run from the backend directory after modeltraining.py:
+    python optimize_ensemble.py [--folds 5] [--metric cv_f1] [--tolerance 0.005]
+"""
+import argparse
+import itertools
+import json
+import math
+import os
+import time
+from datetime import datetime
+from functools import reduce
+
+import joblib
+import numpy as np
+from sklearn.base import clone
+from sklearn.metrics import f1_score
+from sklearn.model_selection import StratifiedGroupKFold
+
+from build_profile_index import TESTING_CSV, TRAINING_CSV, sparse_samples
+from services.model_registry import estimate_nbytes
+from services.predictor import BASE_MODEL_NAMES, COMPOSITION_MEMBERS, SERVING_CONFIG_PATH, current_models, member_proba
+from services.symptom_dataset import load_dataset
+
+METRICS = ["test_accuracy", "test_f1", "cv_accuracy", "cv_f1"]
+
+
+def load_rows(path, label_encoder):
+    data = load_dataset(path)
+    return np.asarray(data.X), label_encoder.transform(data.labels)
+
+
+def with_sparse(X, y, per_row, seed):
+    """Full rows followed by `per_row` sparse samples of each, with their labels."""
+    if not per_row:
+        return X, y
+    return np.vstack([X, sparse_samples(X, per_row, seed)]), np.concatenate([y, np.repeat(y, per_row)])
+
+
+def served_probas(models, X, members):
+    """member -> probabilities of the served (possibly compiled) models."""
+    proba_cache = {}
+    return {name: member_proba(name, X, proba_cache, models) for name in members}
+
+
+def cv_probas(models, X, y, members, folds, per_row, seed):
+    """Out-of-fold member probabilities from clones refitted on profile-grouped folds."""
+    n_classes = len(models.prediction_classes)
+    _, groups = np.unique(X, axis=0, return_inverse=True)
+    splitter = StratifiedGroupKFold(n_splits=folds, shuffle=True, random_state=seed)
+    templates = {name: joblib.load(os.path.join(models.models_dir, f"{name}_model.pkl")) for name in members}
+
+    probas = {name: [] for name in members}
+    labels = []
+    for fold, (train, val) in enumerate(splitter.split(X, y, groups.ravel()), 1):
+        val_X, val_y = with_sparse(X[val], y[val], per_row, seed + fold)
+        labels.append(val_y)
+        start = time.perf_counter()
+        for name, template in templates.items():
+            estimator = clone(template).fit(X[train], y[train])
+            # A class absent from the fold's training rows gets probability 0
+            proba = np.zeros((len(val_X), n_classes))
+            proba[:, estimator.classes_] = estimator.predict_proba(val_X)
+            probas[name].append(proba)
+        print(f"  fold {fold}/{folds}: {len(train)} training rows, {len(val_X)} validation rows "
+              f"({time.perf_counter() - start:.1f} s)", flush=True)
+    return {name: np.vstack(parts) for name, parts in probas.items()}, np.concatenate(labels)
+
+
+def member_latencies(models, X, members):
+    """(members x rows) milliseconds to score each row alone, as run_composition would."""
+    timings = np.zeros((len(members), len(X)))
+    for i, name in enumerate(members):
+        member_proba(name, X[:1], {}, models)
+        for j, row in enumerate(X):
+            row = row.reshape(1, -1)
+            start = time.perf_counter()
+            member_proba(name, row, {}, models)
+            if name == "svm":
+                models.base_models["svm"].predict(row)
+            timings[i, j] = (time.perf_counter() - start) * 1000
+    return timings
+
+
+def member_objects(models, name):
+    if name == "voting":
+        return list(models.voting_estimators)
+    if name == "stacking":
+        return list(models.stacking_estimators) + [models.stacking_final_estimator]
+    return [models.base_models[name]]
+
+
+def compositions(members, weight_grid, ensemble_weights):
+    """(members, weights) candidates; weightings that are multiples of another are skipped."""
+    for k in range(1, len(members) + 1):
+        for subset in itertools.combinations(members, k):
+            grid = [(1,)] if k == 1 else itertools.product(weight_grid, repeat=k)
+            for weights in grid:
+                if reduce(math.gcd, weights) == 1:
+                    yield list(subset), list(weights)
+    base = [name for name in BASE_MODEL_NAMES if name in members]
+    yield base, [float(w) for w in ensemble_weights]
+
+
+def score(probas, y, names, weights):
+    labels = np.argmax(np.average([probas[name] for name in names], axis=0, weights=weights), axis=1)
+    return float(np.mean(labels == y)), float(f1_score(y, labels, average="macro"))
+
+
+def pareto_frontier(rows, metric):
+    """Rows no other row beats on metric (higher), p99 and memory (lower) at once."""
+    # Costs as "lower is better" columns so one comparison covers all three objectives
+    costs = np.array([[-row[metric], row["p99_ms"], row["memory_bytes"]] for row in rows])
+    frontier = []
+    for i, cost in enumerate(costs):
+        dominated = np.all(costs <= cost, axis=1) & np.any(costs < cost, axis=1)
+        if not dominated.any():
+            frontier.append(rows[i])
+    return frontier
+
+
+def label(row):
+    return " + ".join(f"{w:g}*{name}" for name, w in zip(row["members"], row["weights"]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pareto-optimise the served ensemble composition")
+    parser.add_argument("--folds", type=int, default=5, help="profile-grouped CV folds (0 skips cross-validation)")
+    parser.add_argument("--sparse-samples", type=int, default=3, help="sparse samples per evaluation row")
+    parser.add_argument("--weights", default="1,2,3", help="weight grid for each member of a blend")
+    parser.add_argument("--metric", choices=METRICS, help="score traded against cost (default cv_f1, test_f1 without folds)")
+    parser.add_argument("--tolerance", type=float, default=0.005, help="score the chosen composition may give up vs. the best")
+    parser.add_argument("--latency-rows", type=int, default=300, help="evaluation rows timed one at a time")
+    parser.add_argument("--seed", type=int, default=24)
+    parser.add_argument("--output", default=SERVING_CONFIG_PATH)
+    args = parser.parse_args()
+    metric = args.metric or ("cv_f1" if args.folds else "test_f1")
+    if metric.startswith("cv") and not args.folds:
+        raise SystemExit(f"❌ --metric {metric} needs --folds > 0")
+
+    models = current_models()
+    members = [name for name in COMPOSITION_MEMBERS if models.has_member(name)]
+    print(f"Members: {', '.join(members)}")
+
+    test_X, test_y = with_sparse(*load_rows(TESTING_CSV, models.label_encoder), args.sparse_samples, args.seed)
+    test = served_probas(models, test_X, members)
+    if args.folds:
+        print(f"Cross-validating {args.folds} profile-grouped folds")
+        cv, cv_y = cv_probas(models, *load_rows(TRAINING_CSV, models.label_encoder), members,
+                             args.folds, args.sparse_samples, args.seed)
+
+    sample = test_X[np.random.default_rng(args.seed).choice(len(test_X), min(args.latency_rows, len(test_X)), replace=False)]
+    timings = dict(zip(members, member_latencies(models, sample, members)))
+    # Members never share fitted models (voting / stacking hold their own fits)
+    memory = {name: estimate_nbytes(member_objects(models, name)) for name in members}
+
+    rows = []
+    for names, weights in compositions(members, [int(w) for w in args.weights.split(",")], models.ensemble_weights):
+        row = {"members": names, "weights": weights}
+        row["test_accuracy"], row["test_f1"] = score(test, test_y, names, weights)
+        if args.folds:
+            row["cv_accuracy"], row["cv_f1"] = score(cv, cv_y, names, weights)
+        row["p99_ms"] = float(np.percentile(sum(timings[name] for name in names), 99))
+        row["memory_bytes"] = sum(memory[name] for name in names)
+        rows.append(row)
+
+    frontier = sorted(pareto_frontier(rows, metric), key=lambda row: row["p99_ms"])
+    best = max(row[metric] for row in rows)
+    chosen = min((row for row in frontier if row[metric] >= best - args.tolerance),
+                 key=lambda row: (row["p99_ms"], row["memory_bytes"]))
+    current = next((row for row in rows if row["members"] == ["voting"]), None)
+
+    columns = [m for m in METRICS if m in rows[0]]
+    print(f"\n{len(rows)} compositions, {len(frontier)} on the {metric} / p99 / memory frontier:")
+    print(f"{'composition':<44} " + " ".join(f"{m:>13}" for m in columns) + f" {'p99 ms':>8} {'MiB':>7}")
+    for row in frontier + ([current] if current and current not in frontier else []):
+        marks = ("  <- chosen" if row is chosen else "") + ("  (voting, served today)" if row is current else "")
+        print(f"{label(row):<44} " + " ".join(f"{row[m]:>13.4f}" for m in columns) +
+              f" {row['p99_ms']:>8.2f} {row['memory_bytes'] / 2**20:>7.1f}{marks}")
+
+    with open(args.output, "w") as f:
+        json.dump({
+            "model_version": models.fingerprint,
+            "created_at": datetime.utcnow().isoformat(),
+            "members": chosen["members"],
+            "weights": chosen["weights"],
+            "metric": metric,
+            "tolerance": args.tolerance,
+            "folds": args.folds,
+            "chosen": chosen,
+            "voting": current,
+            "frontier": frontier
+        }, f, indent=2)
+    print(f"✅ Serving composition {label(chosen)} written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
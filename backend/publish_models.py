@@ -0,0 +1,49 @@
+"""
+Publish the artifacts in ml_models/ as an immutable model version.
+
+Copies the pickles, compiled/ and cascade_thresholds.json into
+ml_models/versions/<version>/ with a manifest of content hashes, then points
+ml_models/versions/ACTIVE at it. Servers started with MODEL_WATCH_INTERVAL
+pick the new version up on their own; otherwise POST /admin/models/reload
+with "Authorization: Bearer $ADMIN_API_TOKEN".
+
+Run from the backend directory after modeltraining.py (and optionally
+compile_models.py / fit_cascade.py):
+    python publish_models.py                   # publish + activate
+    python publish_models.py --no-activate     # publish only
+    python publish_models.py --activate <ver>  # point servers at a published version
+    python publish_models.py --list
+"""
+import argparse
+
+from services.model_versions import MODELS_DIR, list_versions, publish_version, read_active_version, set_active_version, verify_version
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Publish ml_models/ as a versioned model set")
+    parser.add_argument("--source", default=MODELS_DIR, help="directory holding the freshly trained artifacts")
+    parser.add_argument("--no-activate", action="store_true", help="publish without moving the ACTIVE pointer")
+    parser.add_argument("--activate", metavar="VERSION", help="only move the ACTIVE pointer to a published version")
+    parser.add_argument("--list", action="store_true", help="list published versions")
+    args = parser.parse_args()
+
+    if args.list:
+        active = read_active_version()
+        for manifest in list_versions():
+            marker = "*" if manifest["version"] == active else " "
+            print(f"{marker} {manifest['version']}  {manifest['created_at']}  {len(manifest['artifacts'])} files")
+        return
+
+    if args.activate:
+        verify_version(args.activate)
+        set_active_version(args.activate)
+        print(f"✅ ACTIVE -> {args.activate}")
+        return
+
+    version = publish_version(args.source, activate=not args.no_activate)
+    verify_version(version)
+    print(f"✅ Published model version {version}" + ("" if args.no_activate else " (active)"))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,21 @@
-from flask import Blueprint, request, jsonify
+import hmac
+from flask import Blueprint, request, jsonify, current_app
 from services.admin_service import add_doctor, get_all_doctors, get_doctor_by_id
+from services import predictor
+from services.model_versions import is_version_id, list_versions, read_active_version
 
 admin_bp = Blueprint("admin", __name__)
 
+@admin_bp.before_request
+def require_admin_token():
+    """Every admin endpoint needs "Authorization: Bearer <ADMIN_API_TOKEN>"; without a token set they are off"""
+    token = current_app.config.get("ADMIN_API_TOKEN")
+    if not token:
+        return jsonify({"error": "Admin API is disabled"}), 404
+    auth_header = request.headers.get("Authorization", "")
+    if not auth_header.startswith("Bearer ") or not hmac.compare_digest(auth_header[len("Bearer "):].encode(), token.encode()):
+        return jsonify({"error": "Invalid admin token"}), 401
+
 @admin_bp.route("/doctors", methods=["POST"])
 def add_doctor_api():
     doctor_data = request.json
@@ -16,3 +29,37 @@ def get_all_doctors_api():
 @admin_bp.route("/doctors/<doctor_id>", methods=["GET"])
 def get_doctor_by_id_api(doctor_id):
     return jsonify(get_doctor_by_id(doctor_id)), 200
+
+@admin_bp.route("/models", methods=["GET"])
+def get_model_versions_api():
+    """Published model versions, the one being served and the last reload"""
+    return jsonify({
+        "active": predictor.current_models().summary(),
+        "previous": predictor.previous_models.summary() if predictor.previous_models else None,
+        "pointer": read_active_version(),
+        "reload": predictor.reload_status,
+        "versions": [
+            {key: manifest[key] for key in ("version", "model_fingerprint", "created_at")}
+            for manifest in list_versions()
+        ]
+    }), 200
+
+@admin_bp.route("/models/reload", methods=["POST"])
+def reload_models_api():
+    """Load a version (default: the ACTIVE pointer) in the background and swap it in when warm"""
+    version = (request.get_json(silent=True) or {}).get("version")
+    if version is not None and not is_version_id(version):
+        return jsonify({"error": "version must be a published model version id"}), 400
+    if version is not None and version not in {manifest["version"] for manifest in list_versions()}:
+        return jsonify({"error": f"Model version {version} is not published"}), 404
+    if not predictor.start_reload(version):
+        return jsonify({"error": "A model reload is already running"}), 409
+    return jsonify({"status": "loading", "version": version}), 202
+
+@admin_bp.route("/models/rollback", methods=["POST"])
+def rollback_models_api():
+    """Swap the previously served version back in"""
+    try:
+        return jsonify(predictor.rollback_models()), 200
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 409
@@ -1,7 +1,14 @@
 import datetime
+import json
+from itertools import islice
 from bson import ObjectId
-from flask import Blueprint, current_app, request, jsonify
-from services.predictor import predict_disease
+from flask import Blueprint, Response, current_app, request, jsonify, stream_with_context
+from services.predictor import cascade_stats, current_models, predict_disease, predict_disease_batch, prediction_cache, profile_index_stats
+from services.prediction_cache import LRUCache
+from services.client_bundle import get_bundle
+from services.micro_batcher import get_batcher
+from services.inference_pool import get_pool
+from services.symptom_vocabulary import normalize_symptom
 from services.chatbot_predictor import get_conversation_summary, process_message, start_chat  # New chatbot logic
 from database import mongo
 
@@ -80,6 +87,93 @@ prediction_bp = Blueprint("prediction", __name__)
 #################################################################################
 #################################################################################
 
+# Common daily diseases mapping
+common_diseases_mapping = {
+    "Cough": ["Common Cold", "Flu", "Bronchitis"],
+    "High Fever": ["Flu", "Common Cold", "Viral Infection"],
+    "Headache": ["Tension Headache", "Migraine", "Stress"],
+    "Stomach Pain": ["Gastritis", "Food Poisoning", "Indigestion"],
+    "Nausea": ["Gastritis", "Food Poisoning", "Viral Infection"],
+    "Vomiting": ["Gastroenteritis", "Food Poisoning"],
+    "Diarrhea": ["Food Poisoning", "Viral Gastroenteritis"],
+    "Skin Rash": ["Allergic Reaction", "Eczema", "Dermatitis"],
+    "Itching": ["Allergic Reaction", "Dry Skin"],
+    "Fatigue": ["Stress", "Common Cold", "Viral Infection"],
+    "Sore Throat": ["Viral Infection", "Strep Throat"],
+    "Runny Nose": ["Common Cold", "Allergic Rhinitis"],
+    "Joint Pain": ["Muscle Strain", "Mild Arthritis"],
+    "Back Pain": ["Muscle Strain", "Poor Posture"],
+    "Anxiety": ["Stress", "Generalized Anxiety"],
+    "Mild Fever": ["Viral Infection", "Common Cold"]
+}
+
+# Rule lookup keyed like the symptom vocabulary (case / separator / spacing-insensitive)
+common_diseases_index = {normalize_symptom(key): diseases for key, diseases in common_diseases_mapping.items()}
+
+def match_common_diseases(symptoms):
+    """Rule-based lookup: return (possible_diseases, unmatched_symptoms) for a symptom list."""
+    possible_diseases = set()
+    unmatched_symptoms = []
+
+    for symptom in symptoms:
+        diseases = common_diseases_index.get(normalize_symptom(symptom))
+        if diseases is None:
+            unmatched_symptoms.append(symptom)
+        else:
+            possible_diseases.update(diseases)
+
+    return possible_diseases, unmatched_symptoms
+
+# Disease documents for a set of predicted names; short TTL so DB edits show up
+disease_doc_cache = LRUCache(maxsize=1024, ttl=300)
+
+def find_disease_docs(possible_diseases):
+    """Disease documents matching any of the given names, served from cache when possible."""
+    key = frozenset(possible_diseases)
+    disease_docs = disease_doc_cache.get(key)
+    if disease_docs is None:
+        disease_docs = list(mongo.db.diseases.find({"disease_name": {"$in": list(possible_diseases)}}))
+        disease_doc_cache.put(key, disease_docs)
+    return list(disease_docs)
+
+def attach_disease_ids(prediction_response, possible_diseases, primary_disease):
+    """Add disease_id / specialty_id of the primary matching disease document to a response."""
+    if primary_disease:
+        prediction_response["disease_id"] = str(primary_disease["_id"])
+        prediction_response["specialty_id"] = str(primary_disease.get("specialty_id", "Unknown"))
+    else:
+        prediction_response["disease_id"] = None
+        prediction_response["specialty_id"] = None
+        prediction_response["id_error"] = f"Disease(s) {list(possible_diseases)} not found in database"
+
+def run_ml_prediction(symptoms):
+    """Run the ML ensemble in a worker process or through the micro-batcher when enabled."""
+    if current_app.config.get("INFERENCE_POOL"):
+        pool = get_pool(
+            current_app.config["INFERENCE_POOL_SIZE"],
+            current_app.config["INFERENCE_POOL_QUEUE_DEPTH"],
+            current_app.config["INFERENCE_POOL_TIMEOUT_S"]
+        )
+        return pool.predict({"symptoms": symptoms})
+    if current_app.config.get("PREDICT_BATCHING"):
+        batcher = get_batcher(
+            current_app.config["PREDICT_BATCH_MAX_SIZE"],
+            current_app.config["PREDICT_BATCH_MAX_WAIT_MS"]
+        )
+        return batcher.predict({"symptoms": symptoms})
+    return predict_disease({"symptoms": symptoms})
+
+def run_ml_batch(symptom_sets):
+    """Run the ML ensemble over many symptom sets, in a worker process when the pool is enabled."""
+    if current_app.config.get("INFERENCE_POOL"):
+        pool = get_pool(
+            current_app.config["INFERENCE_POOL_SIZE"],
+            current_app.config["INFERENCE_POOL_QUEUE_DEPTH"],
+            current_app.config["INFERENCE_POOL_TIMEOUT_S"]
+        )
+        return pool.predict_batch(symptom_sets)
+    return predict_disease_batch(symptom_sets)
+
 @prediction_bp.route("/predict", methods=["POST"])
 async def predict():
     try:
@@ -92,40 +186,8 @@ async def predict():
 
         print(f"Received symptoms: {symptoms}")
 
-        # Common daily diseases mapping
-        common_diseases_mapping = {
-            "Cough": ["Common Cold", "Flu", "Bronchitis"],
-            "High Fever": ["Flu", "Common Cold", "Viral Infection"],
-            "Headache": ["Tension Headache", "Migraine", "Stress"],
-            "Stomach Pain": ["Gastritis", "Food Poisoning", "Indigestion"],
-            "Nausea": ["Gastritis", "Food Poisoning", "Viral Infection"],
-            "Vomiting": ["Gastroenteritis", "Food Poisoning"],
-            "Diarrhea": ["Food Poisoning", "Viral Gastroenteritis"],
-            "Skin Rash": ["Allergic Reaction", "Eczema", "Dermatitis"],
-            "Itching": ["Allergic Reaction", "Dry Skin"],
-            "Fatigue": ["Stress", "Common Cold", "Viral Infection"],
-            "Sore Throat": ["Viral Infection", "Strep Throat"],
-            "Runny Nose": ["Common Cold", "Allergic Rhinitis"],
-            "Joint Pain": ["Muscle Strain", "Mild Arthritis"],
-            "Back Pain": ["Muscle Strain", "Poor Posture"],
-            "Anxiety": ["Stress", "Generalized Anxiety"],
-            "Mild Fever": ["Viral Infection", "Common Cold"]
-        }
-
         # Determine diseases by checking each input symptom
-        possible_diseases = set()
-        unmatched_symptoms = []
-
-        for symptom in symptoms:
-            matched = False
-            for key, diseases in common_diseases_mapping.items():
-                if symptom.strip().lower() == key.lower():
-                    possible_diseases.update(diseases)
-                    matched = True
-                    break
-            
-            if not matched:
-                unmatched_symptoms.append(symptom)
+        possible_diseases, unmatched_symptoms = match_common_diseases(symptoms)
 
         print(f"Rule-based possible diseases: {possible_diseases}")
 
@@ -133,7 +195,7 @@ async def predict():
         if unmatched_symptoms or not possible_diseases:
             try:
                 # Call external ML prediction function
-                ml_prediction = predict_disease({"symptoms": symptoms})
+                ml_prediction = run_ml_prediction(symptoms)
                 print(f"ML Prediction raw output: {ml_prediction}")
 
                 # Ensure final prediction is always treated as a list
@@ -163,19 +225,13 @@ async def predict():
         print(f"Final possible diseases before DB lookup: {possible_diseases}")
 
         # Fetch primary disease details - use disease_name field instead of name
-        disease_doc = list(mongo.db.diseases.find({"disease_name": {"$in": list(possible_diseases)}}))
+        disease_doc = find_disease_docs(possible_diseases)
         
         print(f"Disease documents from DB: {disease_doc}")
 
         # Prepare response details
-        if disease_doc:
-            primary_disease = disease_doc[0]  # Take the first matching disease
-            prediction_response["disease_id"] = str(primary_disease["_id"])
-            prediction_response["specialty_id"] = str(primary_disease.get("specialty_id", "Unknown"))
-        else:
-            prediction_response["disease_id"] = None
-            prediction_response["specialty_id"] = None
-            prediction_response["id_error"] = f"Disease(s) {list(possible_diseases)} not found in database"
+        attach_disease_ids(prediction_response, possible_diseases, disease_doc[0] if disease_doc else None)
+        if not disease_doc:
             print(f"ID error generated: {prediction_response['id_error']}")
 
        # Store prediction in database if user is authenticated
@@ -212,6 +268,95 @@ async def predict():
     except Exception as e:
         print("Server Error:", str(e))
         return jsonify({"error": str(e)}), 500
+
+# Symptom sets scored per model pass / $in query by /predict_batch
+BATCH_CHUNK_SIZE = 512
+
+def read_symptom_sets():
+    """Yield symptom lists from a JSON array body or a streamed NDJSON body (one set per line)."""
+    if request.mimetype in ("application/x-ndjson", "application/jsonl"):
+        for line in request.stream:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                item = json.loads(line)
+            except ValueError:
+                yield None
+                continue
+            yield item.get("symptoms") if isinstance(item, dict) else item
+    else:
+        input_json = request.get_json(silent=True)
+        if isinstance(input_json, dict):
+            input_json = input_json.get("symptom_sets")
+        yield from input_json or []
+
+def predict_symptom_sets(symptom_sets):
+    """Rule-based path, one batched ML pass and one $in enrichment query for a chunk of symptom sets."""
+    responses = [None] * len(symptom_sets)
+    possible = [None] * len(symptom_sets)
+    ml_rows = []
+
+    for i, symptoms in enumerate(symptom_sets):
+        if not isinstance(symptoms, list) or not all(isinstance(s, str) for s in symptoms):
+            responses[i] = {"error": "Each symptom set must be a list of strings"}
+            continue
+
+        possible_diseases, unmatched_symptoms = match_common_diseases(symptoms)
+        if unmatched_symptoms or not possible_diseases:
+            ml_rows.append(i)
+        else:
+            possible[i] = possible_diseases
+            responses[i] = {
+                "final_prediction": list(possible_diseases),
+                "prediction_type": "rule-based",
+                "confidence_scores": {"rule_based": 0.7}
+            }
+
+    if ml_rows:
+        try:
+            ml_predictions = run_ml_batch([symptom_sets[i] for i in ml_rows])
+            for i, ml_prediction in zip(ml_rows, ml_predictions):
+                possible[i] = {ml_prediction["final_prediction"]}
+                responses[i] = ml_prediction
+        except Exception as e:
+            print("ML Batch Prediction Error:", str(e))
+            for i in ml_rows:
+                possible[i] = {"Unknown Disease"}
+                responses[i] = {"final_prediction": ["Unknown Disease"], "error": "ML prediction failed"}
+
+    disease_names = set().union(*[p for p in possible if p])
+    disease_docs = list(mongo.db.diseases.find({"disease_name": {"$in": list(disease_names)}})) if disease_names else []
+
+    for i, possible_diseases in enumerate(possible):
+        if possible_diseases is None:
+            continue
+        primary_disease = next((doc for doc in disease_docs if doc["disease_name"] in possible_diseases), None)
+        attach_disease_ids(responses[i], possible_diseases, primary_disease)
+
+    return responses
+
+@prediction_bp.route("/predict_batch", methods=["POST"])
+def predict_batch():
+    """Score many symptom sets at once; results are streamed back as NDJSON in input order"""
+    if request.mimetype not in ("application/x-ndjson", "application/jsonl"):
+        input_json = request.get_json(silent=True)
+        if not isinstance(input_json, (list, dict)):
+            return jsonify({"error": "Expected a JSON array of symptom lists or NDJSON"}), 400
+
+    symptom_sets = read_symptom_sets()
+
+    def generate():
+        index = 0
+        while True:
+            chunk = list(islice(symptom_sets, BATCH_CHUNK_SIZE))
+            if not chunk:
+                break
+            for response in predict_symptom_sets(chunk):
+                yield json.dumps({"index": index, **response}) + "\n"
+                index += 1
+
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
     
 @prediction_bp.route("/delete_prediction", methods=["DELETE"])
 async def delete_prediction():
@@ -250,6 +395,103 @@ async def delete_prediction():
         print("Server Error:", str(e))
         return jsonify({"error": str(e)}), 500
 
+@prediction_bp.route("/confirm_prediction", methods=["POST"])
+def confirm_prediction():
+    """Record the confirmed diagnosis of a stored prediction; incremental_update.py trains on these"""
+    try:
+        input_json = request.get_json()
+
+        user_id = input_json.get("user_id")
+        prediction_id = input_json.get("prediction_id")
+
+        if not user_id or not prediction_id:
+            return jsonify({"error": "user_id and prediction_id are required"}), 400
+
+        try:
+            prediction_oid = ObjectId(prediction_id)
+        except Exception:
+            return jsonify({"error": "Invalid prediction_id format"}), 400
+
+        query = {
+            "_id": prediction_oid,
+            "user_id": ObjectId(user_id) if ObjectId.is_valid(user_id) else user_id
+        }
+        prediction = mongo.db.previous_predictions.find_one(query)
+        if prediction is None:
+            return jsonify({"error": "No matching prediction found"}), 404
+
+        # Without a corrected disease the stored prediction itself is confirmed
+        disease_name = input_json.get("disease_name") or prediction["disease_name"]
+        if disease_name not in current_models().prediction_classes:
+            return jsonify({"error": f"Unknown disease: {disease_name}"}), 400
+
+        mongo.db.previous_predictions.update_one(query, {"$set": {
+            "confirmed_disease": disease_name,
+            "confirmed_at": datetime.datetime.now()
+        }})
+        print(f"✅ Prediction {prediction_id} confirmed as {disease_name}")
+        return jsonify({"message": "Prediction confirmed", "confirmed_disease": disease_name})
+
+    except Exception as e:
+        print("Server Error:", str(e))
+        return jsonify({"error": str(e)}), 500
+
+
+
+@prediction_bp.route("/batcher_stats", methods=["GET"])
+def batcher_stats():
+    """Batch-size and queue-wait histograms of the /predict micro-batcher"""
+    if not current_app.config.get("PREDICT_BATCHING"):
+        return jsonify({"enabled": False})
+    return jsonify({"enabled": True, **get_batcher().stats()})
+
+@prediction_bp.route("/inference_pool_stats", methods=["GET"])
+def inference_pool_stats():
+    """Worker processes, queue depth, queue-wait histogram and failure counters of the inference pool"""
+    if not current_app.config.get("INFERENCE_POOL"):
+        return jsonify({"enabled": False})
+    return jsonify({"enabled": True, **get_pool().stats()})
+
+@prediction_bp.route("/cache_stats", methods=["GET"])
+def cache_stats():
+    """Hit/miss/eviction counters of the prediction and disease-document caches"""
+    return jsonify({
+        "model_version": current_models().version,
+        "predictions": prediction_cache.stats(),
+        "disease_docs": disease_doc_cache.stats()
+    })
+
+@prediction_bp.route("/cascade_stats", methods=["GET"])
+def cascade_stats_route():
+    """Per-tier hit rates of the confidence-gated model cascade"""
+    return jsonify(cascade_stats())
+
+@prediction_bp.route("/profile_index_stats", methods=["GET"])
+def profile_index_stats_route():
+    """Size, hit rate and ensemble agreement of the exact-profile index"""
+    return jsonify(profile_index_stats())
+
+@prediction_bp.route("/client_bundle", methods=["GET"])
+def client_bundle_route():
+    """Naive Bayes tables of the served models for first-pass scoring in the browser; 304 while unchanged"""
+    models = current_models()
+    data, etag = get_bundle(models)
+    response = Response(data, mimetype="application/octet-stream")
+    response.set_etag(etag)
+    # Cache, but revalidate every use: the URL stays the same when the models change
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Model-Version"] = models.version
+    response.headers["Access-Control-Expose-Headers"] = "ETag, X-Model-Version"
+    return response.make_conditional(request)
+
+@prediction_bp.route("/model_status", methods=["GET"])
+def model_status():
+    """Loaded artifacts with load time and memory size, and whether serving is degraded"""
+    models = current_models()
+    return jsonify({
+        **models.summary(),
+        "artifacts": models.registry.stats()
+    })
 
 
 #################################################################################
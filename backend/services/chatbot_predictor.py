@@ -1,26 +1,13 @@
-import os
-import joblib
-import pandas as pd
 import numpy as np
-import re
 import random
-from datetime import datetime
-from collections import Counter
+from services.predictor import current_models
+from services.inference_pool import current_pool
+from services.symptom_matcher import SymptomMatcher
+from services.session_store import ChatSession, StripedLocks, bits_of, bitset_of, current_session_store
 
-# Load models and metadata
-MODELS_DIR = os.path.join("ml_models")
-svm_model = joblib.load(os.path.join(MODELS_DIR, "svm_model.pkl"))
-nb_model = joblib.load(os.path.join(MODELS_DIR, "nb_model.pkl"))
-rf_model = joblib.load(os.path.join(MODELS_DIR, "rf_model.pkl"))
-label_encoder = joblib.load(os.path.join(MODELS_DIR, "label_encoder.pkl"))
-metadata = joblib.load(os.path.join(MODELS_DIR, "metadata.pkl"))
-
-# Define Symptoms and Dataset
-symptoms = metadata["symptoms"]
-prediction_classes = label_encoder.classes_
-data_path = os.path.join("datasets", "Training.csv")
-dataset = pd.read_csv(data_path).dropna(axis=1)
-dataset.columns = dataset.columns.str.lower()  # Normalize columns
+# Define Symptoms
+# The symptom list is fixed for the life of the process (reloads must keep it)
+symptoms = current_models().metadata["symptoms"]
 
 # Define symptom groups with friendly names and questions
 symptom_groups = {
@@ -74,9 +61,10 @@ symptom_groups = {
     }
 }
 
-# Symptom keywords for natural language processing
-symptom_keywords = {
-    "fever": ["fever", "high temperature", "hot", "burning up"],
+# Everyday phrasings of model symptoms, on top of the column names, frontend
+# display names and aliases the symptom vocabulary already knows
+symptom_synonyms = {
+    "high_fever": ["fever", "feverish", "high temperature", "hot", "burning up"],
     "fatigue": ["tired", "fatigue", "exhausted", "no energy", "weakness"],
     "headache": ["headache", "head pain", "migraine", "head hurts"],
     "skin_rash": ["rash", "skin eruption", "hives", "spots"],
@@ -85,16 +73,29 @@ symptom_keywords = {
     "vomiting": ["vomit", "throwing up", "puking"],
     "diarrhoea": ["diarrhea", "diarrhoea", "loose stools", "loose bowels"],
     "chest_pain": ["chest pain", "chest tightness", "chest discomfort"],
-    "breathlessness": ["shortness of breath", "can't breathe", "hard to breathe", "breathless"],
+    "breathlessness": ["shortness of breath", "short of breath", "can't breathe", "hard to breathe", "breathless"],
     "joint_pain": ["joint pain", "painful joints", "sore joints", "arthritis"],
-    "abdominal_pain": ["stomach pain", "abdominal pain", "tummy hurts", "belly pain"],
+    "abdominal_pain": ["abdominal pain", "tummy hurts", "belly ache"],
     "back_pain": ["back pain", "backache", "sore back", "back hurts"],
-    # Add more mappings as needed
+    "itching": ["itchy", "itch"],
+    "dizziness": ["dizzy", "lightheaded"],
+    "throat_irritation": ["sore throat", "scratchy throat"],
+    "continuous_sneezing": ["sneezing", "sneezes"],
+    "muscle_pain": ["muscle ache", "body ache", "aching muscles"],
+    "acidity": ["heartburn", "acid reflux"],
+    "constipation": ["constipated"],
+    "anxiety": ["anxious"],
+    "depression": ["depressed"],
+    "yellowish_skin": ["yellow skin"],
+    "blurred_and_distorted_vision": ["blurred vision", "blurry vision"],
 }
 
+# One automaton over every symptom spelling, built once (the symptom list is fixed)
+symptom_matcher = SymptomMatcher(current_models().vocabulary, symptom_synonyms)
+
 # Follow-up questions based on reported symptoms
 followup_questions = {
-    "fever": ["How high is your fever?", "When did the fever start?", "Does it come and go or is it constant?"],
+    "high_fever": ["How high is your fever?", "When did the fever start?", "Does it come and go or is it constant?"],
     "headache": ["Where exactly is the pain?", "How would you rate the pain on a scale of 1-10?", "Does anything make it better or worse?"],
     "cough": ["Is it a dry cough or are you coughing up phlegm?", "How long have you been coughing?", "Is it worse at night or during the day?"],
     "nausea": ["Are you also vomiting?", "Is it related to eating?", "How long have you felt nauseated?"],
@@ -134,25 +135,31 @@ responses = {
     ]
 }
 
-# Store user sessions
-user_sessions = {}
+# Sessions live in services/session_store.py as compact ChatSession state:
+# symptoms are vocabulary-column bitsets, groups and message types are indices
+group_names = list(symptom_groups)
+message_types = ["greeting", "followup", "group_question", "prediction"]
+
+# Every read-modify-write of a session holds its stripe
+session_locks = StripedLocks()
+
+def symptom_columns(names):
+    """Vocabulary columns of symptom names (the matcher only returns known ones)"""
+    vocabulary = current_models().vocabulary
+    return [vocabulary.resolve(name) for name in names]
 
 def start_chat(session_id):
     """Start a new chat session with a friendly introduction"""
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    user_sessions[session_id] = {
-        "start_time": timestamp,
-        "current_group": None,
-        "asked_groups": [],
-        "reported_symptoms": [],
-        "conversation_history": [],
-        "followup_symptoms": [],
-        "possible_diseases": list(prediction_classes),
-        "last_message_type": "greeting"
-    }
+    with session_locks.lock(session_id):
+        return new_session(session_id)
+
+def new_session(session_id):
+    """Store a fresh session and return its greeting (the caller holds the session's lock)"""
+    session = ChatSession()
     
     greeting = "Hi there! I'm your virtual health assistant. I'll ask you some questions to help understand what might be going on with your health. Please describe your main symptoms or concerns in your own words."
-    user_sessions[session_id]["conversation_history"].append({"role": "assistant", "message": greeting})
+    session.add_message("assistant", greeting)
+    current_session_store().put(session_id, session)
     
     return {"message": greeting}
 
@@ -161,101 +168,104 @@ def get_random_response(response_type):
     return random.choice(responses[response_type])
 
 def extract_symptoms(text):
-    """Extract symptoms from user's natural language input"""
-    found_symptoms = []
-    text = text.lower()
-    
-    # Look for direct symptom mentions or their synonyms
-    for symptom, keywords in symptom_keywords.items():
-        for keyword in keywords:
-            if keyword in text:
-                found_symptoms.append(symptom)
-                break
-    
-    return list(set(found_symptoms))  # Remove duplicates
+    """Extract the symptoms a user's natural language input reports (negated mentions excluded)"""
+    return symptom_matcher.extract(text)[0]
 
 def process_message(session_id, user_message):
     """Process a message from the user and generate an appropriate response"""
-    if session_id not in user_sessions:
-        return start_chat(session_id)
+    # Messages of one session are applied one at a time, in arrival order
+    with session_locks.lock(session_id):
+        return apply_message(session_id, user_message)
+
+def apply_message(session_id, user_message):
+    """Update a session with a user message (the caller holds the session's lock)"""
+    store = current_session_store()
+    session = store.get(session_id)
+    if session is None:
+        return new_session(session_id)
     
-    session = user_sessions[session_id]
-    session["conversation_history"].append({"role": "user", "message": user_message})
+    session.add_message("user", user_message)
     
-    # Extract symptoms from user message
-    new_symptoms = extract_symptoms(user_message)
+    # Extract symptoms from user message; "no fever" takes back an earlier fever
+    new_symptoms, negated_symptoms = symptom_matcher.extract(user_message)
+    if negated_symptoms:
+        negated_columns = symptom_columns(negated_symptoms)
+        session.symptoms &= ~bitset_of(negated_columns)
+        session.followups = [col for col in session.followups if col not in negated_columns]
     if new_symptoms:
-        session["reported_symptoms"].extend(new_symptoms)
-        session["reported_symptoms"] = list(set(session["reported_symptoms"]))  # Remove duplicates
+        session.symptoms |= bitset_of(symptom_columns(new_symptoms))
         
         # Add symptoms to follow up on
-        for symptom in new_symptoms:
-            if symptom in followup_questions and symptom not in session["followup_symptoms"]:
-                session["followup_symptoms"].append(symptom)
+        for symptom, col in zip(new_symptoms, symptom_columns(new_symptoms)):
+            if symptom in followup_questions and col not in session.followups:
+                session.followups.append(col)
     
     # Determine next action
     response = ""
     
     # If we have followup questions about specific symptoms, ask those first
-    if session["followup_symptoms"]:
-        symptom = session["followup_symptoms"].pop(0)
+    if session.followups:
+        symptom = current_models().vocabulary.symptoms[session.followups.pop(0)]
         question = random.choice(followup_questions[symptom])
         response = f"{get_random_response('acknowledgment')} {question}"
-        session["last_message_type"] = "followup"
+        session.last_type = message_types.index("followup")
     
     # If we haven't gone through all symptom groups, ask about a new group
-    elif len(session["asked_groups"]) < len(symptom_groups):
+    elif session.asked_groups != (1 << len(group_names)) - 1:
         # Choose a group we haven't asked about yet
-        available_groups = [g for g in symptom_groups if g not in session["asked_groups"]]
-        if available_groups:
-            next_group = available_groups[0]
-            session["asked_groups"].append(next_group)
-            session["current_group"] = next_group
-            
-            # Choose a random question from this group
-            group_question = random.choice(symptom_groups[next_group]["questions"])
-            transition = get_random_response('next_question')
-            response = f"{get_random_response('acknowledgment')} {transition} {group_question}"
-            session["last_message_type"] = "group_question"
+        next_group = next(i for i in range(len(group_names)) if not session.asked_groups >> i & 1)
+        session.asked_groups |= 1 << next_group
+        session.current_group = next_group
+        
+        # Choose a random question from this group
+        group_question = random.choice(symptom_groups[group_names[next_group]]["questions"])
+        transition = get_random_response('next_question')
+        response = f"{get_random_response('acknowledgment')} {transition} {group_question}"
+        session.last_type = message_types.index("group_question")
     
     # If we've asked about all groups and no more followups, make a prediction
     else:
-        prediction_result = get_disease_prediction(session_id)
+        prediction_result = predict_session(session)
         disease = prediction_result["predicted_disease"]
         confidence = prediction_result["confidence"]
         
         # Format the response with some empathy
         response = f"{get_random_response('acknowledgment')} Based on what you've told me, your symptoms are consistent with {disease} (confidence: {confidence:.1f}%). Remember that this is not a definitive diagnosis - please consult with a healthcare professional for proper evaluation and treatment."
-        session["last_message_type"] = "prediction"
+        session.last_type = message_types.index("prediction")
     
     # Add assistant's response to conversation history
-    session["conversation_history"].append({"role": "assistant", "message": response})
+    session.add_message("assistant", response)
+    store.put(session_id, session)
     
     return {"message": response}
 
-def get_disease_prediction(session_id):
-    """Use ML models to predict the most likely disease"""
-    session_data = user_sessions[session_id]
-    reported_symptoms = session_data["reported_symptoms"]
-    
-    # Count symptoms frequency in the conversation
-    symptom_counter = Counter(reported_symptoms)
-    
-    # Convert symptoms to ML input format
-    input_vector = np.zeros(len(symptoms))
-    for symp in reported_symptoms:
-        if symp in symptoms:
-            idx = symptoms.index(symp)
-            # Set to 1 if the symptom was mentioned at least once
-            input_vector[idx] = 1
-    
-    # Get predictions from all models
-    svm_pred = svm_model.predict_proba([input_vector])[0]
-    nb_pred = nb_model.predict_proba([input_vector])[0]
-    rf_pred = rf_model.predict_proba([input_vector])[0]
+def score_symptom_vectors(input_vectors, models=None):
+    """Average the svm / nb / rf probabilities of each encoded symptom row"""
+    # Models of the version being served (shared with predictor.py)
+    models = models or current_models()
+    model_probs = [
+        models.svm_model.predict_proba(input_vectors),
+        np.array([models.nb_scorer.predict_proba_active(np.flatnonzero(row)) for row in input_vectors])
+    ]
+    if models.rf_model is not None:
+        model_probs.append(models.rf_model.predict_proba(input_vectors))
     
     # Average probabilities across models
-    final_probs = (svm_pred + nb_pred + rf_pred) / 3
+    return np.mean(model_probs, axis=0)
+
+def predict_session(session):
+    """Use ML models to predict the most likely disease (stored on the session)"""
+    # Convert symptoms to ML input format (set to 1 if mentioned at least once)
+    input_vector = np.zeros(current_models().vocabulary.size)
+    input_vector[bits_of(session.symptoms)] = 1
+    
+    # Score in an inference worker process when offload is enabled
+    prediction_classes = current_models().label_encoder.classes_
+    pool = current_pool()
+    if pool is not None:
+        final_probs = pool.chatbot_probs(input_vector)
+    else:
+        final_probs = score_symptom_vectors(input_vector[np.newaxis, :])[0]
     top_indices = np.argsort(final_probs)[-3:][::-1]  # Get top 3 predictions
     
     predicted_disease = prediction_classes[top_indices[0]]
@@ -267,10 +277,9 @@ def get_disease_prediction(session_id):
         for idx in top_indices[1:]
     ]
     
-    session_data["prediction"] = {
-        "main": {"disease": predicted_disease, "confidence": confidence},
-        "alternatives": alternatives
-    }
+    session.prediction = [(predicted_disease, confidence)] + [
+        (alternative["disease"], alternative["confidence"]) for alternative in alternatives
+    ]
     
     return {
         "predicted_disease": predicted_disease,
@@ -278,21 +287,36 @@ def get_disease_prediction(session_id):
         "alternatives": alternatives
     }
 
+def get_disease_prediction(session_id):
+    """Use ML models to predict the most likely disease for a stored session"""
+    store = current_session_store()
+    with session_locks.lock(session_id):
+        session = store.get(session_id)
+        if session is None:
+            return {"error": "Session not found"}
+        prediction_result = predict_session(session)
+        store.put(session_id, session)
+    return prediction_result
+
 def get_conversation_summary(session_id):
     """Return a summary of the conversation and diagnosis"""
-    if session_id not in user_sessions:
-        return {"error": "Session not found"}
-    
-    session = user_sessions[session_id]
-    
-    if "prediction" not in session:
-        get_disease_prediction(session_id)
+    store = current_session_store()
+    with session_locks.lock(session_id):
+        session = store.get(session_id)
+        if session is None:
+            return {"error": "Session not found"}
+        
+        if session.prediction is None:
+            predict_session(session)
+            store.put(session_id, session)
     
+    (disease, confidence), *alternatives = session.prediction
+    symptom_names = current_models().vocabulary.symptoms
     return {
-        "symptoms_reported": session["reported_symptoms"],
-        "diagnosis": session["prediction"]["main"],
-        "alternatives": session["prediction"]["alternatives"],
-        "conversation": session["conversation_history"]
+        "symptoms_reported": [symptom_names[col] for col in bits_of(session.symptoms)],
+        "diagnosis": {"disease": disease, "confidence": confidence},
+        "alternatives": [{"disease": d, "confidence": c} for d, c in alternatives],
+        "conversation": session.messages()
     }
 
 # Example usage
@@ -0,0 +1,147 @@
+"""
+Client-side Naive Bayes bundle: the served GaussianNB reduced to lookup
+tables a browser can score with, served by GET /prediction/client_bundle.
+
+Symptoms are binary, so the NB joint log-likelihood of a class is
+    log_prior[c] + absent_log_likelihood[c] + sum of symptom_delta[j, c]
+over the active symptoms j (see CompiledGaussianNB). The bundle is
+    0   "MMNB"
+    4   uint32 little-endian length of the JSON header
+    8   JSON header: format, model version, class names, symptom columns,
+        normalized symptom spellings -> column, and the shape and byte
+        offset of every table
+        zero padding to a multiple of 4
+        float32 little-endian tables: log_prior (n_classes),
+        absent_log_likelihood (n_classes), symptom_delta (n_symptoms x n_classes)
+Its ETag is a hash of the bytes, so every worker serving a version agrees on
+it and clients revalidate with a 304 until the models change.
+
+BundleScorer is the reference scorer every client implementation
+(frontend/src/utils/nbBundle.js) must match; check_client_bundle.py checks both.
+"""
+import hashlib
+import json
+import struct
+import threading
+
+import numpy as np
+
+from services.fast_inference import CompiledGaussianNB
+from services.symptom_vocabulary import normalize_symptom
+
+MAGIC = b"MMNB"
+BUNDLE_FORMAT = 1
+TABLES = ["log_prior", "absent_log_likelihood", "symptom_delta"]
+
+# Bundles of the versions recently served (the active one and the one a rollback returns to)
+_bundles = {}
+_bundles_lock = threading.Lock()
+MAX_CACHED_BUNDLES = 2
+
+
+def build_bundle(models):
+    """Bundle bytes for the NB model of a loaded ModelSet."""
+    nb = models.nb_tables
+    if nb is None:
+        # The web process of an inference pool loads no models, only this NB for its tables
+        nb = CompiledGaussianNB.from_sklearn(models.registry.get("nb_model"))
+    log_prior = np.asarray(nb.arrays["class_log_prior"], dtype=np.float64)
+    tables = {
+        "log_prior": log_prior,
+        "absent_log_likelihood": np.asarray(nb.absent_log_likelihood, dtype=np.float64) - log_prior,
+        "symptom_delta": np.asarray(nb.symptom_delta)
+    }
+
+    arrays, blobs, offset = [], [], 0
+    for name in TABLES:
+        blob = np.ascontiguousarray(tables[name], dtype="<f4").tobytes()
+        arrays.append({"name": name, "shape": list(tables[name].shape), "offset": offset})
+        blobs.append(blob)
+        offset += len(blob)
+
+    header = json.dumps({
+        "format": BUNDLE_FORMAT,
+        "model_version": models.version,
+        "classes": [str(models.prediction_classes[label]) for label in nb.classes_],
+        "symptoms": list(models.vocabulary.symptoms),
+        "keys": {key: int(col) for key, col in models.vocabulary.index.items()},
+        "dtype": "float32",
+        "arrays": arrays
+    }, separators=(",", ":")).encode("utf-8")
+    header += b" " * (-(8 + len(header)) % 4)
+    return MAGIC + struct.pack("<I", len(header)) + header + b"".join(blobs)
+
+
+def get_bundle(models):
+    """(bundle bytes, ETag) of a ModelSet, built once per version."""
+    with _bundles_lock:
+        cached = _bundles.get(models.version)
+    if cached is not None:
+        return cached
+    data = build_bundle(models)
+    cached = (data, hashlib.sha256(data).hexdigest()[:20])
+    with _bundles_lock:
+        _bundles[models.version] = cached
+        while len(_bundles) > MAX_CACHED_BUNDLES:
+            del _bundles[next(iter(_bundles))]
+    return cached
+
+
+def parse_bundle(data):
+    """(header, {table name: float32 array}) of bundle bytes."""
+    if data[:4] != MAGIC:
+        raise ValueError("Not a client NB bundle")
+    (header_length,) = struct.unpack("<I", data[4:8])
+    header = json.loads(data[8:8 + header_length].decode("utf-8"))
+    if header["format"] != BUNDLE_FORMAT:
+        raise ValueError(f"Bundle format {header['format']} is not supported (expected {BUNDLE_FORMAT})")
+    start = 8 + header_length
+    tables = {}
+    for array in header["arrays"]:
+        count = int(np.prod(array["shape"]))
+        tables[array["name"]] = np.frombuffer(data, dtype="<f4", count=count, offset=start + array["offset"]).reshape(array["shape"])
+    return header, tables
+
+
+class BundleScorer:
+    """Reference scorer of a client bundle; the browser implementation mirrors it step for step."""
+
+    def __init__(self, data):
+        self.header, tables = parse_bundle(data)
+        self.classes = self.header["classes"]
+        self.keys = self.header["keys"]
+        # Scores are summed in float64 from the float32 tables, like JavaScript numbers
+        self.base = tables["log_prior"].astype(np.float64) + tables["absent_log_likelihood"].astype(np.float64)
+        self.symptom_delta = tables["symptom_delta"].astype(np.float64)
+
+    def encode(self, symptoms):
+        """Distinct active columns of a symptom list (exact normalized spellings only) and the unmatched terms."""
+        active, unmatched = [], []
+        for term in symptoms:
+            col = self.keys.get(normalize_symptom(term))
+            if col is None:
+                unmatched.append(term)
+            elif col not in active:
+                active.append(col)
+        return active, unmatched
+
+    def predict_proba_active(self, active):
+        scores = self.base + self.symptom_delta[active].sum(axis=0)
+        scores = np.exp(scores - scores.max())
+        return scores / scores.sum()
+
+    def predict_proba(self, X):
+        """Class probabilities of binary symptom rows."""
+        scores = self.base + np.asarray(X, dtype=np.float64) @ self.symptom_delta
+        scores = np.exp(scores - scores.max(axis=1, keepdims=True))
+        return scores / scores.sum(axis=1, keepdims=True)
+
+    def predict(self, symptoms):
+        active, unmatched = self.encode(symptoms)
+        proba = self.predict_proba_active(active)
+        label = int(np.argmax(proba))
+        return {
+            "final_prediction": self.classes[label],
+            "confidence": float(proba[label]),
+            "unmatched_symptoms": unmatched
+        }
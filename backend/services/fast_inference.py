@@ -0,0 +1,605 @@
+import abc
+import json
+import math
+import os
+
+import numpy as np
+
+# Compiled (pure NumPy) copies of the fitted models, written by compile_models.py
+COMPILED_DIR = os.path.join("ml_models", "compiled")
+
+
+# One-vs-one decision values closer to zero than this are recomputed the way
+# libsvm does before voting; far above the matmul's rounding error
+SVC_TIE_TOLERANCE = 1e-9
+
+
+# Largest per-symptom Gaussian term (0.5 / var) the sparse NB tables may hold:
+# beyond it, "all absent + delta" cancels terms of that size and loses precision
+NB_SPARSE_MAX_TERM = 1e4
+
+
+def _powi(base, times):
+    """libsvm's integer power (repeated squaring), for bit-identical poly kernels."""
+    result = 1.0
+    while times > 0:
+        if times % 2 == 1:
+            result *= base
+        base *= base
+        times //= 2
+    return result
+
+
+def _softmax(margins):
+    margins = margins - margins.max(axis=1, keepdims=True)
+    np.exp(margins, out=margins)
+    margins /= margins.sum(axis=1, keepdims=True)
+    return margins
+
+
+def _logsumexp(values):
+    """log(sum(exp(row))) of each row as a column, shifted by the row max like scipy.special.logsumexp."""
+    top = values.max(axis=1, keepdims=True)
+    return top + np.log(np.exp(values - top).sum(axis=1, keepdims=True))
+
+
+class CompiledModel(abc.ABC):
+    """Base class: a fitted estimator reduced to plain NumPy arrays."""
+
+    kind = None
+
+    # Arrays derived in __init__ that are also written out, so memory-mapped
+    # loads share them between processes instead of rebuilding them per process
+    derived = ()
+
+    # Arrays downcast() keeps in float64 because labels depend on their exact values
+    exact = ()
+
+    def __init__(self, arrays):
+        self.arrays = arrays
+        self.classes_ = arrays["classes"]
+
+    @abc.abstractmethod
+    def predict_proba(self, X):
+        """Class probabilities of each row, columns in classes_ order."""
+
+    def predict(self, X):
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+    def downcast(self):
+        """
+        Copy with float64 arrays stored as float32 and int64 indices as int32
+        (derived arrays included), halving the artifact and its mapped pages;
+        the `exact` arrays stay float64.
+        """
+        def narrow(name, array):
+            array = np.asarray(array)
+            if name in self.exact:
+                return array
+            if array.dtype == np.float64:
+                return array.astype(np.float32)
+            if array.dtype == np.int64 and array.size and np.abs(array).max() < 2 ** 31:
+                return array.astype(np.int32)
+            return array
+
+        arrays = {
+            name: array if name == "classes" else narrow(name, array)
+            for name, array in self.arrays.items() if name not in self.derived
+        }
+        compact = type(self)(arrays)
+        for name in self.derived:
+            setattr(compact, name, narrow(name, getattr(compact, name)))
+        return compact
+
+    def stored_arrays(self):
+        """Everything written out: the source arrays plus the derived ones."""
+        arrays = {name: array for name, array in self.arrays.items() if name not in self.derived}
+        arrays.update({name: getattr(self, name) for name in self.derived})
+        return arrays
+
+    def save(self, path):
+        """Write one .npy per array under `path`/ so every array can be memory-mapped."""
+        os.makedirs(path, exist_ok=True)
+        arrays = self.stored_arrays()
+        for name, array in arrays.items():
+            np.save(os.path.join(path, f"{name}.npy"), np.asarray(array), allow_pickle=False)
+        with open(os.path.join(path, "model.json"), "w") as f:
+            json.dump({"kind": self.kind, "arrays": sorted(arrays)}, f)
+
+
+class CompiledGaussianNB(CompiledModel):
+    """
+    GaussianNB: per-class log prior, means and variances.
+
+    Symptom features are binary, so each feature's Gaussian log-likelihood only
+    takes two values per class. The joint log-likelihood then splits into a
+    per-class constant (every symptom absent) plus a per-(symptom, class) delta
+    for each symptom present, and scoring a request is a sum over its active
+    symptoms only.
+
+    With a tiny var_smoothing, symptoms constant within a class get terms of
+    0.5 / var ~ 1e9 that the sparse tables add and then cancel, so such models
+    (terms above NB_SPARSE_MAX_TERM) are scored with sklearn's own centered
+    formula instead, evaluated in the same order and normalized with
+    logsumexp like sklearn, bit for bit.
+    """
+
+    kind = "gaussian_nb"
+
+    @classmethod
+    def from_sklearn(cls, model):
+        return cls({
+            "classes": model.classes_,
+            "theta": model.theta_,
+            "var": model.var_,
+            "class_log_prior": np.log(model.class_prior_),
+        })
+
+    def __init__(self, arrays):
+        super().__init__(arrays)
+        self.theta = arrays["theta"]
+        self.var = arrays["var"]
+        self.inv_var = 1.0 / arrays["var"]
+        self.dense = 0.5 * float(self.inv_var.max()) > NB_SPARSE_MAX_TERM
+        if self.dense:
+            # float32 cannot hold variances this close to var_smoothing faithfully
+            self.exact = ("theta", "var", "class_log_prior")
+        # -0.5 * sum(log(2 pi var)) per class, summed row by row like sklearn
+        self.log_var_term = -0.5 * np.sum(np.log(2.0 * np.pi * self.var), axis=1)
+        # Everything in the Gaussian log-likelihood that does not depend on X
+        self.log_norm = arrays["class_log_prior"] + self.log_var_term
+
+        # x = 0 contributes -theta^2 / 2var, x = 1 contributes -(1 - theta)^2 / 2var
+        self.absent_log_likelihood = self.log_norm - 0.5 * np.sum(self.theta ** 2 * self.inv_var, axis=1)
+        self.symptom_delta = (-0.5 * (1.0 - 2.0 * self.theta) * self.inv_var).T  # (n_features, n_classes)
+
+    def centered_joint_log_likelihood(self, X):
+        """sklearn's GaussianNB._joint_log_likelihood, same operations in the same order."""
+        X = np.asarray(X, dtype=np.float64)
+        sq_dist = (((X[:, np.newaxis, :] - self.theta[np.newaxis, :, :]) ** 2) / self.var).sum(axis=2)
+        return self.arrays["class_log_prior"] + (self.log_var_term - 0.5 * sq_dist)
+
+    def joint_log_likelihood_active(self, active_indices):
+        """Joint log-likelihood of one binary row given only its active symptom indices."""
+        if self.dense:
+            row = np.zeros((1, self.theta.shape[1]))
+            row[0, active_indices] = 1.0
+            return self.centered_joint_log_likelihood(row)[0]
+        return self.absent_log_likelihood + self.symptom_delta[active_indices].sum(axis=0)
+
+    def joint_log_likelihood(self, X):
+        X = np.asarray(X)
+        if self.dense or not np.all((X == 0) | (X == 1)):
+            return self.centered_joint_log_likelihood(X)
+        if len(X) == 1:
+            return self.joint_log_likelihood_active(np.flatnonzero(X[0]))[np.newaxis, :]
+        return self.absent_log_likelihood + X.astype(np.float64) @ self.symptom_delta
+
+    def _proba(self, jll):
+        if self.dense:
+            # Log-likelihoods reach 1e10 here, where the shifted softmax rounds differently
+            return np.exp(jll - _logsumexp(jll))
+        return _softmax(jll)
+
+    def predict_proba_active(self, active_indices):
+        """Class probabilities for one request given its active symptom indices."""
+        return self._proba(self.joint_log_likelihood_active(active_indices)[np.newaxis, :])[0]
+
+    def predict_proba(self, X):
+        return self._proba(self.joint_log_likelihood(X))
+
+    def predict(self, X):
+        return self.classes_[np.argmax(self.joint_log_likelihood(X), axis=1)]
+
+
+class CompiledSVC(CompiledModel):
+    """
+    SVC with probability=True: support vectors, one-vs-one dual coefficients,
+    intercepts and Platt parameters.
+
+    Decision values take one (n_SV_c, n_classes - 1) matmul per class block
+    of support vectors, which every pair involving the class reuses, instead
+    of a dense pairs x support vectors matrix that is ~95% zeros.
+
+    Pairwise Platt probabilities are coupled by solving libsvm's quadratic
+    problem exactly (one k x k solve per row) rather than with its iterative
+    solver, which stops once every |(Qp)_t - p'Qp| < 0.005 / k. sklearn's
+    probabilities are therefore only that close to the optimum: they differ
+    from these by up to ~1e-3 on the 41-class symptom models
+    (compile_models.TOLERANCES allows 2e-3). Labels do not use them.
+
+    Labels use libsvm's one-vs-one vote (dec > 0 votes for the first class of
+    the pair, ties go to the lowest class index). On sparse symptom rows many
+    pairwise decision values are exactly zero in exact arithmetic, so their
+    sign is decided by rounding; the values within SVC_TIE_TOLERANCE of zero
+    are recomputed like libsvm (C exp, support vectors summed one by one in
+    libsvm's order) before voting, which reproduces sklearn's labels on 0/1
+    rows, where every kernel distance is an exact integer.
+    """
+
+    kind = "svc"
+    derived = ("sv_sq_norms",)
+    # The tie re-summation must see sklearn's float64 coefficients to reproduce its signs
+    exact = ("dual_coef", "intercept", "gamma", "coef0")
+
+    @classmethod
+    def from_sklearn(cls, model):
+        if not model.probability:
+            raise ValueError("SVC must be fitted with probability=True")
+        return cls({
+            "classes": model.classes_,
+            "support_vectors": model.support_vectors_,
+            "dual_coef": model._dual_coef_,
+            "intercept": model._intercept_,
+            "n_support": model.n_support_,
+            "prob_a": model.probA_,
+            "prob_b": model.probB_,
+            "kernel": np.array(model.kernel),
+            "gamma": np.array(model._gamma),
+            "coef0": np.array(model.coef0),
+            "degree": np.array(model.degree),
+        })
+
+    def __init__(self, arrays):
+        super().__init__(arrays)
+        self.support_vectors = arrays["support_vectors"]
+        self.sv_sq_norms = arrays.get("sv_sq_norms")
+        if self.sv_sq_norms is None:
+            self.sv_sq_norms = (self.support_vectors ** 2).sum(axis=1)
+        self.dual_coef = arrays["dual_coef"]
+        self.intercept = arrays["intercept"]
+        self.prob_a = arrays["prob_a"]
+        self.prob_b = arrays["prob_b"]
+        self.kernel = str(arrays["kernel"])
+        self.gamma = float(arrays["gamma"])
+        self.coef0 = float(arrays["coef0"])
+        self.degree = int(arrays["degree"])
+
+        n_classes = len(self.classes_)
+        n_support = np.asarray(arrays["n_support"])
+        starts = np.concatenate([[0], np.cumsum(n_support)])
+        self.pairs = [(i, j) for i in range(n_classes) for j in range(i + 1, n_classes)]
+        self.pair_i = np.array([i for i, _ in self.pairs])
+        self.pair_j = np.array([j for _, j in self.pairs])
+        self.blocks = [slice(starts[c], starts[c + 1]) for c in range(n_classes)]
+
+        # Each pair's support vectors in libsvm's summation order (class i's, then class j's),
+        # zero-padded on the right so near-zero decisions can be re-summed for many pairs at once;
+        # class i's vectors use dual_coef row j - 1 and class j's use row i
+        pair_svs = [np.concatenate([np.arange(starts[i], starts[i + 1]), np.arange(starts[j], starts[j + 1])])
+                    for i, j in self.pairs]
+        width = max(len(svs) for svs in pair_svs)
+        self.pair_sv = np.zeros((len(self.pairs), width), dtype=np.int64)
+        self.pair_sv_coef = np.zeros((len(self.pairs), width))
+        for p, (i, j) in enumerate(self.pairs):
+            svs = pair_svs[p]
+            self.pair_sv[p, :len(svs)] = svs
+            self.pair_sv_coef[p, :n_support[i]] = self.dual_coef[j - 1, starts[i]:starts[i + 1]]
+            self.pair_sv_coef[p, n_support[i]:len(svs)] = self.dual_coef[i, starts[j]:starts[j + 1]]
+
+        # votes = positive @ vote_i + negative @ vote_j
+        self.vote_i = np.zeros((len(self.pairs), n_classes), dtype=np.int64)
+        self.vote_j = np.zeros((len(self.pairs), n_classes), dtype=np.int64)
+        self.vote_i[np.arange(len(self.pairs)), self.pair_i] = 1
+        self.vote_j[np.arange(len(self.pairs)), self.pair_j] = 1
+
+    def _kernel(self, X):
+        dot = X @ self.support_vectors.T
+        if self.kernel == "linear":
+            return dot
+        if self.kernel == "rbf":
+            sq_dist = (X ** 2).sum(axis=1)[:, np.newaxis] + self.sv_sq_norms - 2.0 * dot
+            return np.exp(-self.gamma * np.maximum(sq_dist, 0.0))
+        if self.kernel == "poly":
+            return (self.gamma * dot + self.coef0) ** self.degree
+        if self.kernel == "sigmoid":
+            return np.tanh(self.gamma * dot + self.coef0)
+        raise ValueError(f"Unsupported SVC kernel: {self.kernel}")
+
+    def decision_values(self, X):
+        """Raw one-vs-one decision values, in libsvm pair order."""
+        X = np.asarray(X, dtype=np.float64)
+        kernel = self._kernel(X)
+        # block_sums[r, m, c] = sum over class c's support vectors of dual_coef[m, sv] * kernel[r, sv]
+        block_sums = np.empty((len(X), len(self.dual_coef), len(self.blocks)))
+        for c, block in enumerate(self.blocks):
+            block_sums[:, :, c] = kernel[:, block] @ self.dual_coef[:, block].T
+        # Pair (i, j): class i's vectors weigh with dual_coef row j - 1, class j's with row i
+        return block_sums[:, self.pair_j - 1, self.pair_i] + block_sums[:, self.pair_i, self.pair_j] + self.intercept
+
+    def _libsvm_kernel(self, X):
+        """Kernel values against every support vector, as libsvm's k_function computes them (C exp / powi / tanh)."""
+        dot = X @ self.support_vectors.T
+        if self.kernel == "linear":
+            return dot
+        if self.kernel == "rbf":
+            argument = -self.gamma * np.maximum((X ** 2).sum(axis=1)[:, np.newaxis] + self.sv_sq_norms - 2.0 * dot, 0.0)
+            function = math.exp
+        elif self.kernel == "poly":
+            argument = self.gamma * dot + self.coef0
+            function = lambda v: _powi(v, self.degree)
+        elif self.kernel == "sigmoid":
+            argument = self.gamma * dot + self.coef0
+            function = math.tanh
+        else:
+            raise ValueError(f"Unsupported SVC kernel: {self.kernel}")
+        # 0/1 rows have few distinct distances, so the scalar C function runs on the unique values only
+        values, inverse = np.unique(argument, return_inverse=True)
+        return np.array([function(v) for v in values])[inverse].reshape(argument.shape)
+
+    def predict(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        dec = self.decision_values(X)
+
+        near_zero = np.abs(dec) <= SVC_TIE_TOLERANCE
+        rows = np.flatnonzero(near_zero.any(axis=1))
+        if len(rows):
+            kernel = self._libsvm_kernel(X[rows])
+            row_idx, pair_idx = np.nonzero(near_zero[rows])
+            terms = self.pair_sv_coef[pair_idx] * kernel[row_idx[:, np.newaxis], self.pair_sv[pair_idx]]
+            # np.add.accumulate adds left to right like libsvm's loop (np.sum would pair-sum)
+            dec[rows[row_idx], pair_idx] = np.add.accumulate(terms, axis=1)[:, -1] + self.intercept[pair_idx]
+
+        positive = dec > 0
+        votes = positive @ self.vote_i + ~positive @ self.vote_j
+        # argmax keeps the first maximum, like libsvm's vote loop
+        return self.classes_[np.argmax(votes, axis=1)]
+
+    def predict_proba(self, X):
+        dec = self.decision_values(X)
+        f = dec * self.prob_a + self.prob_b
+        # libsvm's sigmoid_predict: exp(-f) / (1 + exp(-f)) for f >= 0, else 1 / (1 + exp(f))
+        decay = np.exp(-np.abs(f))
+        pairwise = np.clip(np.where(f >= 0, decay, 1.0) / (1.0 + decay), 1e-7, 1 - 1e-7)
+
+        n_rows, n_classes = len(dec), len(self.classes_)
+        r = np.zeros((n_rows, n_classes, n_classes))
+        r[:, self.pair_i, self.pair_j] = pairwise
+        r[:, self.pair_j, self.pair_i] = 1.0 - pairwise
+
+        # Q[t][t] = sum_j r[j][t]^2, Q[t][j] = -r[j][t] * r[t][j]  (Wu, Lin & Weng, method 2)
+        Q = -r.transpose(0, 2, 1) * r
+        diag = (r ** 2).sum(axis=1)
+        Q[:, np.arange(n_classes), np.arange(n_classes)] = diag
+
+        # min p'Qp s.t. sum(p) = 1  ->  p proportional to Q^-1 e (Q is positive definite)
+        proba = np.linalg.solve(Q, np.ones((n_rows, n_classes, 1)))[:, :, 0]
+        np.clip(proba, 0.0, None, out=proba)
+        return proba / proba.sum(axis=1, keepdims=True)
+
+
+class CompiledForest(CompiledModel):
+    """Random forest flattened into one set of node arrays for all trees."""
+
+    kind = "forest"
+
+    @classmethod
+    def from_sklearn(cls, model):
+        lefts, rights, features, thresholds, values, roots = [], [], [], [], [], []
+        offset = 0
+        for estimator in model.estimators_:
+            tree = estimator.tree_
+            left = tree.children_left.astype(np.int64)
+            right = tree.children_right.astype(np.int64)
+            lefts.append(np.where(left >= 0, left + offset, -1))
+            rights.append(np.where(right >= 0, right + offset, -1))
+            features.append(tree.feature.astype(np.int64))
+            thresholds.append(tree.threshold)
+            value = tree.value[:, 0, :]
+            values.append(value / value.sum(axis=1, keepdims=True))
+            roots.append(offset)
+            offset += tree.node_count
+        return cls({
+            "classes": model.classes_,
+            "left": np.concatenate(lefts),
+            "right": np.concatenate(rights),
+            "feature": np.concatenate(features),
+            "threshold": np.concatenate(thresholds),
+            "value": np.concatenate(values),
+            "roots": np.array(roots),
+        })
+
+    def __init__(self, arrays):
+        super().__init__(arrays)
+        self.left = arrays["left"]
+        self.right = arrays["right"]
+        self.feature = arrays["feature"]
+        self.threshold = arrays["threshold"]
+        self.value = arrays["value"]
+        self.roots = arrays["roots"]
+
+    def leaves(self, X):
+        """Leaf node index of every (row, tree) pair."""
+        X = np.asarray(X, dtype=np.float32)
+        nodes = np.tile(self.roots, (len(X), 1))
+        rows = np.arange(len(X))[:, np.newaxis]
+        while True:
+            internal = self.left[nodes] >= 0
+            if not internal.any():
+                return nodes
+            go_left = X[rows, np.maximum(self.feature[nodes], 0)] <= self.threshold[nodes]
+            nodes = np.where(internal, np.where(go_left, self.left[nodes], self.right[nodes]), nodes)
+
+    def predict_proba(self, X):
+        return self.value[self.leaves(X)].mean(axis=1)
+
+
+class CompiledXGB(CompiledModel):
+    """XGBoost multi:softprob gbtree model flattened into node arrays."""
+
+    kind = "xgboost"
+    derived = ("class_map",)
+
+    @classmethod
+    def from_sklearn(cls, model):
+        learner = json.loads(model.get_booster().save_raw(raw_format="json"))["learner"]
+        trees = learner["gradient_booster"]["model"]["trees"]
+        n_classes = int(learner["learner_model_param"]["num_class"])
+        base_score = np.array(
+            [float(v) for v in learner["learner_model_param"]["base_score"].strip("[]").split(",")]
+        )
+
+        lefts, rights, features, thresholds, roots = [], [], [], [], []
+        offset = 0
+        for tree in trees:
+            left = np.array(tree["left_children"], dtype=np.int64)
+            right = np.array(tree["right_children"], dtype=np.int64)
+            lefts.append(np.where(left >= 0, left + offset, -1))
+            rights.append(np.where(right >= 0, right + offset, -1))
+            features.append(np.array(tree["split_indices"], dtype=np.int64))
+            # For leaves split_conditions holds the leaf value
+            thresholds.append(np.array(tree["split_conditions"], dtype=np.float32))
+            roots.append(offset)
+            offset += len(left)
+        return cls({
+            "classes": model.classes_,
+            "left": np.concatenate(lefts),
+            "right": np.concatenate(rights),
+            "feature": np.concatenate(features),
+            "threshold": np.concatenate(thresholds),
+            "roots": np.array(roots),
+            "tree_class": np.array(learner["gradient_booster"]["model"]["tree_info"], dtype=np.int64),
+            "base_score": np.broadcast_to(base_score, (n_classes,)).astype(np.float32),
+        })
+
+    def __init__(self, arrays):
+        super().__init__(arrays)
+        self.left = arrays["left"]
+        self.right = arrays["right"]
+        self.feature = arrays["feature"]
+        self.threshold = arrays["threshold"]
+        self.roots = arrays["roots"]
+        self.tree_class = arrays["tree_class"]
+        self.base_score = arrays["base_score"]
+        # One-hot (n_trees, n_classes) map so per-class margins are a single matmul
+        self.class_map = arrays.get("class_map")
+        if self.class_map is None:
+            self.class_map = np.zeros((len(self.roots), len(self.base_score)), dtype=np.float32)
+            self.class_map[np.arange(len(self.roots)), self.tree_class] = 1.0
+
+    def margins(self, X):
+        X = np.asarray(X, dtype=np.float32)
+        nodes = np.tile(self.roots, (len(X), 1))
+        rows = np.arange(len(X))[:, np.newaxis]
+        while True:
+            internal = self.left[nodes] >= 0
+            if not internal.any():
+                break
+            go_left = X[rows, self.feature[nodes]] < self.threshold[nodes]
+            nodes = np.where(internal, np.where(go_left, self.left[nodes], self.right[nodes]), nodes)
+        return self.threshold[nodes] @ self.class_map + self.base_score
+
+    def predict_proba(self, X):
+        return _softmax(self.margins(X).astype(np.float64)).astype(np.float32)
+
+
+class CompiledLogisticRegression(CompiledModel):
+    """Multinomial LogisticRegression (the stacking meta-learner)."""
+
+    kind = "logistic_regression"
+
+    @classmethod
+    def from_sklearn(cls, model):
+        return cls({"classes": model.classes_, "coef": model.coef_, "intercept": model.intercept_})
+
+    def predict_proba(self, X):
+        return _softmax(np.asarray(X, dtype=np.float64) @ self.arrays["coef"].T + self.arrays["intercept"])
+
+
+COMPILERS = {
+    "GaussianNB": CompiledGaussianNB,
+    "SVC": CompiledSVC,
+    "RandomForestClassifier": CompiledForest,
+    "XGBClassifier": CompiledXGB,
+    "LogisticRegression": CompiledLogisticRegression,
+}
+KINDS = {compiled.kind: compiled for compiled in COMPILERS.values()}
+
+
+class EnsembleSpec:
+    """
+    The non-estimator parts of a fitted VotingClassifier / StackingClassifier
+    (classes, member names, weights, stack methods), so an ensemble whose
+    members are all compiled can be served without unpickling it.
+    """
+
+    def __init__(self, spec):
+        self.kind = spec["kind"]
+        self.classes_ = np.array(spec["classes"])
+        self.members = spec["members"]
+        self.estimators = [(name, est) for name, est in spec["estimators"]]
+        self.weights = spec.get("weights")
+        self.stack_method_ = spec.get("stack_method")
+        self.passthrough = spec.get("passthrough", False)
+        # Compiled member models, in order (plus the final estimator for stacking), set by the loader
+        self.members_ = []
+
+    @classmethod
+    def from_sklearn(cls, model):
+        spec = {
+            "kind": "stacking" if hasattr(model, "stack_method_") else "voting",
+            "classes": model.classes_.tolist(),
+            "members": list(model.named_estimators_),
+            "estimators": [[name, est if est == "drop" else None] for name, est in model.estimators]
+        }
+        if spec["kind"] == "voting":
+            spec["weights"] = None if model.weights is None else list(model.weights)
+        else:
+            spec["stack_method"] = list(model.stack_method_)
+            spec["passthrough"] = bool(model.passthrough)
+        return cls(spec)
+
+    def save(self, path):
+        with open(path, "w") as f:
+            json.dump({
+                "kind": self.kind,
+                "classes": self.classes_.tolist(),
+                "members": self.members,
+                "estimators": [list(pair) for pair in self.estimators],
+                "weights": self.weights,
+                "stack_method": self.stack_method_,
+                "passthrough": self.passthrough
+            }, f)
+
+
+def load_ensemble_spec(name, compiled_dir=COMPILED_DIR):
+    """Load ml_models/compiled/<name>.json, or return None if it was never written."""
+    path = os.path.join(compiled_dir, f"{name}.json")
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return EnsembleSpec(json.load(f))
+
+
+def compile_model(model):
+    """Convert a fitted sklearn / XGBoost estimator into its NumPy equivalent."""
+    compiler = COMPILERS.get(type(model).__name__)
+    if compiler is None:
+        raise ValueError(f"No NumPy compiler for {type(model).__name__}")
+    return compiler.from_sklearn(model)
+
+
+def load_compiled(name, compiled_dir=COMPILED_DIR, mmap=False):
+    """
+    Load ml_models/compiled/<name>/, or return None if it was never compiled.
+
+    With mmap the arrays stay read-only memory maps of the .npy files, so
+    every process serving the same version shares their pages through the
+    OS page cache. Older single-file <name>.npz artifacts still load.
+    """
+    path = os.path.join(compiled_dir, name)
+    if os.path.isdir(path):
+        with open(os.path.join(path, "model.json")) as f:
+            meta = json.load(f)
+        arrays = {}
+        for key in meta["arrays"]:
+            array = np.load(os.path.join(path, f"{key}.npy"), mmap_mode="r" if mmap else None, allow_pickle=False)
+            # Scalars (kernel, gamma, ...) are not worth mapping and read back as plain arrays
+            arrays[key] = np.array(array) if array.ndim == 0 else array
+        return KINDS[meta["kind"]](arrays)
+
+    if not os.path.exists(f"{path}.npz"):
+        return None
+    with np.load(f"{path}.npz", allow_pickle=False) as data:
+        arrays = {key: data[key] for key in data.files if key != "kind"}
+        return KINDS[str(data["kind"])](arrays)
@@ -0,0 +1,385 @@
+"""
+Process-pool offload for model inference.
+
+Each worker is a separate Python process that imports services.predictor once
+(loading the ensemble) and then serves scoring jobs over a socket pair, so
+CPU-heavy forward passes no longer hold the web process's GIL. Rows travel as
+bit-packed symptom vectors and come back as /predict responses (or chatbot
+probability rows).
+
+Workers are started as `python -m services.inference_pool <fd> <fd>` rather
+than through multiprocessing, so the web server's __main__ (app.py) is never
+re-imported in them. They run with INFERENCE_POOL=false, so they load the
+full model set while the web process (see predictor.MODELS_IN_PROCESS)
+loads only the labels and vocabulary.
+
+Model reloads and rollbacks go through a second, control socket: before the
+parent swaps in a version, every worker loads and warms it in a background
+thread while it keeps scoring with the current one, and the swap waits for
+all of them (a worker that cannot load it fails the reload). The first job
+tagged with the new version then only switches a reference.
+"""
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import Future, TimeoutError
+from multiprocessing.connection import Connection
+from queue import Empty, Full, Queue
+
+import numpy as np
+
+from services.micro_batcher import QUEUE_WAIT_MS_BUCKETS, Histogram
+from services.predictor import (cache_prediction, current_models, encode_symptom_batch, encode_symptoms_with_report,
+                                get_cached_prediction, report_unmatched, swap_listeners)
+
+# Seconds a worker may take to load a model set (at start or for a reload) before the pool gives up on it
+WORKER_START_TIMEOUT = float(os.getenv("INFERENCE_POOL_START_TIMEOUT", "120"))
+
+# Rows a worker scores in one round trip when jobs queue up: jobs are taken
+# from the queue until this many rows are collected (a predict_batch block
+# counts all of its rows, and a single job is never split)
+MAX_ROWS_PER_CALL = 64
+
+JOB_KINDS = ("predict", "chatbot")
+
+
+class InferenceQueueFull(RuntimeError):
+    """Raised when the pool already holds queue_depth waiting jobs."""
+
+
+def pack_rows(rows):
+    """Encoded 0/1 rows -> (n_cols, packed bytes); one bit per symptom."""
+    rows = np.atleast_2d(rows)
+    return rows.shape[1], np.packbits(rows.astype(bool), axis=1).tobytes()
+
+
+def unpack_rows(n_cols, payload):
+    packed = np.frombuffer(payload, dtype=np.uint8).reshape(-1, (n_cols + 7) // 8)
+    return np.unpackbits(packed, axis=1, count=n_cols)
+
+
+class _Worker:
+    """One worker process and the parent's ends of its job and control sockets."""
+
+    def __init__(self, index):
+        self.index = index
+        parent_sock, child_sock = socket.socketpair()
+        parent_control, child_control = socket.socketpair()
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "services.inference_pool", str(child_sock.fileno()), str(child_control.fileno())],
+            pass_fds=(child_sock.fileno(), child_control.fileno()),
+            # Workers follow the parent's reloads, never the ACTIVE pointer on their own
+            env={**os.environ, "INFERENCE_POOL": "false", "MODEL_WATCH_INTERVAL": "0"}
+        )
+        child_sock.close()
+        child_control.close()
+        self.conn = Connection(parent_sock.detach())
+        self.control = Connection(parent_control.detach())
+
+        if not self.conn.poll(WORKER_START_TIMEOUT):
+            self.close()
+            raise RuntimeError(f"Inference worker {index} did not load the models in {WORKER_START_TIMEOUT:.0f} s")
+        self.conn.recv()
+
+    def call(self, kind, rows):
+        """Score `rows` in the worker; raise RuntimeError with the worker's error message."""
+        n_cols, payload = pack_rows(rows)
+        self.conn.send((kind, current_models().version, n_cols, payload))
+        status, result = self.conn.recv()
+        if status != "ok":
+            raise RuntimeError(result)
+        return result
+
+    def request_load(self, models):
+        """Ask the worker to load a set next to the one it serves (answered by wait_loaded)."""
+        self.control.send((models.models_dir, models.version))
+
+    def wait_loaded(self, version):
+        if not self.control.poll(WORKER_START_TIMEOUT):
+            raise RuntimeError(f"Inference worker {self.index} did not load model version {version} "
+                               f"in {WORKER_START_TIMEOUT:.0f} s")
+        status, message = self.control.recv()
+        if status != "ok":
+            raise RuntimeError(f"Inference worker {self.index} could not load model version {version}: {message}")
+
+    def close(self):
+        self.conn.close()
+        self.control.close()
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+
+
+class InferencePool:
+    """
+    Runs /predict and chatbot scoring in `processes` worker processes.
+
+    Jobs wait in a bounded queue (submit raises InferenceQueueFull beyond
+    queue_depth) and callers stop waiting after `timeout` seconds; a job that
+    is still queued when its deadline passes is dropped without being scored.
+    One dispatcher thread per worker drains the queue, sending every job that
+    is already waiting in a single round trip.
+    """
+
+    def __init__(self, processes=2, queue_depth=64, timeout=5.0):
+        self.processes = max(1, int(processes))
+        self.queue_depth = max(1, int(queue_depth))
+        self.timeout = float(timeout)
+        self.queue_wait_ms = Histogram(QUEUE_WAIT_MS_BUCKETS)
+        self.counters = {"completed": 0, "failed": 0, "rejected": 0, "expired": 0, "restarts": 0}
+        self._counter_lock = threading.Lock()
+        self._queue = Queue(maxsize=self.queue_depth)
+        self._control_lock = threading.Lock()
+
+        start = time.perf_counter()
+        self._workers = [_Worker(i) for i in range(self.processes)]
+        print(f"✅ Started {self.processes} inference workers in {(time.perf_counter() - start) * 1000:.0f} ms")
+        for worker in self._workers:
+            threading.Thread(target=self._dispatch, args=(worker.index,),
+                             name=f"inference-pool-{worker.index}", daemon=True).start()
+        swap_listeners.append(self.prepare)
+
+    def prepare(self, models):
+        """Load a set in every worker before the parent swaps it in; raise if any worker cannot."""
+        with self._control_lock:
+            loading, errors = [], []
+            for worker in self._workers:
+                try:
+                    worker.request_load(models)
+                    loading.append(worker)
+                except OSError as e:
+                    errors.append(f"Inference worker {worker.index} is unreachable: {e}")
+            # All workers load in parallel; collect every answer before judging
+            for worker in loading:
+                try:
+                    worker.wait_loaded(models.version)
+                except (RuntimeError, EOFError, OSError) as e:
+                    errors.append(str(e))
+        if errors:
+            raise RuntimeError("; ".join(errors))
+
+    def submit(self, kind, input_row, timeout=None):
+        """
+        Queue one encoded row; the returned Future resolves to its response.
+        A 2-D block of rows is one job whose Future resolves to their list.
+        """
+        if kind not in JOB_KINDS:
+            raise ValueError(f"Unknown inference job kind {kind!r}")
+        future = Future()
+        enqueued_at = time.perf_counter()
+        deadline = enqueued_at + (self.timeout if timeout is None else timeout)
+        try:
+            self._queue.put_nowait((kind, np.asarray(input_row), enqueued_at, deadline, future))
+        except Full:
+            self._count("rejected")
+            raise InferenceQueueFull(f"Inference queue is full ({self.queue_depth} jobs waiting)")
+        return future
+
+    def predict(self, input_json, timeout=None):
+        """Drop-in replacement for predictor.predict_disease that scores in a worker process."""
+        timeout = self.timeout if timeout is None else timeout
+        input_row, unmatched = encode_symptoms_with_report(input_json.get("symptoms", []))
+        cached = get_cached_prediction(input_row)
+        if cached is not None:
+            return report_unmatched(cached, unmatched)
+        response = self.submit("predict", input_row, timeout).result(timeout=timeout)
+        cache_prediction(input_row, response)
+        return report_unmatched(response, unmatched)
+
+    def predict_batch(self, symptom_lists, timeout=None):
+        """Drop-in replacement for predictor.predict_disease_batch: the uncached rows go to a worker as one job."""
+        if not symptom_lists:
+            return []
+        timeout = self.timeout if timeout is None else timeout
+        input_data, unmatched = encode_symptom_batch(symptom_lists)
+        responses = [get_cached_prediction(row) for row in input_data]
+
+        misses = [i for i, response in enumerate(responses) if response is None]
+        if misses:
+            scored = self.submit("predict", input_data[misses], timeout).result(timeout=timeout)
+            for i, response in zip(misses, scored):
+                responses[i] = response
+                cache_prediction(input_data[i], response)
+        return [report_unmatched(response, terms) for response, terms in zip(responses, unmatched)]
+
+    def chatbot_probs(self, input_vector, timeout=None):
+        """Averaged svm / nb / rf probabilities of one chatbot symptom vector."""
+        timeout = self.timeout if timeout is None else timeout
+        return self.submit("chatbot", input_vector, timeout).result(timeout=timeout)
+
+    def stats(self):
+        with self._counter_lock:
+            counters = dict(self.counters)
+        return {
+            "processes": self.processes,
+            "worker_pids": [worker.process.pid for worker in self._workers],
+            "queue_depth": self._queue.qsize(),
+            "max_queue_depth": self.queue_depth,
+            "timeout_s": self.timeout,
+            **counters,
+            "queue_wait_ms": self.queue_wait_ms.snapshot(),
+            "queue_wait_p99_ms": self.queue_wait_ms.quantile(0.99)
+        }
+
+    def _count(self, key, n=1):
+        with self._counter_lock:
+            self.counters[key] += n
+
+    def _collect(self):
+        """Block for the first job, then take what else is already waiting, up to MAX_ROWS_PER_CALL rows."""
+        jobs = [self._queue.get()]
+        rows = len(np.atleast_2d(jobs[0][1]))
+        while rows < MAX_ROWS_PER_CALL:
+            try:
+                jobs.append(self._queue.get_nowait())
+            except Empty:
+                break
+            rows += len(np.atleast_2d(jobs[-1][1]))
+
+        started = time.perf_counter()
+        live = []
+        for job in jobs:
+            _, _, enqueued_at, deadline, future = job
+            self.queue_wait_ms.observe((started - enqueued_at) * 1000)
+            if started > deadline:
+                self._count("expired")
+                future.set_exception(TimeoutError("Inference job expired in the queue"))
+            else:
+                live.append(job)
+        return live
+
+    def _dispatch(self, index):
+        while True:
+            jobs = self._collect()
+            for kind in JOB_KINDS:
+                batch = [job for job in jobs if job[0] == kind]
+                if batch:
+                    self._run(index, kind, batch)
+
+    def _run(self, index, kind, batch):
+        rows = [row for _, row, _, _, _ in batch]
+        try:
+            results = self._workers[index].call(kind, np.vstack(rows))
+        except (EOFError, OSError) as e:
+            # The worker died mid-call: fail its jobs and start a replacement
+            self._count("failed", len(batch))
+            for *_, future in batch:
+                future.set_exception(RuntimeError(f"Inference worker {index} exited: {e}"))
+            self._restart(index)
+            return
+        except Exception as e:
+            self._count("failed", len(batch))
+            for *_, future in batch:
+                future.set_exception(e)
+            return
+
+        self._count("completed", len(batch))
+        offset = 0
+        for (*_, future), row in zip(batch, rows):
+            if row.ndim == 1:
+                future.set_result(results[offset])
+                offset += 1
+            else:
+                future.set_result(results[offset:offset + len(row)])
+                offset += len(row)
+
+    def _restart(self, index):
+        print(f"⚠️ Inference worker {index} exited, restarting it")
+        self._workers[index].close()
+        while True:
+            try:
+                worker = _Worker(index)
+                # It starts on the ACTIVE pointer's version, which may not be the one served now
+                with self._control_lock:
+                    worker.request_load(current_models())
+                    worker.wait_loaded(current_models().version)
+                self._workers[index] = worker
+                self._count("restarts")
+                return
+            except Exception as e:
+                print(f"❌ Could not restart inference worker {index}: {e}")
+                time.sleep(1)
+
+    def close(self):
+        if self.prepare in swap_listeners:
+            swap_listeners.remove(self.prepare)
+        for worker in self._workers:
+            worker.close()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool(processes=2, queue_depth=64, timeout=5.0):
+    """Return the process-wide inference pool, starting its workers on first use."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = InferencePool(processes, queue_depth, timeout)
+    return _pool
+
+
+def current_pool():
+    """The running pool, or None when inference is not offloaded."""
+    return _pool
+
+
+def serve(conn, control):
+    """Worker process loop: load the models once, then score jobs until the parent hangs up."""
+    from services import predictor
+    from services.chatbot_predictor import score_symptom_vectors
+
+    # The set loaded ahead of the parent's next swap
+    staged = {"models": None}
+
+    def load_ahead():
+        while True:
+            try:
+                models_dir, version = control.recv()
+            except EOFError:
+                return
+            try:
+                loaded = [predictor.current_models(), predictor.previous_models, staged["models"]]
+                if not any(models is not None and models.version == version for models in loaded):
+                    staged["models"] = predictor.load_models(models_dir, version)
+                control.send(("ok", version))
+            except Exception as e:
+                control.send(("error", f"{type(e).__name__}: {e}"))
+
+    def switch_to(version):
+        """Follow a reload / rollback of the parent; the set was loaded beforehand."""
+        for models in (staged["models"], predictor.previous_models):
+            if models is not None and models.version == version:
+                predictor.switch_models(models)
+                return
+        raise RuntimeError(f"Model version {version} was not loaded in inference worker {os.getpid()}")
+
+    threading.Thread(target=load_ahead, name="inference-worker-control", daemon=True).start()
+    conn.send(("ready", os.getpid()))
+    while True:
+        try:
+            kind, version, n_cols, payload = conn.recv()
+        except EOFError:
+            return
+        try:
+            if version != predictor.current_models().version:
+                switch_to(version)
+            rows = unpack_rows(n_cols, payload)
+            if kind == "predict":
+                result = predictor.predict_rows(rows)
+            else:
+                result = list(score_symptom_vectors(rows))
+            conn.send(("ok", result))
+        except Exception as e:
+            conn.send(("error", f"{type(e).__name__}: {e}"))
+
+
+if __name__ == "__main__":
+    serve(Connection(int(sys.argv[1])), Connection(int(sys.argv[2])))
@@ -0,0 +1,150 @@
+import threading
+import time
+from concurrent.futures import Future
+from queue import Empty, Queue
+
+import numpy as np
+
+from services.predictor import (
+    cache_prediction, current_models, encode_symptoms_with_report, get_cached_prediction, predict_rows, report_unmatched
+)
+
+# Histogram bucket upper bounds
+BATCH_SIZE_BUCKETS = [1, 2, 4, 8, 16, 32, 64, 128, 256]
+QUEUE_WAIT_MS_BUCKETS = [0.5, 1, 2, 5, 10, 20, 50, 100, 250, 1000]
+
+
+class Histogram:
+    """Thread-safe fixed-bucket histogram (the last bucket catches overflow)."""
+
+    def __init__(self, bounds):
+        self.bounds = list(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.total = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = len(self.bounds)
+        for i, bound in enumerate(self.bounds):
+            if value <= bound:
+                index = i
+                break
+        with self._lock:
+            self.counts[index] += 1
+            self.total += 1
+            self.sum += value
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-th quantile (None when empty)."""
+        with self._lock:
+            if not self.total:
+                return None
+            target = q * self.total
+            seen = 0
+            for i, count in enumerate(self.counts):
+                seen += count
+                if seen >= target:
+                    return self.bounds[i] if i < len(self.bounds) else float("inf")
+        return float("inf")
+
+    def snapshot(self):
+        with self._lock:
+            labels = [f"<={bound}" for bound in self.bounds] + [f">{self.bounds[-1]}"]
+            return {
+                "buckets": dict(zip(labels, self.counts)),
+                "count": self.total,
+                "mean": self.sum / self.total if self.total else None
+            }
+
+
+class MicroBatcher:
+    """
+    Collects encoded symptom rows from concurrent requests and runs them
+    through the ensemble as one batch.
+
+    A batch is flushed as soon as it holds max_batch_size rows or the oldest
+    row has waited max_wait_ms, whichever comes first.
+    """
+
+    def __init__(self, max_batch_size=32, max_wait_ms=5.0):
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait_ms = max(0.0, float(max_wait_ms))
+        self.batch_sizes = Histogram(BATCH_SIZE_BUCKETS)
+        self.queue_wait_ms = Histogram(QUEUE_WAIT_MS_BUCKETS)
+        self._queue = Queue()
+        self._worker = threading.Thread(target=self._run, name="predict-micro-batcher", daemon=True)
+        self._worker.start()
+
+    def submit(self, input_row):
+        """Queue one encoded row; the returned Future resolves to its /predict response."""
+        future = Future()
+        self._queue.put((input_row, time.perf_counter(), future))
+        return future
+
+    def predict(self, input_json, timeout=None):
+        """Drop-in replacement for predictor.predict_disease that goes through the batch queue."""
+        input_row, unmatched = encode_symptoms_with_report(input_json.get("symptoms", []))
+        cached = get_cached_prediction(input_row)
+        if cached is not None:
+            return report_unmatched(cached, unmatched)
+        return report_unmatched(self.submit(input_row).result(timeout=timeout), unmatched)
+
+    def stats(self):
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait_ms,
+            "queue_depth": self._queue.qsize(),
+            "batch_size": self.batch_sizes.snapshot(),
+            "queue_wait_ms": self.queue_wait_ms.snapshot(),
+            "queue_wait_p99_ms": self.queue_wait_ms.quantile(0.99)
+        }
+
+    def _collect(self):
+        """Block for the first row, then gather more until the batch is full or the window closes."""
+        batch = [self._queue.get()]
+        deadline = batch[0][1] + self.max_wait_ms / 1000
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            started = time.perf_counter()
+            self.batch_sizes.observe(len(batch))
+            for _, enqueued_at, _ in batch:
+                self.queue_wait_ms.observe((started - enqueued_at) * 1000)
+
+            # The whole batch runs on, and is cached under, one model version
+            models = current_models()
+            try:
+                responses = predict_rows(np.vstack([row for row, _, _ in batch]), models)
+            except Exception as e:
+                for _, _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            for (row, _, future), response in zip(batch, responses):
+                cache_prediction(row, response, models)
+                future.set_result(response)
+
+
+_batcher = None
+_batcher_lock = threading.Lock()
+
+
+def get_batcher(max_batch_size=32, max_wait_ms=5.0):
+    """Return the process-wide batcher, starting it on first use."""
+    global _batcher
+    if _batcher is None:
+        with _batcher_lock:
+            if _batcher is None:
+                _batcher = MicroBatcher(max_batch_size, max_wait_ms)
+    return _batcher
@@ -0,0 +1,140 @@
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import joblib
+import numpy as np
+
+MODELS_DIR = "ml_models"
+
+# Threads used to deserialize artifacts in parallel at warm-up
+MODEL_LOAD_WORKERS = int(os.getenv("MODEL_LOAD_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+# Every artifact the services can use, and whether serving can start without it
+ARTIFACTS = {
+    "svm_model": True,
+    "nb_model": True,
+    "label_encoder": True,
+    "metadata": True,
+    "rf_model": False,
+    "xgb_model": False,
+    "voting_model": False,
+    "stacking_model": False,
+    "ensemble_weights": False,
+    "feature_selector": False
+}
+
+
+def estimate_nbytes(obj, _seen=None):
+    """Approximate in-memory size of a loaded artifact (arrays, containers, attributes)."""
+    if _seen is None:
+        _seen = {}
+    if id(obj) in _seen:
+        return 0
+    # Keep a reference so temporary state dicts cannot reuse a seen id
+    _seen[id(obj)] = obj
+
+    if isinstance(obj, np.ndarray):
+        if obj.base is not None and isinstance(obj.base, np.ndarray):
+            return estimate_nbytes(obj.base, _seen)
+        size = obj.nbytes
+        if obj.dtype == object:
+            size += sum(estimate_nbytes(item, _seen) for item in obj.flat)
+        return size
+
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(estimate_nbytes(k, _seen) + estimate_nbytes(v, _seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(estimate_nbytes(item, _seen) for item in obj)
+    elif hasattr(obj, "__dict__") and not isinstance(obj, type):
+        size += estimate_nbytes(vars(obj), _seen)
+    elif type(obj).__module__.startswith("sklearn"):
+        # Cython objects such as sklearn's Tree expose their arrays only through pickling state
+        size += estimate_nbytes(obj.__getstate__(), _seen)
+
+    # XGBoost keeps its trees in native memory; count their serialized size
+    if hasattr(obj, "save_raw") and callable(obj.save_raw):
+        size += len(obj.save_raw())
+    return size
+
+
+class ModelRegistry:
+    """
+    Process-wide store of the fitted artifacts in ml_models/.
+
+    Each artifact is deserialized at most once, on first use or by a parallel
+    warm_up(), and the same object is handed to every service. Optional
+    artifacts that are missing on disk come back as None so callers can serve
+    a degraded model set; missing required ones raise FileNotFoundError.
+    """
+
+    def __init__(self, models_dir=MODELS_DIR, artifacts=None, mmap_mode=None):
+        self.models_dir = models_dir
+        # joblib mmap_mode for the NumPy arrays inside the pickles ("c": shared
+        # copy-on-write pages; libsvm refuses read-only buffers)
+        self.mmap_mode = mmap_mode
+        self.artifacts = dict(ARTIFACTS if artifacts is None else artifacts)
+        self._models = {}
+        self._stats = {}
+        self._locks = {name: threading.Lock() for name in self.artifacts}
+
+    def path(self, name):
+        return os.path.join(self.models_dir, f"{name}.pkl")
+
+    def available(self, name):
+        return name in self._models or os.path.exists(self.path(name))
+
+    def missing(self, names=None):
+        """Artifacts (of `names`, default all) that are not on disk."""
+        return [name for name in (names or self.artifacts) if not self.available(name)]
+
+    def get(self, name):
+        """Return the loaded artifact, loading it on first use; None if an optional one is missing."""
+        if name in self._models:
+            return self._models[name]
+
+        with self._locks[name]:
+            if name in self._models:
+                return self._models[name]
+
+            path = self.path(name)
+            if not os.path.exists(path):
+                self._stats[name] = {"status": "missing", "required": self.artifacts[name]}
+                if self.artifacts[name]:
+                    raise FileNotFoundError(f"Required model artifact {path} is missing")
+                return None
+
+            start = time.perf_counter()
+            model = joblib.load(path, mmap_mode=self.mmap_mode)
+            self._stats[name] = {
+                "status": "loaded",
+                "required": self.artifacts[name],
+                "load_ms": (time.perf_counter() - start) * 1000,
+                "file_bytes": os.path.getsize(path)
+            }
+            self._models[name] = model
+            return model
+
+    def warm_up(self, names=None, max_workers=MODEL_LOAD_WORKERS):
+        """Load several artifacts in parallel threads; return {name: artifact or None}."""
+        names = list(names or self.artifacts)
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(names)))) as pool:
+            loaded = dict(zip(names, pool.map(self.get, names)))
+        print(f"✅ Loaded {sum(model is not None for model in loaded.values())}/{len(names)} "
+              f"model artifacts in {(time.perf_counter() - start) * 1000:.0f} ms")
+        return loaded
+
+    def stats(self):
+        """Per-artifact status, load time and memory size."""
+        for name, model in list(self._models.items()):
+            # Sized on first report rather than on the load path
+            if "memory_bytes" not in self._stats[name]:
+                self._stats[name]["memory_bytes"] = estimate_nbytes(model)
+        return {
+            name: self._stats.get(name, {"status": "not_loaded", "required": required})
+            for name, required in self.artifacts.items()
+        }
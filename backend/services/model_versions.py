@@ -0,0 +1,162 @@
+import hashlib
+import json
+import os
+import re
+import shutil
+from datetime import datetime
+
+MODELS_DIR = "ml_models"
+
+# Published, immutable model versions: ml_models/versions/<version>/{manifest.json, *.pkl, ...}
+VERSIONS_DIR = os.path.join(MODELS_DIR, "versions")
+
+# Plain-text file naming the version every server process should serve
+ACTIVE_POINTER = os.path.join(VERSIONS_DIR, "ACTIVE")
+
+MANIFEST_NAME = "manifest.json"
+
+# Version ids are the first 16 hex digits of the manifest hash (build_manifest)
+VERSION_PATTERN = re.compile(r"[0-9a-f]{16}")
+
+# Files that travel with a version besides the pickles
+EXTRA_ARTIFACTS = ["cascade_thresholds.json", "profile_index.npz", "serving_config.json"]
+EXTRA_DIRS = ["compiled", "export"]
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def artifact_fingerprint(models_dir=MODELS_DIR):
+    """Content hash of the model artifacts, so swapping any pickle changes the version."""
+    digest = hashlib.sha256()
+    for name in sorted(os.listdir(models_dir)):
+        if not name.endswith(".pkl"):
+            continue
+        digest.update(name.encode())
+        with open(os.path.join(models_dir, name), "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+    return digest.hexdigest()[:16]
+
+
+def version_files(models_dir):
+    """Relative paths of every artifact that belongs to a version."""
+    files = sorted(name for name in os.listdir(models_dir) if name.endswith(".pkl"))
+    files += [name for name in EXTRA_ARTIFACTS if os.path.exists(os.path.join(models_dir, name))]
+    for sub in EXTRA_DIRS:
+        for root, _, names in sorted(os.walk(os.path.join(models_dir, sub))):
+            files += [os.path.relpath(os.path.join(root, name), models_dir) for name in sorted(names)]
+    return files
+
+
+def build_manifest(models_dir):
+    """Per-file content hashes; the version id hashes all of them together."""
+    artifacts = {
+        path: {
+            "sha256": file_sha256(os.path.join(models_dir, path)),
+            "bytes": os.path.getsize(os.path.join(models_dir, path))
+        }
+        for path in version_files(models_dir)
+    }
+    digest = hashlib.sha256()
+    for path, entry in artifacts.items():
+        digest.update(f"{path}:{entry['sha256']}".encode())
+    return {
+        "version": digest.hexdigest()[:16],
+        "model_fingerprint": artifact_fingerprint(models_dir),
+        "created_at": datetime.utcnow().isoformat(),
+        "artifacts": artifacts
+    }
+
+
+def is_version_id(version):
+    return isinstance(version, str) and VERSION_PATTERN.fullmatch(version) is not None
+
+
+def version_dir(version):
+    """Directory of a version; ValueError for anything that is not a version id (no paths)."""
+    if not is_version_id(version):
+        raise ValueError(f"Invalid model version id: {version!r}")
+    return os.path.join(VERSIONS_DIR, version)
+
+
+def read_manifest(version):
+    with open(os.path.join(version_dir(version), MANIFEST_NAME)) as f:
+        return json.load(f)
+
+
+def verify_version(version):
+    """Raise ValueError if any artifact of a published version is missing or altered."""
+    if not os.path.exists(os.path.join(version_dir(version), MANIFEST_NAME)):
+        raise ValueError(f"Model version {version} is not published")
+    manifest = read_manifest(version)
+    for path, entry in manifest["artifacts"].items():
+        full_path = os.path.join(version_dir(version), path)
+        if not os.path.exists(full_path):
+            raise ValueError(f"Model version {version} is missing {path}")
+        if file_sha256(full_path) != entry["sha256"]:
+            raise ValueError(f"Model version {version} has a corrupted {path}")
+    return manifest
+
+
+def list_versions():
+    """Manifests of all published versions, oldest first."""
+    if not os.path.isdir(VERSIONS_DIR):
+        return []
+    manifests = [
+        read_manifest(name) for name in os.listdir(VERSIONS_DIR)
+        if is_version_id(name) and os.path.exists(os.path.join(version_dir(name), MANIFEST_NAME))
+    ]
+    return sorted(manifests, key=lambda manifest: manifest["created_at"])
+
+
+def read_active_version():
+    if not os.path.exists(ACTIVE_POINTER):
+        return None
+    with open(ACTIVE_POINTER) as f:
+        return f.read().strip() or None
+
+
+def set_active_version(version):
+    """Point every server at a published version (atomic rename, watchers pick it up)."""
+    if not os.path.exists(os.path.join(version_dir(version), MANIFEST_NAME)):
+        raise ValueError(f"Model version {version} is not published")
+    tmp_path = f"{ACTIVE_POINTER}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(version)
+    os.replace(tmp_path, ACTIVE_POINTER)
+
+
+def resolve_models_dir():
+    """Directory of the active published version, or the flat ml_models/ without one."""
+    version = read_active_version()
+    return version_dir(version) if version else MODELS_DIR
+
+
+def publish_version(source_dir=MODELS_DIR, activate=True):
+    """Copy the artifacts in `source_dir` into a new immutable version directory; return its id."""
+    manifest = build_manifest(source_dir)
+    version = manifest["version"]
+    target = version_dir(version)
+
+    if not os.path.exists(os.path.join(target, MANIFEST_NAME)):
+        # Build in a scratch directory and rename, so a half-copied version is never visible
+        staging = os.path.join(VERSIONS_DIR, f".{version}.staging")
+        os.makedirs(VERSIONS_DIR, exist_ok=True)
+        shutil.rmtree(staging, ignore_errors=True)
+        for path in manifest["artifacts"]:
+            os.makedirs(os.path.dirname(os.path.join(staging, path)), exist_ok=True)
+            shutil.copy2(os.path.join(source_dir, path), os.path.join(staging, path))
+        with open(os.path.join(staging, MANIFEST_NAME), "w") as f:
+            json.dump(manifest, f, indent=2)
+        shutil.rmtree(target, ignore_errors=True)
+        os.replace(staging, target)
+
+    if activate:
+        set_active_version(version)
+    return version
@@ -0,0 +1,92 @@
+"""
+NumPy-only runtime for the portable model export written by export_models.py.
+
+<models dir>/export/ holds the served ensemble without any pickle:
+    graph.json   symptom columns, class names, every model's kind, scalar
+                 parameters (SVC kernel, gamma, ...) and array names, the
+                 voting / stacking ensembles and the served composition
+    arrays.npz   every model array (tree nodes, support vectors, NB
+                 statistics, ...), keyed "<model>/<array>", no pickled objects
+Loading it imports NumPy and the compiled engine (services/fast_inference.py)
+only, not sklearn, XGBoost, pandas or joblib, so a fresh worker serves its
+first prediction without unpickling anything.
+"""
+import json
+import os
+
+import numpy as np
+
+from services.fast_inference import KINDS
+from services.model_versions import resolve_models_dir
+from services.symptom_vocabulary import SymptomVocabulary, read_display_names
+
+EXPORT_DIR_NAME = "export"
+GRAPH_NAME = "graph.json"
+ARRAYS_NAME = "arrays.npz"
+FORMAT_VERSION = 1
+
+
+def export_dir_for(models_dir=None):
+    return os.path.join(models_dir or resolve_models_dir(), EXPORT_DIR_NAME)
+
+
+class PortableEnsemble:
+    """The served composition, rebuilt from graph.json and arrays.npz."""
+
+    def __init__(self, export_dir=None):
+        self.export_dir = export_dir or export_dir_for()
+        with open(os.path.join(self.export_dir, GRAPH_NAME)) as f:
+            self.graph = json.load(f)
+        if self.graph.get("format") != FORMAT_VERSION:
+            raise ValueError(f"{self.export_dir} has export format {self.graph.get('format')}, expected {FORMAT_VERSION}")
+
+        self.model_version = self.graph["model_version"]
+        self.classes = np.array(self.graph["classes"])
+        self.vocabulary = SymptomVocabulary(self.graph["symptoms"], display_names=read_display_names())
+        with np.load(os.path.join(self.export_dir, ARRAYS_NAME), allow_pickle=False) as data:
+            self.models = {}
+            for name, node in self.graph["models"].items():
+                arrays = {key: data[f"{name}/{key}"] for key in node["arrays"]}
+                arrays.update({key: np.array(value) for key, value in node["params"].items()})
+                self.models[name] = KINDS[node["kind"]](arrays)
+        self.ensembles = self.graph["ensembles"]
+        self.composition = [(member["name"], member["weight"]) for member in self.graph["serving"]]
+
+    def member_proba(self, name, X, proba_cache):
+        """Class probabilities of a model or ensemble of the graph, each model run once per call."""
+        if name in proba_cache:
+            return proba_cache[name]
+        ensemble = self.ensembles.get(name)
+        if ensemble is None:
+            proba = self.models[name].predict_proba(X)
+        elif ensemble["kind"] == "voting":
+            proba = np.average([self.member_proba(member, X, proba_cache) for member in ensemble["members"]],
+                               axis=0, weights=ensemble["weights"])
+        else:
+            features = [self.member_proba(member, X, proba_cache) for member in ensemble["members"]]
+            if ensemble["passthrough"]:
+                features.append(X)
+            proba = self.models[ensemble["final_estimator"]].predict_proba(np.hstack(features))
+        proba_cache[name] = proba
+        return proba
+
+    def predict_proba(self, X):
+        """Weighted blend of the composition members, like services.predictor.run_composition."""
+        proba_cache = {}
+        probas = [self.member_proba(name, X, proba_cache) for name, _ in self.composition]
+        return np.average(probas, axis=0, weights=[weight for _, weight in self.composition])
+
+    def predict(self, X):
+        """Class names of the encoded symptom rows."""
+        return self.classes[np.argmax(self.predict_proba(X), axis=1)]
+
+    def predict_symptoms(self, symptoms):
+        """Prediction, confidence and unmatched terms for one symptom list."""
+        row, unmatched = self.vocabulary.encode(symptoms)
+        proba = self.predict_proba(row[np.newaxis, :])[0]
+        label = int(np.argmax(proba))
+        return {
+            "final_prediction": str(self.classes[label]),
+            "confidence": float(proba[label]),
+            "unmatched_symptoms": unmatched
+        }
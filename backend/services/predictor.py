@@ -58,86 +58,819 @@
 ############################################ensemble model############################################
 ###############
 
+import copy
+import json
 import os
-import joblib
+import threading
+import time
 import numpy as np
 import pandas as pd
 
+from services.fast_inference import COMPILED_DIR, CompiledGaussianNB, CompiledModel, EnsembleSpec, load_compiled, load_ensemble_spec
+from services.model_registry import ModelRegistry, estimate_nbytes
+from services.model_versions import artifact_fingerprint, read_active_version, resolve_models_dir, set_active_version, verify_version, version_dir
+from services.prediction_cache import LRUCache, symptom_bitset
+from services.symptom_vocabulary import SymptomVocabulary
+
 import warnings
 warnings.filterwarnings("ignore", category=UserWarning)
 
 
 MODELS_DIR = "ml_models"
 
-# Load all models
-svm_model = joblib.load(os.path.join(MODELS_DIR, "svm_model.pkl"))
-nb_model = joblib.load(os.path.join(MODELS_DIR, "nb_model.pkl"))
-rf_model = joblib.load(os.path.join(MODELS_DIR, "rf_model.pkl"))
-xgb_model = joblib.load(os.path.join(MODELS_DIR, "xgb_model.pkl"))
-stacking_model = joblib.load(os.path.join(MODELS_DIR, "stacking_model.pkl"))
-voting_model = joblib.load(os.path.join(MODELS_DIR, "voting_model.pkl"))
-label_encoder = joblib.load(os.path.join(MODELS_DIR, "label_encoder.pkl"))
-metadata = joblib.load(os.path.join(MODELS_DIR, "metadata.pkl"))
-ensemble_weights = joblib.load(os.path.join(MODELS_DIR, "ensemble_weights.pkl"))
-feature_selector = joblib.load(os.path.join(MODELS_DIR, "feature_selector.pkl"))
-
-symptom_index = metadata["symptom_index"]
-prediction_classes = metadata["prediction_classes"]
-selected_features = metadata.get("selected_features", [])  # This is optional
+# Prediction cache settings (entries, seconds)
+PREDICTION_CACHE_SIZE = int(os.getenv("PREDICTION_CACHE_SIZE", "4096"))
+PREDICTION_CACHE_TTL = float(os.getenv("PREDICTION_CACHE_TTL", "3600"))
+
+# Artifacts served by the pure-NumPy engine instead of sklearn/XGBoost, e.g.
+# "nb_model,rf_model,voting_model" (compile them first with compile_models.py)
+FAST_INFERENCE_MODELS = {name.strip() for name in os.getenv("FAST_INFERENCE_MODELS", "").split(",") if name.strip()}
+
+# Confidence-gated cascade: cheap models answer confident inputs, the full
+# ensemble only ambiguous ones (thresholds fitted offline by fit_cascade.py)
+CASCADE_MODE = os.getenv("CASCADE_MODE", "false").lower() == "true"
+CASCADE_CONFIG_NAME = "cascade_thresholds.json"
+CASCADE_CONFIG_PATH = os.path.join(MODELS_DIR, CASCADE_CONFIG_NAME)
+
+# Exact training profiles answered from a lookup table without running any
+# model (built offline by build_profile_index.py; skipped when not built)
+PROFILE_INDEX_MODE = os.getenv("PROFILE_INDEX", "true").lower() == "true"
+PROFILE_INDEX_NAME = "profile_index.npz"
+PROFILE_INDEX_PATH = os.path.join(MODELS_DIR, PROFILE_INDEX_NAME)
+PROFILE_INDEX_TYPE = "profile-index"
+
+# Ensemble composition chosen offline by optimize_ensemble.py (a weighted blend
+# of some of rf / nb / svm / xgb / voting / stacking); without one, or when it
+# was chosen for other artifacts, the soft-voting ensemble decides
+SERVING_CONFIG_MODE = os.getenv("SERVING_CONFIG", "true").lower() == "true"
+SERVING_CONFIG_NAME = "serving_config.json"
+SERVING_CONFIG_PATH = os.path.join(MODELS_DIR, SERVING_CONFIG_NAME)
+
+# Memory-map the model arrays (pickles and compiled/) so worker processes
+# share their pages through the OS page cache instead of holding private copies
+MODEL_MMAP = os.getenv("MODEL_MMAP", "false").lower() == "true"
+
+# Seconds between checks of ml_models/versions/ACTIVE for a new version (0 = off)
+MODEL_WATCH_INTERVAL = float(os.getenv("MODEL_WATCH_INTERVAL", "0"))
+
+# With the inference pool on, its worker processes (started with
+# INFERENCE_POOL=false) hold the models and score every request; the web
+# process only loads the labels and symptom vocabulary of the served version
+MODELS_IN_PROCESS = os.getenv("INFERENCE_POOL", "false").lower() != "true"
+POOL_PARENT_ARTIFACTS = ["label_encoder", "metadata"]
+
+# Sample rows a newly loaded version must score before it is swapped in
+WARMUP_ROWS = 64
+
+# Largest |dp| the compiled NB tables may show against nb_model on those rows
+# before the chatbot and the cascade fall back to nb_model itself
+NB_SCORER_TOLERANCE = 1e-9
+
+# Artifacts the ensemble can use; rf / xgb / voting / stacking / weights are
+# optional and the predictor serves a degraded set when they are missing
+PREDICTOR_ARTIFACTS = [
+    "svm_model", "nb_model", "rf_model", "xgb_model", "stacking_model",
+    "voting_model", "label_encoder", "metadata", "ensemble_weights"
+]
+
+# Base models served individually, in the order used by ensemble_weights
+BASE_MODEL_NAMES = ["rf", "nb", "svm", "xgb"]
+
+# Everything a serving composition can blend
+COMPOSITION_MEMBERS = BASE_MODEL_NAMES + ["voting", "stacking"]
+
+def select_engine(name, model, compiled_dir=COMPILED_DIR):
+    """Return the compiled NumPy version of a model when it is selected and available."""
+    if name.split(".")[0] not in FAST_INFERENCE_MODELS or isinstance(model, CompiledModel):
+        return model
+    compiled = load_compiled(name, compiled_dir, mmap=MODEL_MMAP)
+    if compiled is None and type(model).__name__ == "GaussianNB":
+        # The sparse NB tables are exact and cheap, so build them at load time
+        compiled = CompiledGaussianNB.from_sklearn(model)
+    if compiled is None:
+        print(f"⚠️ {name} selected for fast inference but not compiled, using the pickled model")
+        return model
+    return compiled
+
+def sample_symptom_rows(n_features, n_rows=WARMUP_ROWS, seed=0):
+    """Random 1-6 symptom vectors, like the requests the models are warmed and checked on."""
+    rng = np.random.default_rng(seed)
+    samples = np.zeros((n_rows, n_features), dtype=np.uint8)
+    for row in samples:
+        row[rng.choice(n_features, rng.integers(1, 7), replace=False)] = 1
+    return samples
+
+class SklearnNBScorer:
+    """nb_model behind the sparse scorer's interface, for models its tables do not reproduce."""
+
+    def __init__(self, model, n_features):
+        self.model = model
+        self.n_features = n_features
+        self.classes_ = model.classes_
+
+    def predict_proba_active(self, active_indices):
+        row = np.zeros((1, self.n_features))
+        row[0, active_indices] = 1.0
+        return self.model.predict_proba(row)[0]
+
+    def predict_proba(self, X):
+        return self.model.predict_proba(X)
+
+    def predict(self, X):
+        return self.model.predict(X)
+
+def select_nb_scorer(nb_tables, nb_model, n_features):
+    """The compiled NB tables when they match nb_model on sample rows, else nb_model itself."""
+    if isinstance(nb_model, CompiledModel):
+        # Loaded from compiled/, which compile_models.py only writes after its parity check
+        return nb_tables
+    samples = sample_symptom_rows(n_features)
+    max_diff = float(np.abs(nb_tables.predict_proba(samples) - nb_model.predict_proba(samples)).max())
+    if max_diff <= NB_SCORER_TOLERANCE:
+        return nb_tables
+    print(f"⚠️ Compiled NB tables differ from nb_model by {max_diff:.1e}, scoring the chatbot and cascade with nb_model")
+    return SklearnNBScorer(nb_model, n_features)
+
+def load_compiled_artifacts(compiled_dir):
+    """
+    Compiled stand-ins for the selected artifacts: base models, and ensembles
+    whose members are all compiled. Their pickles never need to be loaded.
+    """
+    compiled = {}
+    for name in BASE_MODEL_NAMES:
+        if f"{name}_model" in FAST_INFERENCE_MODELS:
+            model = load_compiled(f"{name}_model", compiled_dir, mmap=MODEL_MMAP)
+            if model is not None:
+                compiled[f"{name}_model"] = model
+
+    for ensemble in ["voting_model", "stacking_model"]:
+        spec = load_ensemble_spec(ensemble, compiled_dir) if ensemble in FAST_INFERENCE_MODELS else None
+        if spec is None:
+            continue
+        names = [f"{ensemble}.{member}" for member in spec.members]
+        if ensemble == "stacking_model":
+            names.append(f"{ensemble}.final_estimator")
+        members = [load_compiled(name, compiled_dir, mmap=MODEL_MMAP) for name in names]
+        if all(member is not None for member in members):
+            spec.members_ = members
+            compiled[ensemble] = spec
+    return compiled
+
+class ModelSet:
+    """
+    One loaded model version and everything derived from it.
+
+    A request takes the active set once and uses it to the end, so a hot
+    reload can swap in a new set without touching in-flight predictions.
+    Without load_models only the labels and vocabulary are loaded (the web
+    process of an inference pool) and the set has no models to score with.
+    """
+
+    def __init__(self, models_dir=MODELS_DIR, version=None, load_models=MODELS_IN_PROCESS):
+        self.models_dir = models_dir
+        self.fingerprint = artifact_fingerprint(models_dir)
+        self.version = version or self.fingerprint
+        self.loaded_at = time.time()
+        compiled_dir = os.path.join(models_dir, "compiled")
+
+        # Load all models (in parallel, shared with the chatbot through the registry);
+        # models served by the compiled engine stand in for their pickles
+        compiled = load_compiled_artifacts(compiled_dir) if load_models else {}
+        self.registry = ModelRegistry(models_dir, mmap_mode="c" if MODEL_MMAP else None)
+        names = PREDICTOR_ARTIFACTS if load_models else POOL_PARENT_ARTIFACTS
+        artifacts = dict.fromkeys(PREDICTOR_ARTIFACTS)
+        artifacts.update({**self.registry.warm_up([name for name in names if name not in compiled]), **compiled})
+        self.models_loaded = load_models
+        self.svm_model = artifacts["svm_model"]
+        self.nb_model = artifacts["nb_model"]
+        self.rf_model = artifacts["rf_model"]
+        self.xgb_model = artifacts["xgb_model"]
+        self.stacking_model = artifacts["stacking_model"]
+        self.voting_model = artifacts["voting_model"]
+        self.label_encoder = artifacts["label_encoder"]
+        self.metadata = artifacts["metadata"]
+
+        self.missing_artifacts = self.registry.missing(names)
+        if self.missing_artifacts:
+            print(f"⚠️ Model version {self.version} is degraded, missing: {', '.join(self.missing_artifacts)}")
+
+        self.symptom_index = self.metadata["symptom_index"]
+        self.vocabulary = SymptomVocabulary.from_metadata(self.metadata)
+        self.prediction_classes = self.metadata["prediction_classes"]
+        self.selected_features = self.metadata.get("selected_features", [])  # This is optional
+
+        if not load_models:
+            self.base_models = {}
+            self.ensemble_weights = np.zeros(0)
+            self.voting_estimators = []
+            self.stacking_estimators = []
+            self.stacking_final_estimator = None
+            self.nb_tables = None
+            self.nb_scorer = None
+            self.cascade_models = {}
+            self.cascade_tiers = []
+            self.profile_index_info = {}
+            self.profile_index = {}
+            self.composition = []
+            return
+
+        self.base_models = {
+            name: select_engine(f"{name}_model", artifacts[f"{name}_model"], compiled_dir)
+            for name in BASE_MODEL_NAMES if artifacts[f"{name}_model"] is not None
+        }
+
+        # Blend weights of the available base models (uniform without ensemble_weights.pkl),
+        # renormalized so a degraded set still blends into a probability distribution
+        if artifacts["ensemble_weights"] is not None:
+            weights = np.asarray(artifacts["ensemble_weights"], dtype=np.float64)[[BASE_MODEL_NAMES.index(name) for name in self.base_models]]
+            self.ensemble_weights = weights / weights.sum()
+        else:
+            self.ensemble_weights = np.full(len(self.base_models), 1 / len(self.base_models))
+
+        # Fitted members of the voting / stacking ensembles (separate fits from the base models)
+        self.voting_estimators = []
+        if isinstance(self.voting_model, EnsembleSpec):
+            self.voting_estimators = self.voting_model.members_
+        elif self.voting_model is not None:
+            self.voting_estimators = [
+                select_engine(f"voting_model.{name}", est, compiled_dir)
+                for name, est in self.voting_model.named_estimators_.items()
+            ]
+        self.stacking_estimators = []
+        self.stacking_final_estimator = None
+        if isinstance(self.stacking_model, EnsembleSpec):
+            self.stacking_estimators = self.stacking_model.members_[:-1]
+            self.stacking_final_estimator = self.stacking_model.members_[-1]
+        elif self.stacking_model is not None:
+            self.stacking_estimators = [
+                select_engine(f"stacking_model.{name}", est, compiled_dir)
+                for name, est in self.stacking_model.named_estimators_.items()
+            ]
+            self.stacking_final_estimator = select_engine("stacking_model.final_estimator", self.stacking_model.final_estimator_, compiled_dir)
+
+        # Cheap first-pass scorers the cascade can exit from: NB uses the sparse
+        # tables (also what the client bundle ships) unless they fail parity
+        if isinstance(self.base_models["nb"], CompiledGaussianNB):
+            self.nb_tables = self.base_models["nb"]
+        else:
+            self.nb_tables = CompiledGaussianNB.from_sklearn(self.nb_model)
+        self.nb_scorer = select_nb_scorer(self.nb_tables, self.nb_model, self.vocabulary.size)
+        self.cascade_models = {**self.base_models, "nb": self.nb_scorer}
+        self.cascade_tiers = load_cascade_tiers(self) if CASCADE_MODE else []
+        # Build provenance of the profile index, filled in by load_profile_index
+        self.profile_index_info = {}
+        self.profile_index = load_profile_index(self) if PROFILE_INDEX_MODE else {}
+        # [(member, weight)] of the served composition, [] for the voting ensemble
+        self.composition = load_serving_composition(self) if SERVING_CONFIG_MODE else []
+
+    def voting_weights(self):
+        """Weights of the voting members that were actually fitted (mirrors VotingClassifier)."""
+        if self.voting_model.weights is None:
+            return None
+        return [w for (_, est), w in zip(self.voting_model.estimators, self.voting_model.weights) if est != "drop"]
+
+    def has_member(self, name):
+        """Whether a composition member is loaded in this set."""
+        if name in ("voting", "stacking"):
+            return getattr(self, f"{name}_model") is not None
+        return name in self.base_models
+
+    def summary(self):
+        return {
+            "version": self.version,
+            "models_dir": self.models_dir,
+            "loaded_at": self.loaded_at,
+            "models_in_process": self.models_loaded,
+            "degraded": bool(self.missing_artifacts),
+            "missing": self.missing_artifacts
+        }
+
+def load_cascade_tiers(models):
+    """Fitted [(model, threshold)] tiers, or [] when missing or fitted for other artifacts."""
+    path = os.path.join(models.models_dir, CASCADE_CONFIG_NAME)
+    if not os.path.exists(path):
+        print("⚠️ Cascade mode is on but no thresholds were fitted, using the full ensemble")
+        return []
+    with open(path) as f:
+        config = json.load(f)
+    if config.get("model_version") != models.fingerprint:
+        print("⚠️ Cascade thresholds were fitted for other model artifacts, using the full ensemble")
+        return []
+    return [
+        (tier["model"], tier["threshold"]) for tier in config["tiers"]
+        if tier["threshold"] is not None and tier["model"] in models.cascade_models
+    ]
+
+def load_serving_composition(models):
+    """[(member, weight)] from serving_config.json, or [] when missing or not servable."""
+    path = os.path.join(models.models_dir, SERVING_CONFIG_NAME)
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        config = json.load(f)
+    if config.get("model_version") != models.fingerprint:
+        print("⚠️ Serving config was chosen for other model artifacts, using the voting ensemble")
+        return []
+    composition = list(zip(config["members"], config["weights"]))
+    missing = [name for name, _ in composition if not models.has_member(name)]
+    if missing:
+        print(f"⚠️ Serving config needs missing models ({', '.join(missing)}), using the voting ensemble")
+        return []
+    print(f"✅ Serving composition: {' + '.join(f'{w:g}*{name}' for name, w in composition)}")
+    return composition
+
+def profile_response(classes, counts):
+    """Response for a symptom profile seen in training: its majority label and label share."""
+    total = int(counts.sum())
+    label = int(np.argmax(counts))
+    return {
+        "rf_prediction": None,
+        "nb_prediction": None,
+        "svm_prediction": None,
+        "final_prediction": str(classes[label]),
+        "confidence_scores": {PROFILE_INDEX_TYPE: float(counts[label] / total)},
+        "prediction_type": PROFILE_INDEX_TYPE,
+        "profile_matches": total
+    }
+
+def load_profile_index(models):
+    """{symptom bitset: response} for every distinct training profile, or {} when unusable."""
+    path = os.path.join(models.models_dir, PROFILE_INDEX_NAME)
+    if not os.path.exists(path):
+        print("⚠️ No symptom profile index was built, every request runs the models")
+        return {}
+    with np.load(path, allow_pickle=False) as data:
+        classes = data["classes"]
+        if int(data["n_symptoms"]) != models.vocabulary.size or not set(classes) <= set(models.prediction_classes):
+            print("⚠️ Symptom profile index was built for other symptoms or labels, ignoring it")
+            return {}
+        index = {
+            bitset.tobytes(): profile_response(classes, counts)
+            for bitset, counts in zip(data["bitsets"], data["counts"])
+        }
+        models.profile_index_info = {
+            "source_sha256": str(data["source_sha256"]),
+            "model_version": str(data["model_version"]),
+            "ensemble_agreement": float(data["ensemble_agreement"])
+        }
+    return index
+
+# The version being served; replaced as a whole by reload_models / rollback_models
+active_models = ModelSet(resolve_models_dir(), read_active_version())
+previous_models = None
+_reload_lock = threading.Lock()
+reload_status = {"state": "idle"}
+
+# Called with a set about to be swapped in (by a reload or a rollback), e.g. by
+# the inference pool to load it in its workers first; raising aborts the swap
+swap_listeners = []
+
+def current_models():
+    return active_models
+
+# Full predict_disease responses keyed by (model version, symptom bitset)
+prediction_cache = LRUCache(PREDICTION_CACHE_SIZE, PREDICTION_CACHE_TTL)
+
+def get_cached_prediction(input_row, models=None):
+    """Return a copy of the cached response for an encoded row, or None."""
+    models = models or active_models
+    cached = prediction_cache.get((models.version, symptom_bitset(input_row)))
+    return copy.deepcopy(cached) if cached is not None else None
+
+def cache_prediction(input_row, response, models=None):
+    models = models or active_models
+    prediction_cache.put((models.version, symptom_bitset(input_row)), copy.deepcopy(response))
 
 def get_ensemble_prediction(models, X):
     """Get the ensemble prediction by averaging probabilities."""
     predictions = np.array([model.predict_proba(X) for model in models])
     avg_proba = np.mean(predictions, axis=0)
-    return prediction_classes[np.argmax(avg_proba, axis=1)[0]]
+    return active_models.prediction_classes[np.argmax(avg_proba, axis=1)[0]]
+
+def _collect_probas(estimators, input_data, proba_cache):
+    """Return predict_proba for each estimator, running every distinct fitted model only once."""
+    probas = []
+    for estimator in estimators:
+        key = id(estimator)
+        if key not in proba_cache:
+            proba_cache[key] = estimator.predict_proba(input_data)
+        probas.append(proba_cache[key])
+    return probas
+
+def get_stacking_meta_features(input_data, proba_cache=None, models=None):
+    """Build the stacking meta-features from the shared probability arrays."""
+    models = models or active_models
+    if proba_cache is None:
+        proba_cache = {}
+    features = []
+    for estimator, method in zip(models.stacking_estimators, models.stacking_model.stack_method_):
+        if method == "predict_proba":
+            features.append(_collect_probas([estimator], input_data, proba_cache)[0])
+        else:
+            features.append(getattr(estimator, method)(input_data).reshape(len(input_data), -1))
+    if models.stacking_model.passthrough:
+        features.append(input_data)
+    return np.hstack(features)
+
+def run_inference(input_data, include_stacking=False, models=None):
+    """
+    Single-pass ensemble inference over an encoded symptom matrix.
+
+    Every fitted model is evaluated once per call and its probabilities are
+    shared between the per-model labels, the weighted blend, the soft-voting
+    average, the stacking meta-features and the confidence scores.
+    The stacking model is only evaluated when include_stacking is set, since
+    the API response never used its label.
+    """
+    models = models or active_models
+    base_models = models.base_models
+    proba_cache = {}
+    probas = dict(zip(base_models, _collect_probas(base_models.values(), input_data, proba_cache)))
 
-def get_enhanced_prediction(input_data):
+    # SVC.predict uses libsvm one-vs-one votes, which can disagree with the
+    # argmax of the Platt-scaled probabilities, so keep its own label pass
+    svm_labels = base_models["svm"].predict(input_data)
+
+    predictions = np.array(list(probas.values()))
+    weighted_proba = np.sum(predictions * models.ensemble_weights[:, np.newaxis, np.newaxis], axis=0)
+
+    if models.voting_model is not None:
+        voting_proba = np.average(
+            _collect_probas(models.voting_estimators, input_data, proba_cache),
+            axis=0,
+            weights=models.voting_weights()
+        )
+        voting_labels = models.voting_model.classes_[np.argmax(voting_proba, axis=1)]
+    else:
+        # Degraded: without the voting ensemble the weighted blend decides
+        voting_proba = weighted_proba
+        voting_labels = base_models["nb"].classes_[np.argmax(weighted_proba, axis=1)]
+
+    result = {
+        "weighted_proba": weighted_proba,
+        "voting_proba": voting_proba,
+        "voting_labels": voting_labels,
+        "final_labels": voting_labels
+    }
+    for name, proba in probas.items():
+        result[f"{name}_proba"] = proba
+        result[f"{name}_labels"] = base_models[name].classes_[np.argmax(proba, axis=1)]
+    result["svm_labels"] = svm_labels
+
+    if include_stacking and models.stacking_model is not None:
+        meta_features = get_stacking_meta_features(input_data, proba_cache, models)
+        result["stacking_meta_features"] = meta_features
+        result["stacking_labels"] = models.stacking_model.classes_[models.stacking_final_estimator.predict(meta_features)]
+
+    return result
+
+def member_proba(name, input_data, proba_cache, models=None):
+    """Class probabilities of one composition member (a base model, voting or stacking)."""
+    models = models or active_models
+    if name == "voting":
+        return np.average(
+            _collect_probas(models.voting_estimators, input_data, proba_cache),
+            axis=0,
+            weights=models.voting_weights()
+        )
+    if name == "stacking":
+        meta_features = get_stacking_meta_features(input_data, proba_cache, models)
+        return models.stacking_final_estimator.predict_proba(meta_features)
+    return _collect_probas([models.base_models[name]], input_data, proba_cache)[0]
+
+def run_composition(input_data, models=None):
+    """
+    Inference with the serving composition: only its members run, and the
+    final label is the argmax of their weighted probability blend. Base
+    models that are members also report their own labels and confidences.
+    """
+    models = models or active_models
+    proba_cache = {}
+    names = [name for name, _ in models.composition]
+    probas = [member_proba(name, input_data, proba_cache, models) for name in names]
+    final_proba = np.average(probas, axis=0, weights=[weight for _, weight in models.composition])
+
+    # Every member is fitted on the same encoded labels
+    result = {
+        "final_proba": final_proba,
+        "final_labels": models.base_models["nb"].classes_[np.argmax(final_proba, axis=1)]
+    }
+    for name, proba in zip(names, probas):
+        if name in models.base_models:
+            result[f"{name}_proba"] = proba
+            result[f"{name}_labels"] = models.base_models[name].classes_[np.argmax(proba, axis=1)]
+    if "svm" in names:
+        # Same libsvm one-vs-one label as run_inference reports
+        result["svm_labels"] = models.base_models["svm"].predict(input_data)
+    return result
+
+def run_serving(input_data, models=None):
+    """The configured composition when there is one, otherwise the full single-pass ensemble."""
+    models = models or active_models
+    if models.composition:
+        return run_composition(input_data, models)
+    return run_inference(input_data, models=models)
+
+def format_prediction(result, row=0, models=None):
+    """Build the /predict response for one row of a run_inference / run_composition result."""
+    prediction_classes = (models or active_models).prediction_classes
+    # Models missing from a degraded set (or not in the composition) report no prediction and no confidence
+    return {
+        "rf_prediction": prediction_classes[result["rf_labels"][row]] if "rf_labels" in result else None,
+        "nb_prediction": prediction_classes[result["nb_labels"][row]] if "nb_labels" in result else None,
+        "svm_prediction": prediction_classes[result["svm_labels"][row]] if "svm_labels" in result else None,
+        "final_prediction": prediction_classes[result["final_labels"][row]],
+        "confidence_scores": {
+            name: float(max(result[f"{name}_proba"][row]))
+            for name in ["rf", "nb", "svm"] if f"{name}_proba" in result
+        }
+    }
+
+def get_enhanced_prediction(input_data, models=None):
     """Get enhanced prediction using weighted ensemble."""
-    # Use both advanced models but preserve original format
-    models = [rf_model, nb_model, svm_model, xgb_model]
-    
-    # Apply weights for better prediction
-    predictions = np.array([model.predict_proba(input_data) for model in models])
-    weighted_preds = np.sum(predictions * ensemble_weights[:, np.newaxis, np.newaxis], axis=0)
-    
-    # Get best prediction as determined by voting classifier (more reliable)
-    voting_pred = voting_model.predict(input_data)[0]
-    stacking_pred = stacking_model.predict(input_data)[0]
-    
-    # Determine final prediction - prioritize voting model
-    return prediction_classes[voting_pred]
+    models = models or active_models
+    # Determine final prediction - prioritize voting model (more reliable)
+    return models.prediction_classes[run_serving(input_data, models)["final_labels"][0]]
+
+cascade_hits = {}
+_cascade_lock = threading.Lock()
+
+def top_margin(proba):
+    """Top-1 minus top-2 probability of every row."""
+    top_two = np.partition(proba, -2, axis=1)[:, -2:]
+    return top_two[:, 1] - top_two[:, 0]
+
+def format_cascade_prediction(tier, label, proba, models=None):
+    """Response for a row answered early by one cascade tier."""
+    prediction_classes = (models or active_models).prediction_classes
+    response = {
+        "rf_prediction": None,
+        "nb_prediction": None,
+        "svm_prediction": None,
+        "final_prediction": prediction_classes[label],
+        "confidence_scores": {tier: float(max(proba))},
+        "cascade_tier": tier
+    }
+    if f"{tier}_prediction" in response:
+        response[f"{tier}_prediction"] = prediction_classes[label]
+    return response
+
+def run_cascade(input_data, models=None):
+    """Answer each row from the first tier whose top-1 margin clears its threshold."""
+    models = models or active_models
+    responses = [None] * len(input_data)
+    pending = np.arange(len(input_data))
+    hits = {}
+
+    for name, threshold in models.cascade_tiers:
+        if not len(pending):
+            break
+        model = models.cascade_models[name]
+        proba = model.predict_proba(input_data[pending])
+        labels = model.classes_[np.argmax(proba, axis=1)]
+        confident = top_margin(proba) >= threshold
+        for k in np.flatnonzero(confident):
+            responses[pending[k]] = format_cascade_prediction(name, labels[k], proba[k], models)
+        hits[name] = int(confident.sum())
+        pending = pending[~confident]
+
+    if len(pending):
+        result = run_serving(input_data[pending], models)
+        for j, i in enumerate(pending):
+            responses[i] = {**format_prediction(result, j, models), "cascade_tier": "full"}
+        hits["full"] = len(pending)
+
+    with _cascade_lock:
+        for name, count in hits.items():
+            cascade_hits[name] = cascade_hits.get(name, 0) + count
+    return responses
+
+def cascade_stats():
+    """Per-tier hit counts and rates of the cascade."""
+    tiers = active_models.cascade_tiers
+    with _cascade_lock:
+        total = sum(cascade_hits.values())
+        return {
+            "enabled": bool(tiers),
+            "tiers": [{"model": name, "threshold": threshold} for name, threshold in tiers],
+            "hits": dict(cascade_hits),
+            "hit_rates": {name: count / total for name, count in cascade_hits.items()} if total else {}
+        }
+
+# Lookups / hits of the exact-profile index since start-up
+profile_index_hits = {"lookups": 0, "hits": 0}
+_profile_lock = threading.Lock()
+
+def profile_index_stats():
+    """Size of the exact-profile index, its live hit rate and its build-time agreement with the ensemble."""
+    models = active_models
+    with _profile_lock:
+        lookups, hits = profile_index_hits["lookups"], profile_index_hits["hits"]
+    return {
+        "enabled": bool(models.profile_index),
+        "profiles": len(models.profile_index),
+        "memory_bytes": estimate_nbytes(models.profile_index) if models.profile_index else 0,
+        **models.profile_index_info,
+        "lookups": lookups,
+        "hits": hits,
+        "hit_rate": hits / lookups if lookups else None
+    }
+
+def predict_rows(input_data, models=None):
+    """
+    Responses for every row of an encoded matrix: exact training profiles from
+    the profile index, the rest through the cascade when it is enabled or the
+    full ensemble.
+    """
+    models = models or active_models
+    responses = [None] * len(input_data)
+    if models.profile_index:
+        for i, row in enumerate(input_data):
+            response = models.profile_index.get(symptom_bitset(row))
+            if response is not None:
+                responses[i] = copy.deepcopy(response)
+        with _profile_lock:
+            profile_index_hits["lookups"] += len(input_data)
+            profile_index_hits["hits"] += sum(response is not None for response in responses)
+
+    pending = [i for i, response in enumerate(responses) if response is None]
+    if not pending:
+        return responses
+    pending_data = input_data[pending] if len(pending) < len(input_data) else input_data
+    if models.cascade_tiers:
+        computed = run_cascade(pending_data, models)
+    else:
+        result = run_serving(pending_data, models)
+        computed = [format_prediction(result, row, models) for row in range(len(pending_data))]
+    for i, response in zip(pending, computed):
+        responses[i] = response
+    return responses
+
+def encode_symptoms_with_report(input_symptoms, models=None):
+    """Encode a symptom list into one uint8 model row; also return the terms that matched no column."""
+    return (models or active_models).vocabulary.encode(input_symptoms)
+
+def encode_symptoms(input_symptoms, models=None):
+    """Convert a list of symptom names into one model-compatible input row."""
+    return encode_symptoms_with_report(input_symptoms, models)[0]
+
+def encode_symptom_batch(symptom_lists, models=None, out=None):
+    """Encode many symptom lists straight into one 2-D uint8 model input matrix (and unmatched terms per row)."""
+    return (models or active_models).vocabulary.encode_batch(symptom_lists, out)
+
+def report_unmatched(response, unmatched):
+    """Tell the caller which symptom terms matched no model column."""
+    if unmatched:
+        print(f"⚠️ Unmatched symptoms: {unmatched}")
+        response["unmatched_symptoms"] = list(unmatched)
+    return response
+
+def predict_disease_batch(symptom_lists):
+    """Predict many symptom sets with one pass of each model over the uncached rows."""
+    if not symptom_lists:
+        return []
+    models = active_models
+    input_data, unmatched = encode_symptom_batch(symptom_lists, models)
+    responses = [get_cached_prediction(row, models) for row in input_data]
+
+    misses = [i for i, response in enumerate(responses) if response is None]
+    if misses:
+        for i, response in zip(misses, predict_rows(input_data[misses], models)):
+            responses[i] = response
+            cache_prediction(input_data[i], response, models)
+    return [report_unmatched(response, terms) for response, terms in zip(responses, unmatched)]
 
 def predict_disease(input_json):
     """Handles the disease prediction logic."""
     
     input_symptoms = input_json.get("symptoms", [])
 
+    # One model version serves the whole request, even if a reload swaps mid-way
+    models = active_models
+
     # Convert input symptoms to model-compatible format
-    input_data = [0] * len(symptom_index)
-    for symptom in input_symptoms:
-        symptom = symptom.capitalize()
-        if symptom in symptom_index:
-            input_data[symptom_index[symptom]] = 1
+    input_row, unmatched = encode_symptoms_with_report(input_symptoms, models)
 
-    input_data = np.array(input_data).reshape(1, -1)
+    # Repeated symptom combinations are served without touching any model
+    cached = get_cached_prediction(input_row, models)
+    if cached is not None:
+        return report_unmatched(cached, unmatched)
 
-    # Get individual model predictions
-    rf_pred = prediction_classes[rf_model.predict(input_data)[0]]
-    nb_pred = prediction_classes[nb_model.predict(input_data)[0]]
-    svm_pred = prediction_classes[svm_model.predict(input_data)[0]]
+    # Return with the EXACT SAME format as required
+    response = predict_rows(input_row.reshape(1, -1), models)[0]
+    cache_prediction(input_row, response, models)
+    return report_unmatched(response, unmatched)
 
-    # Get ensemble prediction - use the enhanced method but maintain original format
-    final_pred = get_enhanced_prediction(input_data)
+def warm_up_models(models, seed=0):
+    """Score sample vectors through every path of a set; raise if any output is unusable."""
+    if not models.models_loaded:
+        return
+    samples = sample_symptom_rows(models.vocabulary.size, seed=seed)
 
-    # Return with the EXACT SAME format as required
-    return {
-        "rf_prediction": rf_pred,
-        "nb_prediction": nb_pred,
-        "svm_prediction": svm_pred,
-        "final_prediction": final_pred,
-        "confidence_scores": {
-            "rf": float(max(rf_model.predict_proba(input_data)[0])),
-            "nb": float(max(nb_model.predict_proba(input_data)[0])),
-            "svm": float(max(svm_model.predict_proba(input_data)[0]))
-        }
-    }
\ No newline at end of file
+    for batch in (samples[:1], samples):
+        result = run_inference(batch, include_stacking=True, models=models)
+        for row in range(len(batch)):
+            format_prediction(result, row, models)
+        for model in models.cascade_models.values():
+            model.predict_proba(batch)
+        if not np.all(np.isfinite(result["voting_proba"])):
+            raise ValueError(f"Model version {models.version} produced non-finite probabilities")
+        if models.composition:
+            composed = run_composition(batch, models)
+            for row in range(len(batch)):
+                format_prediction(composed, row, models)
+            if not np.all(np.isfinite(composed["final_proba"])):
+                raise ValueError(f"Serving composition of {models.version} produced non-finite probabilities")
+
+# Touch every model once so the first request does not pay for lazy initialisation
+warm_up_models(active_models)
+
+def reload_models(version=None):
+    """
+    Load a model version (default: the ACTIVE pointer), warm it and swap it in.
+
+    The new set is fully built (and accepted by every swap listener) before
+    the swap, which is a single reference assignment; requests already
+    running keep the set they started with.
+    """
+    global active_models, previous_models
+    with _reload_lock:
+        version = version or read_active_version()
+        if version == active_models.version:
+            return {"status": "unchanged", **active_models.summary()}
+
+        if version:
+            verify_version(version)
+            models = ModelSet(version_dir(version), version)
+        else:
+            models = ModelSet(MODELS_DIR)
+            if models.version == active_models.version:
+                return {"status": "unchanged", **active_models.summary()}
+
+        if list(models.metadata["symptoms"]) != list(active_models.metadata["symptoms"]):
+            raise ValueError("The new model version uses a different symptom list, restart the server to serve it")
+
+        warm_up_models(models)
+        for listener in swap_listeners:
+            listener(models)
+        previous_models, active_models = active_models, models
+        print(f"✅ Now serving model version {models.version} (previous {previous_models.version})")
+        return {"status": "swapped", "previous_version": previous_models.version, **models.summary()}
+
+def rollback_models():
+    """Swap the previously served (still loaded) version back in."""
+    global active_models, previous_models
+    with _reload_lock:
+        if previous_models is None:
+            raise ValueError("No previous model version is loaded")
+        for listener in swap_listeners:
+            listener(previous_models)
+        previous_models, active_models = active_models, previous_models
+        if os.path.exists(version_dir(active_models.version)):
+            # Keep the pointer in step so watchers and restarts stay on the rolled-back version
+            set_active_version(active_models.version)
+        print(f"↩️ Rolled back to model version {active_models.version}")
+        return {"status": "rolled_back", "previous_version": previous_models.version, **active_models.summary()}
+
+def load_models(models_dir, version):
+    """Load and warm a set without serving it (an inference pool worker, ahead of its parent's swap)."""
+    models = ModelSet(models_dir, version)
+    warm_up_models(models)
+    return models
+
+def switch_models(models):
+    """Serve an already loaded set; the current one becomes the rollback target."""
+    global active_models, previous_models
+    with _reload_lock:
+        previous_models, active_models = active_models, models
+
+def _reload_in_background(version):
+    reload_status.update({"state": "loading", "version": version, "started_at": time.time(), "error": None})
+    try:
+        result = reload_models(version)
+        reload_status.update({"state": result["status"], "version": result["version"]})
+    except Exception as e:
+        print(f"❌ Model reload failed, still serving {active_models.version}: {e}")
+        reload_status.update({"state": "failed", "error": str(e)})
+    reload_status["finished_at"] = time.time()
+
+def start_reload(version=None):
+    """Reload in a background thread; False if a reload is already running."""
+    if reload_status["state"] == "loading":
+        return False
+    reload_status["state"] = "loading"
+    threading.Thread(target=_reload_in_background, args=(version,), daemon=True).start()
+    return True
+
+def _watch_active_pointer(interval):
+    failed_version = None
+    while True:
+        time.sleep(interval)
+        version = read_active_version()
+        if version and version not in (active_models.version, failed_version) and reload_status["state"] != "loading":
+            _reload_in_background(version)
+            failed_version = version if reload_status["state"] == "failed" else None
+
+# Every worker follows ml_models/versions/ACTIVE, so one publish rolls them all
+if MODEL_WATCH_INTERVAL > 0:
+    threading.Thread(target=_watch_active_pointer, args=(MODEL_WATCH_INTERVAL,), daemon=True).start()
@@ -0,0 +1,389 @@
+"""
+Chatbot session storage.
+
+A chat session is kept as a ChatSession: symptoms and asked groups are
+integer bitsets (vocabulary columns / symptom group indices), the follow-up
+queue holds vocabulary columns and the conversation is a list of strings
+with the user turns marked in another bitset. Stores hold sessions as the
+compact bytes of ChatSession.to_bytes(), so every backend sees the same
+format and an in-process store can account for its memory exactly.
+Session ids are keyed as str (clients may send them as JSON numbers).
+
+Backends:
+    MemorySessionStore  per-process LRU with an idle TTL and a byte budget
+    RedisSessionStore   shared by every gunicorn worker (any Redis-compatible
+                        server); Redis expires idle sessions, and its own
+                        maxmemory / volatile-lru policy caps memory
+    MongoSessionStore   shared, in a chat_sessions collection with a TTL index
+
+A message is a read-modify-write of its session, so callers hold the
+session's StripedLocks stripe around it: sessions on different stripes
+proceed in parallel and one session's messages are applied in arrival
+order. The locks are per process; with a shared store, gunicorn threads
+of one worker are covered and sessions should stick to a worker (as they
+had to before to survive at all).
+"""
+import os
+import struct
+import threading
+import time
+import zlib
+from collections import OrderedDict, deque
+from datetime import datetime, timedelta, timezone
+
+FORMAT_VERSION = 1
+
+# Conversations longer than this are zlib-compressed in the stored bytes
+COMPRESS_MIN_BYTES = 256
+
+# version | flags | started | current group | last message type | asked groups | counts
+_HEADER = struct.Struct("<BBIbBHHBIB")
+_COMPRESSED = 1
+
+# Lock stripes for chat sessions (a session always maps to the same stripe)
+CHAT_SESSION_LOCK_STRIPES = int(os.getenv("CHAT_SESSION_LOCK_STRIPES", "64"))
+
+# Python-side cost of one MemorySessionStore entry besides its bytes and key
+# (OrderedDict slot, value tuple, expiry float), measured on CPython 3.11
+ENTRY_OVERHEAD = 200
+
+
+def bits_of(bitset):
+    """Indices of the set bits of an int bitset, ascending."""
+    indices = []
+    while bitset:
+        low = bitset & -bitset
+        indices.append(low.bit_length() - 1)
+        bitset ^= low
+    return indices
+
+
+def bitset_of(indices):
+    bitset = 0
+    for index in indices:
+        bitset |= 1 << index
+    return bitset
+
+
+class ChatSession:
+    """Compact state of one chatbot conversation."""
+
+    __slots__ = ("started", "current_group", "last_type", "asked_groups", "symptoms", "followups",
+                 "history", "user_turns", "prediction")
+
+    def __init__(self, started=None):
+        self.started = int(time.time() if started is None else started)
+        self.current_group = -1
+        self.last_type = 0
+        self.asked_groups = 0
+        self.symptoms = 0
+        self.followups = []
+        self.history = []
+        self.user_turns = 0
+        # [(disease, confidence), ...] best first, or None before a prediction
+        self.prediction = None
+
+    def add_message(self, role, message):
+        if role == "user":
+            self.user_turns |= 1 << len(self.history)
+        self.history.append(message)
+
+    def messages(self):
+        return [
+            {"role": "user" if self.user_turns >> i & 1 else "assistant", "message": message}
+            for i, message in enumerate(self.history)
+        ]
+
+    def to_bytes(self):
+        symptom_bytes = self.symptoms.to_bytes((self.symptoms.bit_length() + 7) // 8, "little")
+        turn_bytes = self.user_turns.to_bytes((len(self.history) + 7) // 8, "little")
+        parts = [symptom_bytes, struct.pack(f"<{len(self.followups)}H", *self.followups), turn_bytes]
+        for disease, confidence in self.prediction or []:
+            name = disease.encode()
+            parts.append(struct.pack("<dB", confidence, len(name)) + name)
+
+        history = b"".join(struct.pack("<I", len(m)) + m for m in (message.encode() for message in self.history))
+        flags = 0
+        if len(history) >= COMPRESS_MIN_BYTES:
+            history = zlib.compress(history, 1)
+            flags |= _COMPRESSED
+        header = _HEADER.pack(
+            FORMAT_VERSION, flags, self.started, self.current_group, self.last_type, self.asked_groups,
+            len(symptom_bytes), len(self.followups), len(self.history),
+            255 if self.prediction is None else len(self.prediction)
+        )
+        return b"".join([header, *parts, history])
+
+    @classmethod
+    def from_bytes(cls, data):
+        (version, flags, started, current_group, last_type, asked_groups,
+         n_symptom_bytes, n_followups, n_history, n_prediction) = _HEADER.unpack_from(data)
+        if version != FORMAT_VERSION:
+            raise ValueError(f"Chat session format {version} is not supported")
+
+        session = cls(started)
+        session.current_group = current_group
+        session.last_type = last_type
+        session.asked_groups = asked_groups
+        offset = _HEADER.size
+        session.symptoms = int.from_bytes(data[offset:offset + n_symptom_bytes], "little")
+        offset += n_symptom_bytes
+        session.followups = list(struct.unpack_from(f"<{n_followups}H", data, offset))
+        offset += 2 * n_followups
+        n_turn_bytes = (n_history + 7) // 8
+        session.user_turns = int.from_bytes(data[offset:offset + n_turn_bytes], "little")
+        offset += n_turn_bytes
+        if n_prediction != 255:
+            session.prediction = []
+            for _ in range(n_prediction):
+                confidence, length = struct.unpack_from("<dB", data, offset)
+                offset += 9
+                session.prediction.append((data[offset:offset + length].decode(), confidence))
+                offset += length
+
+        history = data[offset:]
+        if flags & _COMPRESSED:
+            history = zlib.decompress(history)
+        offset = 0
+        for _ in range(n_history):
+            (length,) = struct.unpack_from("<I", history, offset)
+            session.history.append(history[offset + 4:offset + 4 + length].decode())
+            offset += 4 + length
+        return session
+
+
+class _FairLock:
+    """FIFO lock: on release the longest waiter is handed the lock (and only it is woken)."""
+
+    def __init__(self):
+        self._mutex = threading.Lock()
+        self._locked = False
+        self._waiters = deque()
+
+    def __enter__(self):
+        with self._mutex:
+            if not self._locked:
+                self._locked = True
+                return self
+            waiter = threading.Lock()
+            waiter.acquire()
+            self._waiters.append(waiter)
+        waiter.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        with self._mutex:
+            if self._waiters:
+                # Stays locked: ownership passes straight to the next waiter
+                self._waiters.popleft().release()
+            else:
+                self._locked = False
+
+
+class StripedLocks:
+    """
+    A fixed set of FIFO locks shared by session id hash. Memory stays bounded
+    however many sessions there are, unrelated sessions rarely contend, and
+    threading.Lock's unfair wake-ups cannot reorder one session's messages.
+    """
+
+    def __init__(self, stripes=CHAT_SESSION_LOCK_STRIPES):
+        self._stripes = [_FairLock() for _ in range(max(1, stripes))]
+
+    def lock(self, session_id):
+        return self._stripes[hash(str(session_id)) % len(self._stripes)]
+
+
+class MemorySessionStore:
+    """
+    In-process LRU of serialized sessions with an idle TTL and a byte budget.
+
+    Every get / put refreshes a session's expiry and moves it to the recent
+    end, so the least recently used entries are also the first to expire:
+    both expired sessions and, past max_bytes, the oldest live ones are
+    evicted from the front.
+    """
+
+    name = "memory"
+
+    def __init__(self, ttl=1800, max_bytes=64 * 1024 * 1024):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _cost(session_id, data):
+        return len(session_id.encode()) + len(data) + ENTRY_OVERHEAD
+
+    def _drop(self, session_id):
+        data, _ = self._entries.pop(session_id)
+        self.bytes -= self._cost(session_id, data)
+
+    def _expire(self, now):
+        while self._entries:
+            session_id, (_, expires_at) = next(iter(self._entries.items()))
+            if expires_at >= now:
+                return
+            self._drop(session_id)
+            self.expirations += 1
+
+    def get(self, session_id):
+        session_id = str(session_id)
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            entry = self._entries.get(session_id)
+            if entry is None:
+                return None
+            self._entries[session_id] = (entry[0], now + self.ttl)
+            self._entries.move_to_end(session_id)
+            data = entry[0]
+        return ChatSession.from_bytes(data)
+
+    def put(self, session_id, session):
+        session_id = str(session_id)
+        data = session.to_bytes()
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            if session_id in self._entries:
+                self._drop(session_id)
+            self._entries[session_id] = (data, now + self.ttl)
+            self.bytes += self._cost(session_id, data)
+            while self.bytes > self.max_bytes and len(self._entries) > 1:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def delete(self, session_id):
+        session_id = str(session_id)
+        with self._lock:
+            if session_id in self._entries:
+                self._drop(session_id)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "backend": self.name,
+                "sessions": len(self._entries),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "ttl": self.ttl,
+                "evictions": self.evictions,
+                "expirations": self.expirations
+            }
+
+
+class RedisSessionStore:
+    """Sessions shared between workers in Redis (or any server speaking its protocol)."""
+
+    name = "redis"
+
+    def __init__(self, url="redis://localhost:6379/0", ttl=1800, prefix="chat_session:", client=None):
+        if client is None:
+            import redis
+            client = redis.Redis.from_url(url)
+        self.client = client
+        self.ttl = int(ttl)
+        self.prefix = prefix
+
+    def get(self, session_id):
+        session_id = str(session_id)
+        # GETEX refreshes the idle TTL in the same round trip
+        data = self.client.getex(self.prefix + session_id, ex=self.ttl)
+        return None if data is None else ChatSession.from_bytes(data)
+
+    def put(self, session_id, session):
+        session_id = str(session_id)
+        self.client.set(self.prefix + session_id, session.to_bytes(), ex=self.ttl)
+
+    def delete(self, session_id):
+        session_id = str(session_id)
+        self.client.delete(self.prefix + session_id)
+
+    def stats(self):
+        try:
+            memory = self.client.info("memory")
+        except Exception:
+            # Some Redis-compatible stand-ins do not implement INFO
+            memory = {}
+        return {
+            "backend": self.name,
+            "ttl": self.ttl,
+            "used_memory": memory.get("used_memory"),
+            "maxmemory": memory.get("maxmemory"),
+            "maxmemory_policy": memory.get("maxmemory_policy")
+        }
+
+
+class MongoSessionStore:
+    """Sessions shared between workers in a MongoDB collection expired by a TTL index."""
+
+    name = "mongo"
+
+    def __init__(self, collection, ttl=1800):
+        self.collection = collection
+        self.ttl = ttl
+        # Mongo's TTL monitor deletes documents once expires_at has passed (within a minute)
+        self.collection.create_index("expires_at", expireAfterSeconds=0)
+
+    def _expires_at(self):
+        return datetime.now(timezone.utc) + timedelta(seconds=self.ttl)
+
+    def get(self, session_id):
+        session_id = str(session_id)
+        doc = self.collection.find_one_and_update(
+            {"_id": session_id, "expires_at": {"$gt": datetime.now(timezone.utc)}},
+            {"$set": {"expires_at": self._expires_at()}},
+            projection={"state": 1}
+        )
+        return None if doc is None else ChatSession.from_bytes(bytes(doc["state"]))
+
+    def put(self, session_id, session):
+        session_id = str(session_id)
+        self.collection.replace_one(
+            {"_id": session_id},
+            {"state": session.to_bytes(), "expires_at": self._expires_at()},
+            upsert=True
+        )
+
+    def delete(self, session_id):
+        session_id = str(session_id)
+        self.collection.delete_one({"_id": session_id})
+
+    def stats(self):
+        return {
+            "backend": self.name,
+            "ttl": self.ttl,
+            "sessions": self.collection.estimated_document_count()
+        }
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_session_store(backend="memory", ttl=1800, max_bytes=64 * 1024 * 1024, redis_url=None, mongo_db=None):
+    """Return the process-wide session store, creating it on first use."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                if backend == "redis":
+                    _store = RedisSessionStore(redis_url or "redis://localhost:6379/0", ttl)
+                elif backend == "mongo":
+                    _store = MongoSessionStore(mongo_db.chat_sessions, ttl)
+                elif backend == "memory":
+                    _store = MemorySessionStore(ttl, max_bytes)
+                else:
+                    raise ValueError(f"Unknown chat session store {backend!r}")
+                print(f"✅ Chat sessions stored in {_store.name} (idle TTL {ttl:.0f} s)")
+    return _store
+
+
+def current_session_store():
+    """The configured store, or an in-process one with the defaults."""
+    return _store or get_session_store()
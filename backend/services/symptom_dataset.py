@@ -0,0 +1,146 @@
+"""
+Binary cache of the symptom datasets (datasets/Training.csv, Testing.csv).
+
+Each CSV is converted once into datasets/cache/<name>/:
+    features.npy   uint8 (rows x symptoms) 0/1 matrix, memory-mapped on load
+    labels.npy     index of every row's prognosis into the manifest's labels
+    manifest.json  symptom column names, label column and names, shape and the
+                   size, mtime and sha256 of the source CSV
+
+load_dataset checks the manifest against the CSV on every call (a stat, and
+a hash only when size or mtime moved) and rebuilds the cache when the CSV
+changed, so every consumer can use it instead of pd.read_csv.
+"""
+import json
+import os
+import threading
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from services.model_versions import file_sha256
+
+DATASET_CACHE_DIR = os.getenv("DATASET_CACHE_DIR", os.path.join("datasets", "cache"))
+FORMAT_VERSION = 1
+
+_build_lock = threading.Lock()
+
+
+class SymptomDataset:
+    """Symptom matrix, labels and column names of one dataset."""
+
+    def __init__(self, X, label_codes, label_names, symptoms, label_column):
+        self.X = X
+        self.label_codes = label_codes
+        self.label_names = label_names
+        self.symptoms = symptoms
+        self.label_column = label_column
+
+    def __len__(self):
+        return len(self.label_codes)
+
+    @property
+    def labels(self):
+        """Prognosis name of every row."""
+        return self.label_names[self.label_codes]
+
+    @property
+    def nbytes(self):
+        return self.X.nbytes + self.label_codes.nbytes + self.label_names.nbytes
+
+    def frame(self):
+        """The dataset as the DataFrame pd.read_csv(...).dropna(axis=1) used to give (uint8 symptom columns)."""
+        data = pd.DataFrame(np.asarray(self.X), columns=self.symptoms)
+        data[self.label_column] = self.labels
+        return data
+
+
+def cache_dir_for(csv_path, cache_dir=None):
+    name = os.path.splitext(os.path.basename(csv_path))[0]
+    return os.path.join(cache_dir or DATASET_CACHE_DIR, name)
+
+
+def read_manifest(directory):
+    try:
+        with open(os.path.join(directory, "manifest.json")) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def write_manifest(directory, manifest):
+    tmp_path = os.path.join(directory, f".manifest.json.{os.getpid()}.tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, os.path.join(directory, "manifest.json"))
+
+
+def is_fresh(manifest, csv_path, directory):
+    """Whether a cache manifest still describes the CSV on disk."""
+    if manifest is None or manifest.get("format") != FORMAT_VERSION:
+        return False
+    stat = os.stat(csv_path)
+    source = manifest["source"]
+    if source["bytes"] == stat.st_size and source["mtime_ns"] == stat.st_mtime_ns:
+        return True
+    # Touched but maybe not changed (checkout, copy): only the content counts
+    if source["bytes"] != stat.st_size or source["sha256"] != file_sha256(csv_path):
+        return False
+    source["mtime_ns"] = stat.st_mtime_ns
+    write_manifest(directory, manifest)
+    return True
+
+
+def build_cache(csv_path, cache_dir=None):
+    """Convert one CSV into its binary cache; returns the manifest."""
+    directory = cache_dir_for(csv_path, cache_dir)
+    os.makedirs(directory, exist_ok=True)
+    stat = os.stat(csv_path)
+    sha256 = file_sha256(csv_path)
+
+    data = pd.read_csv(csv_path).dropna(axis=1)
+    features = data.iloc[:, :-1]
+    values = features.values
+    if not np.isin(values, (0, 1)).all():
+        raise ValueError(f"{csv_path} has symptom values other than 0/1")
+
+    # Readers never see half-written files: each file is replaced whole, the manifest last
+    label_names, label_codes = np.unique(data.iloc[:, -1].values.astype(str), return_inverse=True)
+    arrays = {"features.npy": values.astype(np.uint8), "labels.npy": label_codes.astype(np.min_scalar_type(len(label_names)))}
+    for name, array in arrays.items():
+        tmp_path = os.path.join(directory, f".{name}.{os.getpid()}.tmp")
+        with open(tmp_path, "wb") as f:
+            np.save(f, array)
+        os.replace(tmp_path, os.path.join(directory, name))
+
+    manifest = {
+        "format": FORMAT_VERSION,
+        "created_at": datetime.utcnow().isoformat(),
+        "source": {"path": csv_path, "bytes": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": sha256},
+        "rows": len(data),
+        "symptoms": features.columns.tolist(),
+        "label_column": data.columns[-1],
+        "labels": label_names.tolist(),
+        "dtype": "uint8"
+    }
+    write_manifest(directory, manifest)
+    print(f"✅ Cached {csv_path} ({len(data)} rows x {features.shape[1]} symptoms) in {directory}")
+    return manifest
+
+
+def load_dataset(csv_path, mmap=True, cache_dir=None):
+    """Load a symptom CSV through its binary cache, (re)building the cache when the CSV changed."""
+    directory = cache_dir_for(csv_path, cache_dir)
+    manifest = read_manifest(directory)
+    if not is_fresh(manifest, csv_path, directory):
+        with _build_lock:
+            manifest = read_manifest(directory)
+            if not is_fresh(manifest, csv_path, directory):
+                manifest = build_cache(csv_path, cache_dir)
+
+    X = np.load(os.path.join(directory, "features.npy"), mmap_mode="r" if mmap else None)
+    label_codes = np.load(os.path.join(directory, "labels.npy"))
+    if X.shape != (manifest["rows"], len(manifest["symptoms"])) or len(label_codes) != manifest["rows"]:
+        raise ValueError(f"Dataset cache {directory} does not match its manifest, delete it to rebuild")
+    return SymptomDataset(X, label_codes, np.array(manifest["labels"]), manifest["symptoms"], manifest["label_column"])
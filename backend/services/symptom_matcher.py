@@ -0,0 +1,140 @@
+import re
+
+from services.symptom_vocabulary import normalize_symptom
+
+# Words (or word pairs, apostrophes split like normalize_symptom does) that negate the symptoms after them
+NEGATION_CUES = [
+    "no", "not", "never", "without", "nor", "neither", "denies", "deny", "denied",
+    "free of", "negative for", "don t", "doesn t", "didn t", "haven t", "hasn t",
+    "hadn t", "isn t", "aren t", "wasn t", "weren t"
+]
+
+# A negation covers at most this many words after the cue...
+NEGATION_SCOPE = 5
+
+# ...and stops at the end of a sentence or clause, at a contrast, or where the
+# speaker starts reporting again ("not feeling well, vomiting a lot",
+# "not sure, I have itching")
+SCOPE_BREAKERS = {
+    ".", ",", ";", ":", "!", "?", "but", "however", "although", "though", "except", "yet", "still",
+    "i have", "i ve", "i am", "i m", "i feel", "i got"
+}
+
+_TOKEN = re.compile(r"[a-z0-9]+|[.,;:!?]")
+
+_SYMPTOM, _NEGATION, _BREAKER = 0, 1, 2
+
+
+class SymptomMatcher:
+    """
+    Aho–Corasick automaton over words, finding every symptom phrase of a
+    message in one pass.
+
+    Patterns are the normalized keys of a SymptomVocabulary (column names
+    without underscores, frontend display names, aliases) plus a synonym
+    table; vocabulary keys win when a synonym spells the same words. Matching
+    whole words gives word boundaries for free ("hot" never matches "shot"),
+    overlapping mentions resolve leftmost-longest ("mild fever" is mild_fever,
+    not also "fever"), and a mention within NEGATION_SCOPE words after a
+    negation cue, with no clause end, contrast word or new "I have" in
+    between, is reported as negated ("no fever or cough").
+    """
+
+    def __init__(self, vocabulary, synonyms=None, negation_cues=NEGATION_CUES):
+        self.symptoms = vocabulary.symptoms
+        patterns = {tuple(key.split()): (_SYMPTOM, col) for key, col in vocabulary.index.items() if key}
+        for name, phrases in (synonyms or {}).items():
+            col = vocabulary.resolve(name)
+            if col is None:
+                raise ValueError(f"Synonyms given for unknown symptom {name!r}")
+            for phrase in phrases:
+                patterns.setdefault(tuple(normalize_symptom(phrase).split()), (_SYMPTOM, col))
+        for cue in negation_cues:
+            patterns.setdefault(tuple(cue.split()), (_NEGATION, None))
+        self.n_patterns = len(patterns)
+        # Scope breakers ride along so extract() only ever looks at hits, never at every token
+        for breaker in SCOPE_BREAKERS:
+            patterns.setdefault(tuple(breaker.split()), (_BREAKER, None))
+
+        # Trie of word transitions; outputs are (pattern length, kind, column)
+        self.goto = [{}]
+        self.outputs = [[]]
+        for words, (kind, col) in patterns.items():
+            state = 0
+            for word in words:
+                if word not in self.goto[state]:
+                    self.goto.append({})
+                    self.outputs.append([])
+                    self.goto[state][word] = len(self.goto) - 1
+                state = self.goto[state][word]
+            self.outputs[state].append((len(words), kind, col))
+
+        # Failure links in breadth-first order; every state also reports its suffix patterns
+        self.fail = [0] * len(self.goto)
+        queue = list(self.goto[0].values())
+        for state in queue:
+            for word, child in self.goto[state].items():
+                queue.append(child)
+                fallback = self.fail[state]
+                while fallback and word not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[child] = self.goto[fallback].get(word, 0)
+                self.outputs[child] = self.outputs[child] + self.outputs[self.fail[child]]
+
+    def scan(self, text):
+        """Tokens of a message and every (start, end, kind, column) pattern occurrence (word indices, inclusive)."""
+        tokens = _TOKEN.findall(text.lower())
+        goto, fail, outputs = self.goto, self.fail, self.outputs
+        root = goto[0]
+        hits = []
+        state = 0
+        for i, token in enumerate(tokens):
+            if state:
+                while state and token not in goto[state]:
+                    state = fail[state]
+                state = goto[state].get(token, 0)
+            else:
+                # Most words of a message start no pattern; skip them with one lookup
+                state = root.get(token, 0)
+                if not state:
+                    continue
+            for length, kind, col in outputs[state]:
+                hits.append((i - length + 1, i, kind, col))
+        return tokens, hits
+
+    def extract(self, text):
+        """(mentioned, negated) symptom columns of a message, each in order of first mention."""
+        tokens, hits = self.scan(text)
+
+        # Leftmost-longest, non-overlapping symptom mentions
+        mentions, last_end = [], -1
+        for start, end, kind, col in sorted(hits, key=lambda hit: (hit[0], hit[0] - hit[1])):
+            if kind == _SYMPTOM and start > last_end:
+                mentions.append((start, end, col))
+                last_end = end
+        # Cues that are part of a symptom phrase ("no energy") negate nothing
+        covered = set()
+        for start, end, _ in mentions:
+            covered.update(range(start, end + 1))
+        events = [(start, 0, col) for start, _, col in mentions]
+        for start, end, kind, _ in hits:
+            if kind == _NEGATION and start not in covered:
+                events.append((end, 1, None))
+            elif kind == _BREAKER:
+                events.append((start, 2, None))
+
+        # A mention is negated when the latest cue before it is in scope and no breaker came after that cue
+        present, negated = [], []
+        last_cue = last_breaker = -1
+        for position, event, col in sorted(events):
+            if event == 1:
+                last_cue = position
+            elif event == 2:
+                last_breaker = position
+            else:
+                is_negated = last_cue >= 0 and position - last_cue <= NEGATION_SCOPE and last_breaker < last_cue
+                target = negated if is_negated else present
+                name = self.symptoms[col]
+                if name not in target:
+                    target.append(name)
+        return present, negated
@@ -0,0 +1,163 @@
+import os
+import re
+import threading
+
+import numpy as np
+
+# Display names the frontend offers, one per line in model column order
+FRONTEND_SYMPTOMS_FILE = os.getenv("FRONTEND_SYMPTOMS_FILE", os.path.join("..", "frontend", "public", "symptoms.txt"))
+
+# Everyday or alternative spellings -> model column
+SYMPTOM_ALIASES = {
+    "fever": "high_fever",
+    "temperature": "high_fever",
+    "diarrhea": "diarrhoea",
+    "loose motions": "diarrhoea",
+    "tiredness": "fatigue",
+    "tired": "fatigue",
+    "rash": "skin_rash",
+    "stomach ache": "stomach_pain",
+    "stomachache": "stomach_pain",
+    "throwing up": "vomiting",
+    "shortness of breath": "breathlessness",
+    "swollen extremities": "swollen_extremeties",
+    "spotting during urination": "spotting_ urination",
+    "foul smelling urine": "foul_smell_of urine",
+    "discolored patches": "dischromic _patches",
+    "typhoid look": "toxic_look_(typhos)",
+    "scarring": "scurring",
+    "heart palpitations": "palpitations",
+    "loss of appetite": "loss_of_appetite",
+    "runny nose": "runny_nose"
+}
+
+# Shortest compact key that typo matching will consider (shorter words collide too easily)
+TYPO_MIN_LENGTH = 5
+
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+
+
+def normalize_symptom(name):
+    """Case-, separator- and spacing-insensitive key: 'Spotting  Urination' -> 'spotting urination'."""
+    return _NON_ALNUM.sub(" ", str(name).lower()).strip()
+
+
+def _deletions(key):
+    """Every string one character shorter than `key`."""
+    return {key[:i] + key[i + 1:] for i in range(len(key))}
+
+
+def read_display_names(path=FRONTEND_SYMPTOMS_FILE):
+    """Lines of the frontend symptom list, or [] when it is not shipped next to the backend."""
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+class SymptomVocabulary:
+    """
+    Precompiled map from any spelling of a symptom to its model column.
+
+    Terms are resolved by normalized key (case, underscores and spacing do not
+    matter), then by the key with all spaces removed, then by one-edit typo
+    tolerance (a single inserted, deleted or replaced character, on keys of at
+    least TYPO_MIN_LENGTH characters and only when the match is unambiguous).
+    Resolutions are memoized, so repeated terms cost one dict lookup.
+    """
+
+    def __init__(self, symptoms, aliases=None, display_names=None):
+        self.symptoms = list(symptoms)
+        self.size = len(self.symptoms)
+        self.index = {}
+        for col, name in enumerate(self.symptoms):
+            # Duplicate columns (fluid_overload / fluid_overload.1) keep the first
+            self.index.setdefault(normalize_symptom(name), col)
+
+        # The frontend list is in column order; keep its spellings that differ
+        if display_names and len(display_names) == self.size:
+            for col, name in enumerate(display_names):
+                self.index.setdefault(normalize_symptom(name), col)
+
+        column_of = {name: col for col, name in reversed(list(enumerate(self.symptoms)))}
+        for alias, name in (SYMPTOM_ALIASES if aliases is None else aliases).items():
+            if name in column_of:
+                self.index.setdefault(normalize_symptom(alias), column_of[name])
+
+        self.compact_index = {}
+        for key, col in self.index.items():
+            self.compact_index.setdefault(key.replace(" ", ""), col)
+
+        # One-deletion neighbourhoods of every compact key; None marks an ambiguous entry
+        self.typo_index = {}
+        for key, col in self.compact_index.items():
+            if len(key) < TYPO_MIN_LENGTH:
+                continue
+            for variant in _deletions(key) | {key}:
+                self.typo_index[variant] = col if self.typo_index.get(variant, col) == col else None
+
+        self._resolved = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_metadata(cls, metadata, display_names_path=FRONTEND_SYMPTOMS_FILE):
+        return cls(metadata["symptoms"], display_names=read_display_names(display_names_path))
+
+    def _lookup(self, term):
+        key = normalize_symptom(term)
+        col = self.index.get(key)
+        if col is not None:
+            return col
+        compact = key.replace(" ", "")
+        col = self.compact_index.get(compact)
+        if col is not None or len(compact) < TYPO_MIN_LENGTH:
+            return col
+
+        candidates = {self.typo_index.get(variant) for variant in _deletions(compact) | {compact}}
+        candidates.discard(None)
+        # Distinct columns within one edit mean the typo is ambiguous
+        return candidates.pop() if len(candidates) == 1 else None
+
+    def resolve(self, term):
+        """Model column of a symptom term, or None if it matches nothing."""
+        try:
+            return self._resolved[term]
+        except (KeyError, TypeError):
+            pass
+        col = self._lookup(term)
+        if isinstance(term, str):
+            with self._lock:
+                # Bounded by the number of distinct spellings clients send
+                if len(self._resolved) < 100_000:
+                    self._resolved[term] = col
+        return col
+
+    def encode(self, terms):
+        """One uint8 model row for a symptom list, and the terms that matched no column."""
+        matrix, unmatched = self.encode_batch([terms])
+        return matrix[0], unmatched[0]
+
+    def encode_batch(self, term_lists, out=None):
+        """
+        Encode many symptom lists into one uint8 matrix (`out`, reused and
+        zeroed when given); returns (matrix, unmatched terms per row).
+        """
+        if out is None:
+            out = np.zeros((len(term_lists), self.size), dtype=np.uint8)
+        else:
+            out = out[:len(term_lists)]
+            out.fill(0)
+
+        rows, cols, unmatched = [], [], []
+        for row, terms in enumerate(term_lists):
+            missed = []
+            for term in terms:
+                col = self.resolve(term)
+                if col is None:
+                    missed.append(term)
+                else:
+                    rows.append(row)
+                    cols.append(col)
+            unmatched.append(missed)
+        out[rows, cols] = 1
+        return out, unmatched
@@ -0,0 +1,215 @@
+"""
+Stage runner for modeltraining.py.
+
+A pipeline is a list of Stages forming a DAG. Stages whose dependencies are
+done run concurrently in threads, sharing a bounded number of cores: each
+launched stage gets an n_jobs share of the free cores (capped by its own
+`cores`), which it passes on to sklearn / XGBoost. Uncached stages (side
+effects such as saving and plotting) run on the main thread instead.
+
+Every stage's output is cached on disk under a key hashing its name, the
+source of its function and of the helpers it declares, the versions of the
+training libraries, its params, the files it reads and the keys of its
+dependencies, so a rerun (or a resumed run after a crash) only recomputes the
+stages whose inputs changed and everything downstream of them. Forcing a
+stage recomputes everything downstream of it as well.
+"""
+import glob
+import hashlib
+import inspect
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from importlib import metadata
+
+import joblib
+
+from services.model_versions import file_sha256
+
+CACHE_DIR = os.path.join("ml_models", "training_cache")
+
+# Libraries whose version is part of every stage's key
+KEY_LIBRARIES = ["numpy", "pandas", "scikit-learn", "imbalanced-learn", "xgboost"]
+
+
+class Stage:
+    """
+    One pipeline step: func(**dependency outputs, **params, n_jobs=...) -> output.
+
+    cores   most cores the stage can use (-1 = as many as are free)
+    files   paths the stage reads directly; their contents are part of the key
+    helpers functions or classes func calls; their source is part of the key
+            like func's own (module constants a stage uses belong in params)
+    cache   False for stages with side effects that must always run (saving);
+            they run on the main thread
+    """
+
+    def __init__(self, name, func, deps=(), params=None, cores=1, files=(), helpers=(), cache=True):
+        self.name = name
+        self.func = func
+        self.deps = list(deps)
+        self.params = params or {}
+        self.cores = cores
+        self.files = list(files)
+        self.helpers = list(helpers)
+        self.cache = cache
+
+
+def library_versions():
+    """'name==version' of every KEY_LIBRARIES package installed."""
+    versions = []
+    for name in KEY_LIBRARIES:
+        try:
+            versions.append(f"{name}=={metadata.version(name)}")
+        except metadata.PackageNotFoundError:
+            versions.append(f"{name} missing")
+    return ";".join(versions)
+
+
+def stage_key(stage, dep_keys, versions):
+    """Hash of everything that determines the stage's output."""
+    digest = hashlib.sha256()
+    digest.update(stage.name.encode())
+    digest.update(versions.encode())
+    for code in [stage.func, *stage.helpers]:
+        digest.update(inspect.getsource(code).encode())
+    digest.update(joblib.hash(stage.params).encode())
+    for path in stage.files:
+        digest.update(file_sha256(path).encode())
+    for dep in stage.deps:
+        digest.update(dep_keys[dep].encode())
+    return digest.hexdigest()[:16]
+
+
+def cache_path(cache_dir, stage, key):
+    return os.path.join(cache_dir, f"{stage.name}-{key}.joblib")
+
+
+def store(cache_dir, stage, key, output):
+    """Write a stage output atomically and drop the stage's older entries."""
+    path = cache_path(cache_dir, stage, key)
+    tmp_path = f"{path}.tmp"
+    joblib.dump(output, tmp_path)
+    os.replace(tmp_path, path)
+    for old in glob.glob(os.path.join(cache_dir, f"{stage.name}-*.joblib")):
+        if old != path:
+            os.remove(old)
+
+
+def downstream(stages, names):
+    """`names` and the names of every stage that depends on them, directly or not."""
+    closed = set(names)
+    grew = True
+    while grew:
+        grew = False
+        for stage in stages:
+            if stage.name not in closed and any(dep in closed for dep in stage.deps):
+                closed.add(stage.name)
+                grew = True
+    return closed
+
+
+def run_pipeline(stages, cores=None, cache_dir=CACHE_DIR, use_cache=True, force=()):
+    """
+    Run the stages in dependency order, concurrently where possible.
+
+    Returns ({stage name: output}, [timing rows]). Stages named in `force`, and
+    every stage downstream of them, are recomputed even when cached.
+    """
+    cores = max(1, cores or os.cpu_count() or 1)
+    by_name = {stage.name: stage for stage in stages}
+    for stage in stages:
+        unknown = [dep for dep in stage.deps if dep not in by_name]
+        if unknown:
+            raise ValueError(f"Stage {stage.name} depends on unknown stages: {', '.join(unknown)}")
+    unknown = [name for name in force if name not in by_name]
+    if unknown:
+        raise ValueError(f"Cannot force unknown stages: {', '.join(unknown)}")
+    # A forced stage's dependents were cached from its old output (their keys do not change)
+    force = downstream(stages, force)
+    versions = library_versions()
+    os.makedirs(cache_dir, exist_ok=True)
+
+    pending = list(stages)
+    outputs, keys, timings = {}, {}, []
+    running = {}
+    free = cores
+    started = time.perf_counter()
+
+    def finish(stage, status, n_jobs, start, output):
+        outputs[stage.name] = output
+        timings.append({
+            "stage": stage.name,
+            "status": status,
+            "n_jobs": n_jobs,
+            "start_s": start - started,
+            "seconds": time.perf_counter() - start
+        })
+
+    with ThreadPoolExecutor(max_workers=cores) as pool:
+        while pending or running:
+            ready = [stage for stage in pending if all(dep in outputs for dep in stage.deps)]
+            launched = False
+            for i, stage in enumerate(ready):
+                key = keys[stage.name] = stage_key(stage, keys, versions)
+                path = cache_path(cache_dir, stage, key)
+                if use_cache and stage.cache and stage.name not in force and os.path.exists(path):
+                    start = time.perf_counter()
+                    finish(stage, "cached", 0, start, joblib.load(path))
+                    pending.remove(stage)
+                    launched = True
+                    continue
+                if free < 1:
+                    break
+                # Split the free cores between the stages that are ready now
+                share = max(1, free // (len(ready) - i))
+                n_jobs = share if stage.cores == -1 else min(stage.cores, share)
+                free -= n_jobs
+                inputs = {dep: outputs[dep] for dep in stage.deps}
+                pending.remove(stage)
+                print(f"▶️ {stage.name} started with {n_jobs} core{'s' if n_jobs > 1 else ''}", flush=True)
+                start = time.perf_counter()
+                if stage.cache:
+                    future = pool.submit(stage.func, **inputs, **stage.params, n_jobs=n_jobs)
+                else:
+                    # Side effects (files, matplotlib figures) happen on the main thread, like a plain script
+                    future = Future()
+                    try:
+                        future.set_result(stage.func(**inputs, **stage.params, n_jobs=n_jobs))
+                    except Exception as e:
+                        future.set_exception(e)
+                running[future] = (stage, n_jobs, start)
+                launched = True
+
+            if not running:
+                if launched:
+                    continue
+                raise ValueError(f"Stages can never run (dependency cycle): {', '.join(s.name for s in pending)}")
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage, n_jobs, start = running.pop(future)
+                free += n_jobs
+                try:
+                    output = future.result()
+                except Exception:
+                    print(f"❌ Stage {stage.name} failed; finished stages stay cached for the next run")
+                    print_timings(timings, time.perf_counter() - started)
+                    raise
+                if stage.cache:
+                    store(cache_dir, stage, keys[stage.name], output)
+                finish(stage, "computed", n_jobs, start, output)
+                print(f"✅ {stage.name} done in {timings[-1]['seconds']:.1f} s", flush=True)
+
+    print_timings(timings, time.perf_counter() - started)
+    return outputs, timings
+
+
+def print_timings(timings, wall_seconds):
+    """Wall-clock breakdown per stage."""
+    print(f"\n{'stage':<20} {'status':<9} {'cores':>5} {'start s':>8} {'seconds':>8}")
+    for row in sorted(timings, key=lambda row: row["start_s"]):
+        print(f"{row['stage']:<20} {row['status']:<9} {row['n_jobs']:>5} {row['start_s']:>8.1f} {row['seconds']:>8.1f}")
+    stage_seconds = sum(row["seconds"] for row in timings)
+    print(f"{'total':<20} {'':<9} {'':>5} {'':>8} {wall_seconds:>8.1f}  "
+          f"(stages sum to {stage_seconds:.1f} s)")
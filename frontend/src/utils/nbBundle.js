@@ -0,0 +1,116 @@
+// First-pass Naive Bayes scoring in the browser, from the bundle served by
+// GET /prediction/client_bundle (format documented in backend/services/client_bundle.py).
+// The full ensemble still needs /prediction/predict; this only gives an offline estimate.
+
+const MAGIC = 'MMNB';
+const BUNDLE_FORMAT = 1;
+const STORAGE_KEY = 'nbBundle';
+
+const toBase64 = (bytes) => {
+  let binary = '';
+  for (let i = 0; i < bytes.length; i += 0x8000) {
+    binary += String.fromCharCode(...bytes.subarray(i, i + 0x8000));
+  }
+  return btoa(binary);
+};
+
+const fromBase64 = (text) => Uint8Array.from(atob(text), (c) => c.charCodeAt(0)).buffer;
+
+export const normalizeSymptom = (name) =>
+  String(name).toLowerCase().replace(/[^a-z0-9]+/g, ' ').trim();
+
+export const parseBundle = (buffer) => {
+  const bytes = new Uint8Array(buffer);
+  if (String.fromCharCode(...bytes.subarray(0, 4)) !== MAGIC) {
+    throw new Error('Not a client NB bundle');
+  }
+  const view = new DataView(buffer);
+  const headerLength = view.getUint32(4, true);
+  const header = JSON.parse(new TextDecoder().decode(bytes.subarray(8, 8 + headerLength)));
+  if (header.format !== BUNDLE_FORMAT) {
+    throw new Error(`Bundle format ${header.format} is not supported`);
+  }
+
+  const start = 8 + headerLength;
+  const tables = {};
+  header.arrays.forEach(({ name, shape, offset }) => {
+    const count = shape.reduce((a, b) => a * b, 1);
+    const table = new Float64Array(count);
+    for (let i = 0; i < count; i++) {
+      table[i] = view.getFloat32(start + offset + 4 * i, true);
+    }
+    tables[name] = table;
+  });
+
+  const nClasses = header.classes.length;
+  const base = new Float64Array(nClasses);
+  for (let c = 0; c < nClasses; c++) {
+    base[c] = tables.log_prior[c] + tables.absent_log_likelihood[c];
+  }
+  return { header, base, symptomDelta: tables.symptom_delta, nClasses };
+};
+
+// Same steps as BundleScorer.predict in backend/services/client_bundle.py
+export const scoreSymptoms = (bundle, symptoms) => {
+  const active = [];
+  const unmatched = [];
+  symptoms.forEach((term) => {
+    const col = bundle.header.keys[normalizeSymptom(term)];
+    if (col === undefined) {
+      unmatched.push(term);
+    } else if (!active.includes(col)) {
+      active.push(col);
+    }
+  });
+
+  const scores = Float64Array.from(bundle.base);
+  active.forEach((col) => {
+    for (let c = 0; c < bundle.nClasses; c++) {
+      scores[c] += bundle.symptomDelta[col * bundle.nClasses + c];
+    }
+  });
+  const max = Math.max(...scores);
+  let total = 0;
+  for (let c = 0; c < bundle.nClasses; c++) {
+    scores[c] = Math.exp(scores[c] - max);
+    total += scores[c];
+  }
+  const probabilities = Array.from(scores, (score) => score / total);
+  const label = probabilities.indexOf(Math.max(...probabilities));
+  return {
+    final_prediction: bundle.header.classes[label],
+    confidence: probabilities[label],
+    probabilities,
+    unmatched_symptoms: unmatched,
+  };
+};
+
+// Revalidates the stored bundle with its ETag; falls back to it when offline
+export const loadBundle = async (baseUrl) => {
+  const stored = JSON.parse(localStorage.getItem(STORAGE_KEY) || 'null');
+  try {
+    const response = await fetch(`${baseUrl}/prediction/client_bundle`, {
+      cache: 'no-store',
+      headers: stored ? { 'If-None-Match': stored.etag } : {},
+    });
+    if (response.status === 304 && stored) {
+      return parseBundle(fromBase64(stored.data));
+    }
+    if (!response.ok) {
+      throw new Error(`Bundle request failed: ${response.status}`);
+    }
+    const buffer = await response.arrayBuffer();
+    const bundle = parseBundle(buffer);
+    localStorage.setItem(STORAGE_KEY, JSON.stringify({
+      etag: response.headers.get('ETag'),
+      data: toBase64(new Uint8Array(buffer)),
+    }));
+    return bundle;
+  } catch (err) {
+    if (stored) {
+      console.warn('Using the stored NB bundle:', err);
+      return parseBundle(fromBase64(stored.data));
+    }
+    throw err;
+  }
+};